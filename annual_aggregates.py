@@ -0,0 +1,274 @@
+"""CSC110 Fall 2020 Final Project, Annual Aggregates
+
+Description
+===============================
+This module keeps a table of the annual statistics of every weather station, so that the maps and
+graphs do not have to go over every day of every year each time they are drawn. For each station and
+each year, the table holds the mean, minimum and maximum of the daily mean temperatures, the number
+of days with a recorded temperature and the number of days whose temperature was filled in by
+imputation.
+
+The table is a float64 array with one row for each station, one column for each year and one entry
+for each statistic in AGGREGATE_COLUMNS, saved as a .npy file that is opened with memory mapping. A
+small json file next to it holds the id, name and province of the station in each row and the range
+of years of the columns, in the same way as temperature_cube.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Dict, List, Tuple
+import json
+import os
+import numpy as np
+import data_reading
+
+# the statistics kept for every station and year, in the order of the last axis of the table
+AGGREGATE_COLUMNS = ('mean', 'min', 'max', 'valid_days', 'imputed_days')
+
+# the station id, the station name and the province or territory of a station
+Station = Tuple[str, str, str]
+
+
+class AnnualAggregates:
+    """The annual statistics of the daily mean temperatures of many weather stations.
+
+    Instance Attributes:
+        - table: the stations by years by AGGREGATE_COLUMNS array of statistics; the mean, minimum
+          and maximum are nan and the counts are 0 in the years in which a station has no data
+        - stations: the (id, name, province) of the station in each row of table
+        - first_year: the year of the first column of table
+        - last_year: the year of the last column of table
+        - rows_by_name: maps the (name, province) of each station to its row
+
+    Representation Invariants:
+        - self.table.shape[0] == len(self.stations)
+        - self.table.shape[1] == self.last_year - self.first_year + 1
+        - self.table.shape[2] == len(AGGREGATE_COLUMNS)
+    """
+    table: np.ndarray
+    stations: List[Station]
+    first_year: int
+    last_year: int
+    rows_by_name: Dict[Tuple[str, str], int]
+
+    def __init__(self, table: np.ndarray, stations: List[Station], first_year: int,
+                 last_year: int) -> None:
+        """Initialize the annual statistics in table of stations from first_year to last_year."""
+        self.table = table
+        self.stations = stations
+        self.first_year = first_year
+        self.last_year = last_year
+        self.rows_by_name = {(name, province): row
+                             for row, (_, name, province) in enumerate(stations)}
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the stations by years array of the statistic called name, without copying it.
+
+        Preconditions:
+            - name in AGGREGATE_COLUMNS
+        """
+        return self.table[:, :, AGGREGATE_COLUMNS.index(name)]
+
+    def annual_means(self, row: int) -> Dict[int, float]:
+        """Return a dictionary mapping each year in which the station in row has data to its mean
+        temperature in that year.
+        """
+        means = self.table[row, :, AGGREGATE_COLUMNS.index('mean')].tolist()
+        return {self.first_year + index: means[index] for index in range(len(means))
+                if not np.isnan(means[index])}
+
+    def annual_means_by_id(self) -> Dict[str, Dict[int, float]]:
+        """Return a dictionary mapping the id of each station with an id to the dictionary of its
+        mean temperature in each year, in the format of maps.annual_mean_temps.
+        """
+        return {self.stations[row][0]: self.annual_means(row) for row in range(len(self.stations))
+                if self.stations[row][0] != ''}
+
+
+class AnnualAggregatesBuilder:
+    """The annual statistics of stations, collected one station at a time as their files are read,
+    so that the table can be made by the same pass over the files as the rest of the data.
+
+    Instance Attributes:
+        - first_year: the first year of the statistics
+        - last_year: the last year of the statistics
+        - stations: the (id, name, province) of each station added so far that has data
+        - rows: the years by AGGREGATE_COLUMNS array of the statistics of each of stations
+
+    Representation Invariants:
+        - self.first_year <= self.last_year
+        - len(self.stations) == len(self.rows)
+    """
+    first_year: int
+    last_year: int
+    stations: List[Station]
+    rows: List[np.ndarray]
+
+    def __init__(self, first_year: int, last_year: int) -> None:
+        """Initialize a builder of the statistics from first_year to last_year with no stations."""
+        self.first_year = first_year
+        self.last_year = last_year
+        self.stations = []
+        self.rows = []
+
+    def add(self, station: Station, years: np.ndarray, days_in_each_year: np.ndarray,
+            temperatures: np.ndarray, was_missing: np.ndarray) -> None:
+        """Add the statistics of station, given its arrays as returned by
+        data_reading.read_daily_mean_temps_array. A station with no data is left out, as it is in
+        'data.json'.
+        """
+        if len(years) > 0:
+            list.append(self.stations, station)
+            list.append(self.rows, aggregate_station(years, days_in_each_year, temperatures,
+                                                     was_missing, self.first_year,
+                                                     self.last_year))
+
+    def save(self, file_name: str) -> None:
+        """Save the statistics of the stations added so far under file_name."""
+        table = np.array(self.rows, dtype=np.float64).reshape(
+            len(self.rows), self.last_year - self.first_year + 1, len(AGGREGATE_COLUMNS))
+        save_annual_aggregates(file_name, table, self.stations, self.first_year, self.last_year)
+
+
+def build_annual_aggregates(file_path: str, directory: str, file_name: str,
+                            first_year: int = data_reading.FIRST_YEAR,
+                            last_year: int = data_reading.LAST_YEAR) -> None:
+    """Read the daily mean temperature files in directory one at a time and save the annual
+    statistics of their stations from first_year to last_year under file_name. Stations whose file
+    does not cover that range are left out, as they are in 'data.json'.
+
+    The same table is saved by data_reading.write_daily_mean_temps_json and by
+    incremental_build.build_incrementally when they are given the name of the aggregates, so this
+    is only needed when the other data is already up to date.
+
+    Preconditions:
+        - file_path and directory are in the same format as in
+          data_reading.read_daily_mean_temps_all_files
+        - first_year <= last_year
+    """
+    builder = AnnualAggregatesBuilder(first_year, last_year)
+    for first_line_list, arrays in data_reading.iter_daily_mean_temps_arrays(file_path, directory,
+                                                                             first_year,
+                                                                             last_year):
+        builder.add(data_reading.make_location_key(first_line_list, True), *arrays)
+    builder.save(file_name)
+
+
+def load_annual_aggregates(file_name: str) -> AnnualAggregates:
+    """Return the AnnualAggregates saved under file_name by build_annual_aggregates. The table is
+    memory mapped and read only.
+
+    Preconditions:
+        - os.path.exists(table_file_name(file_name))
+        - os.path.exists(metadata_file_name(file_name))
+    """
+    with open(metadata_file_name(file_name)) as file:
+        metadata = json.load(file)
+
+    table = np.load(table_file_name(file_name), mmap_mode='r')
+    stations = [(station[0], station[1], station[2]) for station in metadata['stations']]
+    return AnnualAggregates(table, stations, metadata['first_year'], metadata['last_year'])
+
+
+def save_annual_aggregates(file_name: str, table: np.ndarray, stations: List[Station],
+                           first_year: int, last_year: int) -> None:
+    """Save table and the metadata of its rows under file_name. Both files are written to a
+    temporary name first, so a table that is open elsewhere is never seen half written.
+
+    Preconditions:
+        - table.shape == (len(stations), last_year - first_year + 1, len(AGGREGATE_COLUMNS))
+    """
+    temporary_table = table_file_name(file_name) + '.tmp'
+    with open(temporary_table, 'wb') as file:
+        np.save(file, np.asarray(table, dtype=np.float64))
+
+    temporary_metadata = metadata_file_name(file_name) + '.tmp'
+    with open(temporary_metadata, 'w') as file:
+        json.dump({'first_year': first_year, 'last_year': last_year,
+                   'stations': [list(station) for station in stations]}, file)
+
+    os.replace(temporary_table, table_file_name(file_name))
+    os.replace(temporary_metadata, metadata_file_name(file_name))
+
+
+def aggregate_station(years: np.ndarray, days_in_each_year: np.ndarray, temperatures: np.ndarray,
+                      was_missing: np.ndarray, first_year: int, last_year: int) -> np.ndarray:
+    """Return the years by AGGREGATE_COLUMNS array of the annual statistics from first_year to
+    last_year of a station with the given years, number of days in each year, temperatures and
+    missing days, as returned by data_reading.read_daily_mean_temps_array.
+
+    Every statistic of every year is computed at once by reducing over the boundaries of the years.
+
+    >>> statistics = aggregate_station(np.array([2001]), np.array([3]), np.array([1.0, 2.0, 6.0]),
+    ...                                np.array([False, True, False]), 2000, 2001)
+    >>> statistics[1].tolist()
+    [3.0, 1.0, 6.0, 2.0, 1.0]
+    >>> bool(np.isnan(statistics[0, 0])), statistics[0, 3:].tolist()
+    (True, [0.0, 0.0])
+    """
+    statistics = np.zeros((last_year - first_year + 1, len(AGGREGATE_COLUMNS)), dtype=np.float64)
+    statistics[:, :3] = np.nan
+
+    in_range = (years >= first_year) & (years <= last_year)
+    if len(years) == 0 or not in_range.any():
+        return statistics
+
+    starts = np.concatenate(([0], np.cumsum(days_in_each_year)[:-1]))
+    imputed_days = np.add.reduceat(np.asarray(was_missing, dtype=np.float64), starts)
+    columns = years[in_range] - first_year
+
+    statistics[columns, 0] = (np.add.reduceat(temperatures, starts) / days_in_each_year)[in_range]
+    statistics[columns, 1] = np.minimum.reduceat(temperatures, starts)[in_range]
+    statistics[columns, 2] = np.maximum.reduceat(temperatures, starts)[in_range]
+    statistics[columns, 3] = (days_in_each_year - imputed_days)[in_range]
+    statistics[columns, 4] = imputed_days[in_range]
+    return statistics
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def table_file_name(file_name: str) -> str:
+    """Return the name of the file that holds the table of the aggregates saved under file_name."""
+    return file_name + '.npy'
+
+
+def metadata_file_name(file_name: str) -> str:
+    """Return the name of the file that holds the metadata of the aggregates saved under
+    file_name.
+    """
+    return file_name + '_stations.json'
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'json', 'os', 'numpy', 'data_reading', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['load_annual_aggregates', 'save_annual_aggregates'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,172 @@
+"""CSC110 Fall 2020 Final Project, Anomalies
+
+Description
+===============================
+This module computes the temperature anomalies of every weather station at once. The annual mean
+temperatures of the stations are kept in one stations by years array, and the anomaly of every
+station in every year is that array minus the baseline temperature of each station, which is a
+single array operation no matter how many stations there are.
+
+The baseline of a station is its average annual mean temperature over a range of years, such as
+1990 to 1990 for the differences shown on the maps, 1991 to 2020, or every year in which the station
+has data for the graphs. The baselines and anomalies are cached for each range of years, so the maps
+and the graphs share them.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import annual_aggregates
+
+# the first and last year of a baseline, or None for every year in which a station has data
+Baseline = Optional[Tuple[int, int]]
+
+
+class AnomalyEngine:
+    """The temperature anomalies of many weather stations, for any baseline.
+
+    Instance Attributes:
+        - means: the stations by years array of annual mean temperatures, nan where a station has no
+          data
+        - keys: the key of the station in each row of means
+        - first_year: the year of the first column of means
+        - rows_by_key: maps the key of each station to its row
+        - baselines: the baseline temperature of every station for each baseline computed so far
+        - anomalies_by_baseline: the anomalies of every station for each baseline computed so far
+
+    Representation Invariants:
+        - self.means.ndim == 2
+        - len(self.keys) == self.means.shape[0]
+    """
+    means: np.ndarray
+    keys: List[Any]
+    first_year: int
+    rows_by_key: Dict[Any, int]
+    baselines: Dict[Baseline, np.ndarray]
+    anomalies_by_baseline: Dict[Baseline, np.ndarray]
+
+    def __init__(self, means: np.ndarray, keys: List[Any], first_year: int) -> None:
+        """Initialize an engine for the annual mean temperatures means of the stations with the
+        given keys, starting in first_year.
+        """
+        self.means = np.asarray(means, dtype=np.float64)
+        self.keys = keys
+        self.first_year = first_year
+        self.rows_by_key = {key: row for row, key in enumerate(keys)}
+        self.baselines = {}
+        self.anomalies_by_baseline = {}
+
+    def baseline(self, baseline: Baseline = None) -> np.ndarray:
+        """Return the baseline temperature of every station, which is the average of its annual
+        mean temperatures in the years of baseline that it has data for. A station with no data in
+        those years has a baseline of nan.
+
+        >>> means = np.array([[1.0, 2.0, 6.0], [4.0, np.nan, 2.0]])
+        >>> engine = AnomalyEngine(means, ['A', 'B'], 1990)
+        >>> engine.baseline().tolist()
+        [3.0, 3.0]
+        >>> engine.baseline((1991, 1991)).tolist()
+        [2.0, nan]
+
+        Preconditions:
+            - baseline is None or baseline[0] <= baseline[1]
+        """
+        if baseline not in self.baselines:
+            if baseline is None:
+                columns = self.means
+            else:
+                start = max(baseline[0] - self.first_year, 0)
+                end = max(baseline[1] - self.first_year + 1, 0)
+                columns = self.means[:, start:end]
+            recorded = ~np.isnan(columns)
+            counts = recorded.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self.baselines[baseline] = np.where(recorded, columns, 0.0).sum(axis=1) / counts
+        return self.baselines[baseline]
+
+    def anomalies(self, baseline: Baseline = None) -> np.ndarray:
+        """Return the stations by years array of the difference between the annual mean temperature
+        of every station and its baseline temperature.
+
+        >>> engine = AnomalyEngine(np.array([[1.0, 2.0, 6.0]]), ['A'], 1990)
+        >>> engine.anomalies().tolist()
+        [[-2.0, -1.0, 3.0]]
+        >>> engine.anomalies((1990, 1990)).tolist()
+        [[0.0, 1.0, 5.0]]
+        """
+        if baseline not in self.anomalies_by_baseline:
+            self.anomalies_by_baseline[baseline] = self.means - self.baseline(baseline)[:, None]
+        return self.anomalies_by_baseline[baseline]
+
+    def station_anomalies(self, key: Any, baseline: Baseline = None) -> Dict[int, float]:
+        """Return a dictionary mapping each year in which the station with the given key has an
+        anomaly to its anomaly in that year.
+
+        >>> engine = AnomalyEngine(np.array([[1.0, np.nan, 5.0]]), ['A'], 1990)
+        >>> engine.station_anomalies('A')
+        {1990: -2.0, 1992: 2.0}
+        """
+        row = self.anomalies(baseline)[self.rows_by_key[key]].tolist()
+        return {self.first_year + index: row[index] for index in range(len(row))
+                if not np.isnan(row[index])}
+
+
+def engine_from_aggregates(aggregates: annual_aggregates.AnnualAggregates) -> AnomalyEngine:
+    """Return an AnomalyEngine for the annual mean temperatures in aggregates. The stations are
+    keyed by their (id, name, province).
+    """
+    return AnomalyEngine(aggregates.column('mean'), list(aggregates.stations),
+                         aggregates.first_year)
+
+
+def engine_from_annual_temps(annual_temps: Dict[Any, Dict[Any, float]]) -> AnomalyEngine:
+    """Return an AnomalyEngine for annual_temps, which maps the key of each station to its mean
+    temperature in each year, such as the dictionaries returned by maps.annual_mean_temps.
+
+    >>> engine = engine_from_annual_temps({'A': {'1991': 2.0}, 'B': {1990: 1.0, 1992: 3.0}})
+    >>> engine.first_year, engine.means.tolist()
+    (1990, [[nan, 2.0, nan], [1.0, nan, 3.0]])
+    """
+    keys = list(annual_temps)
+    all_years = [int(year) for key in keys for year in annual_temps[key]]
+    first_year = min(all_years, default=0)
+    last_year = max(all_years, default=-1)
+
+    means = np.full((len(keys), last_year - first_year + 1), np.nan)
+    for row, key in enumerate(keys):
+        for year, mean in annual_temps[key].items():
+            means[row, int(year) - first_year] = mean
+    return AnomalyEngine(means, keys, first_year)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'numpy', 'annual_aggregates', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,454 @@
+"""CSC110 Fall 2020 Final Project, Benchmarks
+
+Description
+===============================
+This module times the hot paths of the project on generated data, so that changes to them can be
+compared against the earlier versions.
+
+The suite has micro benchmarks of the functions that read, aggregate and plot the data, and end to
+end benchmarks of what happens when the Map button is clicked and when a station is selected, on
+synthetic datasets of several sizes written by synthetic_data. The results are written to a json
+file, and can be compared against the results of an earlier run that were saved as the baseline:
+every benchmark that got slower than the baseline by more than the threshold is reported as a
+regression, and the script then exits with status 1. For example:
+
+    python benchmarks.py --save-baseline
+    python benchmarks.py --baseline benchmarks_baseline.json --threshold 0.25
+
+The baseline in benchmarks_baseline.json was measured on the machine described by its environment
+block. The times depend on the machine, so a baseline should be saved again with --save-baseline
+on the machine that the comparisons are run on.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import numpy as np
+import plotly
+import combine
+import data_reading
+import emissions_store
+import geometry
+import maps
+import stations
+import synthetic_data
+
+# the environment variable that makes main.py print its startup times and close, which is the same
+# as main.STARTUP_BENCHMARK_VARIABLE; main.py cannot be imported without opening its window
+STARTUP_BENCHMARK_VARIABLE = 'STARTUP_BENCHMARK'
+
+# the numbers of stations in the datasets of the end to end benchmarks
+DEFAULT_SIZES = (10, 100, 1000)
+
+# the number of stations in the dataset of the micro benchmarks
+MICRO_SIZE = 100
+
+# a benchmark has regressed when it takes more than this fraction longer than its baseline
+DEFAULT_THRESHOLD = 0.25
+
+RESULTS_FILE_NAME = 'benchmark_results.json'
+BASELINE_FILE_NAME = 'benchmarks_baseline.json'
+
+# the years of the synthetic station files, which go past the years that data_reading reads, like
+# the real files
+FIRST_DATA_YEAR = 1950
+LAST_DATA_YEAR = 2020
+
+# the year whose maps are made by the map_open benchmark, and the year it is compared to, as in
+# main.MAP_BASELINE_YEAR
+MAP_YEAR = 2018
+MAP_BASELINE_YEAR = 1990
+
+
+class Dataset:
+    """The files of a synthetic dataset written by make_dataset.
+
+    Instance Attributes:
+        - number_of_stations: the number of weather stations
+        - station_files: the daily mean temperature file of each station
+        - emissions_csv: the greenhouse gases csv file
+        - stations_geojson: the locations of the stations
+        - provinces_geojson: the borders of the provinces
+        - data_json: the temperatures of the stations in the format of 'data.json'
+        - map_temps_json: the temperatures of the stations in the format of
+          'data_for_maps_since_1990.json'
+    """
+    number_of_stations: int
+    station_files: List[str]
+    emissions_csv: str
+    stations_geojson: str
+    provinces_geojson: str
+    data_json: str
+    map_temps_json: str
+
+    def __init__(self, directory: str, number_of_stations: int, station_files: List[str]) -> None:
+        """Initialize the dataset of number_of_stations stations in directory."""
+        self.number_of_stations = number_of_stations
+        self.station_files = station_files
+        self.emissions_csv = os.path.join(directory, 'GHG_IPCC_Can_Prov_Terr.csv')
+        self.stations_geojson = os.path.join(directory, 'weather_stations.geojson')
+        self.provinces_geojson = os.path.join(directory, 'canada_provinces.geojson')
+        self.data_json = os.path.join(directory, 'data.json')
+        self.map_temps_json = os.path.join(directory, 'data_for_maps_since_1990.json')
+
+
+def run_benchmarks(sizes: Iterable[int] = DEFAULT_SIZES, repeat: int = 20,
+                   directory: Optional[str] = None) -> Dict[str, float]:
+    """Return the time in seconds of every benchmark of the suite, keyed by its name.
+
+    The micro benchmarks are named 'micro/<function>' and run on a dataset of MICRO_SIZE stations,
+    each averaged over repeat calls. The end to end benchmarks are named 'map_open/<size>' and
+    'selected/<size>' for each of sizes. The datasets are written to a temporary directory inside
+    directory, or in the default temporary directory if it is None, and deleted afterwards.
+
+    Preconditions:
+        - all(size >= 1 for size in sizes)
+        - repeat >= 1
+    """
+    sizes = list(sizes)
+    with tempfile.TemporaryDirectory(dir=directory) as temporary_directory:
+        datasets = {size: make_dataset(os.path.join(temporary_directory, str(size)), size)
+                    for size in sorted(set(sizes) | {MICRO_SIZE})}
+
+        results = {'micro/' + name: seconds for name, seconds in
+                   run_micro_benchmarks(datasets[MICRO_SIZE], repeat).items()}
+        for name, seconds in benchmark_convert_data(repeat=repeat).items():
+            results['micro/' + name] = seconds
+        for size in sizes:
+            results[f'map_open/{size}'] = time_call(lambda: map_open_workload(datasets[size]), 1)
+            results[f'selected/{size}'] = time_call(lambda: selected_workload(datasets[size]), 1)
+    return results
+
+
+def run_micro_benchmarks(dataset: Dataset, repeat: int = 20) -> Dict[str, float]:
+    """Return the average time in seconds of each of the functions that read, aggregate and plot
+    the data, on the files of dataset.
+
+    read_ghg_emissions and format_temps parse their files again on every call, while the figure
+    builders reuse the borders that geometry has already simplified, as they do in main.
+    """
+    with open(dataset.station_files[0]) as file:
+        lines = file.readlines()[4:]
+    rows = data_reading.convert_data_to_list(lines)[0]
+    station_temps = data_reading.make_data_dictionary(rows)
+    temp_data = {str(year): temps for year, temps in
+                 data_reading.substitute_outliers(station_temps).items()}
+
+    ghg_data = data_reading.read_ghg_emissions(dataset.emissions_csv)
+    province_id_map = maps.format_province_id_map(dataset.provinces_geojson)
+    emissions_differences = maps.DifferenceView(
+        data_reading.read_ghg_emissions_for_maps(dataset.emissions_csv), MAP_BASELINE_YEAR)
+    temperatures_differences = maps.DifferenceView(
+        maps.format_temps(dataset.stations_geojson, dataset.map_temps_json), MAP_BASELINE_YEAR)
+    co2_values = combine.values_for_co2_plot(ghg_data, 'Ontario')
+    temp_values = combine.values_for_temp_plot(temp_data)
+
+    # the slower functions are called fewer times
+    few = max(repeat // 10, 1)
+    return {
+        'convert_data_to_list': time_call(lambda: data_reading.convert_data_to_list(lines),
+                                          repeat),
+        'make_data_dictionary': time_call(lambda: data_reading.make_data_dictionary(rows), repeat),
+        'substitute_outliers': time_call(lambda: data_reading.substitute_outliers(station_temps),
+                                         repeat),
+        'temp_anomaly': time_call(lambda: combine.temp_anomaly(temp_data), repeat),
+        'read_ghg_emissions': time_call(lambda: clear_caches() or
+                                        data_reading.read_ghg_emissions(dataset.emissions_csv),
+                                        few),
+        'format_temps': time_call(lambda: clear_caches() or
+                                  maps.format_temps(dataset.stations_geojson,
+                                                    dataset.map_temps_json), few),
+        'build_emissions_map': time_call(lambda: maps.build_emissions_map(
+            dataset.provinces_geojson, 'Difference', emissions_differences.frame(MAP_YEAR),
+            province_id_map, MAP_YEAR), few),
+        'build_temperatures_map': time_call(lambda: maps.build_temperatures_map(
+            dataset.provinces_geojson, 'Difference', temperatures_differences.frame(MAP_YEAR),
+            MAP_YEAR), few),
+        'build_combined_plot': time_call(lambda: combine.build_combined_plot(
+            co2_values, temp_values, 'Ontario', 'Synthetic'), few)}
+
+
+def map_open_workload(dataset: Dataset, year: int = MAP_YEAR) -> List[Any]:
+    """Return the three maps of year made from the files of dataset, the way main.open_maps makes
+    them the first time the Map button is clicked: every file is read again, and the maps are built
+    but not opened.
+    """
+    clear_caches()
+    province_id_map = maps.format_province_id_map(dataset.provinces_geojson)
+    emissions = data_reading.read_ghg_emissions_for_maps(dataset.emissions_csv)
+    emissions_differences = maps.DifferenceView(emissions, MAP_BASELINE_YEAR)
+    temperatures_differences = maps.DifferenceView(
+        maps.format_temps(dataset.stations_geojson, dataset.map_temps_json), MAP_BASELINE_YEAR)
+    return [maps.build_emissions_map(dataset.provinces_geojson, 'Raw Data',
+                                     {year: emissions[year]}, province_id_map, year),
+            maps.build_emissions_map(dataset.provinces_geojson, 'Difference',
+                                     emissions_differences.frame(year), province_id_map, year),
+            maps.build_temperatures_map(dataset.provinces_geojson, 'Difference',
+                                        temperatures_differences.frame(year), year)]
+
+
+def selected_workload(dataset: Dataset) -> Any:
+    """Return the graph of the first station of dataset, the way main makes it the first time a
+    station is selected, including loading the stations as main does in the background before the
+    first selection. Every file is read again, and the graph is built but not opened.
+    """
+    clear_caches()
+    with open(dataset.data_json) as file:
+        unfiltered_data = json.load(file)
+    data = {key: unfiltered_data[key] for key in unfiltered_data if unfiltered_data[key] != {}}
+    registry = stations.registry_from_keys(data.keys())
+
+    name, province = registry.names[0], registry.provinces[0]
+    store = emissions_store.load_emissions_store(dataset.emissions_csv)
+    return combine.build_combined_plot(
+        combine.values_for_co2_plot_from_store(store, stations.ABB_TO_PROVINCE[province]),
+        combine.values_for_temp_plot(data[registry.keys[0]]), stations.ABB_TO_PROVINCE[province],
+        name)
+
+
+def make_dataset(directory: str, number_of_stations: int, seed: int = 110) -> Dataset:
+    """Write a synthetic dataset of number_of_stations stations to directory and return it."""
+    stations_directory = os.path.join(directory, 'daily_mean_temps')
+    dataset = Dataset(directory, number_of_stations, synthetic_data.write_station_files(
+        stations_directory, number_of_stations, FIRST_DATA_YEAR, LAST_DATA_YEAR, seed))
+    synthetic_data.write_ghg_csv(dataset.emissions_csv, seed=seed)
+    synthetic_data.write_stations_geojson(dataset.stations_geojson, number_of_stations, seed)
+    synthetic_data.write_provinces_geojson(dataset.provinces_geojson, seed=seed)
+    data_reading.write_daily_mean_temps_json(stations_directory + os.sep, stations_directory,
+                                             dataset.data_json, dataset.map_temps_json)
+    return dataset
+
+
+def compare_results(results: Dict[str, float], baseline: Dict[str, float],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[str, float, float]]:
+    """Return the name, the baseline time and the time in results of every benchmark that is in
+    both results and baseline and took more than threshold longer than its baseline, sorted by
+    name.
+
+    >>> compare_results({'a': 1.3, 'b': 1.2, 'c': 5.0}, {'a': 1.0, 'b': 1.0}, 0.25)
+    [('a', 1.0, 1.3)]
+    """
+    return [(name, baseline[name], results[name]) for name in sorted(results)
+            if name in baseline and results[name] > baseline[name] * (1 + threshold)]
+
+
+def write_results(file_name: str, results: Dict[str, float]) -> None:
+    """Write results to the json file called file_name, together with the versions of python and
+    of the libraries they were measured with.
+    """
+    environment = {'python': platform.python_version(), 'platform': platform.platform(),
+                   'cpus': os.cpu_count(), 'numpy': np.__version__, 'plotly': plotly.__version__}
+    with open(file_name, 'w') as file:
+        json.dump({'environment': environment, 'results': results}, file, indent=2,
+                  sort_keys=True)
+
+
+def read_results(file_name: str) -> Dict[str, float]:
+    """Return the results in the json file called file_name, written by write_results."""
+    with open(file_name) as file:
+        return json.load(file)['results']
+
+
+def print_results(results: Dict[str, float], baseline: Optional[Dict[str, float]] = None,
+                  threshold: float = DEFAULT_THRESHOLD) -> None:
+    """Print the time of every benchmark of results, with the change from its time in baseline if
+    it has one, and the regressions as compare_results finds them.
+    """
+    regressions = {name for name, _, _ in compare_results(results, baseline or {}, threshold)}
+    for name in sorted(results):
+        line = f'{name:40} {results[name] * 1000:10.3f} ms'
+        if baseline is not None and name in baseline:
+            change = results[name] / baseline[name] - 1
+            line = line + f' {change:+8.1%}' + ('  REGRESSION' if name in regressions else '')
+        print(line)
+
+
+def benchmark_convert_data(first_year: int = 1950, last_year: int = 2020,
+                           repeat: int = 20) -> Dict[str, float]:
+    """Return the average time in seconds that it takes to parse the table of one station file
+    that covers first_year to last_year, both for data_reading.convert_data_to_array and for
+    convert_data_line_by_line, the parser that data_reading used before.
+
+    Raise a ValueError if the two parsers do not give the same result.
+    """
+    lines = make_station_lines(first_year, last_year)
+    table = str.encode(''.join(lines))
+
+    if data_reading.convert_data_to_list(lines) != convert_data_line_by_line(lines):
+        raise ValueError('convert_data_to_array does not match the line by line parser')
+
+    return {'convert_data_line_by_line': time_call(lambda: convert_data_line_by_line(lines),
+                                                   repeat),
+            'convert_data_to_array': time_call(lambda: data_reading.convert_data_to_array(table),
+                                               repeat)}
+
+
+def benchmark_startup(repeat: int = 3, directory: str = '.',
+                      timeout: float = 120.0) -> Dict[str, float]:
+    """Return the smallest time in seconds, out of repeat runs of main.py in directory, until the
+    window appeared ('first_window') and until the stations were loaded ('interactive'), measured
+    from when main.py started running. The time from starting the process until the stations were
+    loaded, which includes starting python, is also measured from the outside ('process').
+
+    main.py prints its startup times once the stations are loaded when it is run for this
+    benchmark, and is then stopped. It needs a display, and the image cache is made by the first
+    run. A RuntimeError is raised if main.py could not load the stations, or stopped or took more
+    than timeout seconds without printing its startup times.
+    """
+    environment = dict(os.environ)
+    environment[STARTUP_BENCHMARK_VARIABLE] = '1'
+    times_so_far = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with subprocess.Popen([sys.executable, 'main.py'], cwd=directory, env=environment,
+                              stdout=subprocess.PIPE, text=True) as process:
+            line, elapsed = read_line(process, timeout)
+            process.kill()
+        if line == '':
+            raise RuntimeError('main.py stopped or timed out before it printed its startup times')
+        times = json.loads(line)
+        if 'error' in times:
+            raise RuntimeError('main.py could not load the stations: ' + times['error'])
+        times['process'] = elapsed - start
+        for name, seconds in times.items():
+            times_so_far[name] = min(times_so_far.get(name, seconds), seconds)
+    return times_so_far
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def read_line(process: subprocess.Popen, timeout: float) -> Tuple[str, float]:
+    """Return the first line that process writes to its standard output and the value of
+    time.perf_counter() when it was read, or an empty line if the process stops or timeout seconds
+    pass first.
+
+    The line is read on another thread, since reading from a pipe cannot time out.
+    """
+    lines = []
+    reader = threading.Thread(target=lambda: list.append(lines, (process.stdout.readline(),
+                                                                 time.perf_counter())),
+                              daemon=True)
+    reader.start()
+    reader.join(timeout)
+    return lines[0] if lines != [] else ('', time.perf_counter())
+
+
+def clear_caches() -> None:
+    """Forget the files that geometry and emissions_store have parsed and the station keys that
+    stations has decoded, so that the next call reads them again like the first click in main.
+    """
+    geometry.clear_cache()
+    emissions_store.clear_cache()
+    stations.parse_key.cache_clear()
+
+
+def time_call(function: Callable[[], object], repeat: int) -> float:
+    """Return the smallest average time in seconds of calling function repeat times, out of three
+    tries.
+    """
+    return min(timeit.repeat(function, number=repeat, repeat=3)) / repeat
+
+
+def make_station_lines(first_year: int, last_year: int, seed: int = 110) -> List[str]:
+    """Return the table lines of a station file in the format of 'dm112FN0M.txt' that covers
+    first_year to last_year, with random temperatures, flags and missing values.
+    """
+    generator = random.Random(seed)
+
+    lines = []
+    for year in range(first_year, last_year + 1):
+        for month in range(1, 13):
+            line = f' {year:4d}{month:3d}'
+            for _ in range(31):
+                if generator.random() < 0.05:
+                    line = line + f'{-9999.9:8.1f}M'
+                else:
+                    temperature = round(generator.uniform(-35.0, 35.0), 1)
+                    line = line + f'{temperature:8.1f}' + generator.choice(' ' * 8 + 'Ea')
+            list.append(lines, line + '\n')
+    return lines
+
+
+def convert_data_line_by_line(lines: List[str]) -> Tuple[List[List[float]], bool, bool]:
+    """Return the same tuple as data_reading.convert_data_to_list by parsing lines one by one, the
+    way that data_reading used to.
+    """
+    contains_data_range_start = False
+    contains_data_range_end = False
+
+    data_as_list_so_far = []
+    for line in lines:
+        if 1990 <= int(line[1:5]) <= 2018:
+            line = str.replace(line, 'M', ' ')
+            line = str.replace(line, 'E', ' ')
+            line = str.replace(line, 'a', ' ')
+
+            line_list = [float(num) for num in str.split(line) if num != '\n']
+            list.append(data_as_list_so_far, line_list)
+
+            if line_list[0] == 1990 and line_list[1] == 1:
+                contains_data_range_start = True
+            if line_list[0] == 2018 and line_list[1] == 12:
+                contains_data_range_end = True
+
+    return (data_as_list_so_far, contains_data_range_start, contains_data_range_end)
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description='Time the hot paths of the project.')
+    PARSER.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='the numbers of stations of the end to end benchmarks')
+    PARSER.add_argument('--repeat', type=int, default=20)
+    PARSER.add_argument('--output', default=RESULTS_FILE_NAME)
+    PARSER.add_argument('--baseline', default=BASELINE_FILE_NAME,
+                        help='compare the results to this file if it exists')
+    PARSER.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    PARSER.add_argument('--save-baseline', action='store_true',
+                        help='also save the results as the baseline')
+    PARSER.add_argument('--startup', action='store_true',
+                        help='also time the startup of main.py, which needs a display')
+    ARGUMENTS = PARSER.parse_args()
+
+    RESULTS = run_benchmarks(ARGUMENTS.sizes, ARGUMENTS.repeat)
+    if ARGUMENTS.startup:
+        for NAME, SECONDS in benchmark_startup().items():
+            RESULTS['startup/' + NAME] = SECONDS
+    write_results(ARGUMENTS.output, RESULTS)
+
+    if ARGUMENTS.save_baseline:
+        write_results(ARGUMENTS.baseline, RESULTS)
+        print_results(RESULTS)
+        print(f'Saved the results as the baseline in {ARGUMENTS.baseline}')
+    elif os.path.exists(ARGUMENTS.baseline):
+        BASELINE = read_results(ARGUMENTS.baseline)
+        print_results(RESULTS, BASELINE, ARGUMENTS.threshold)
+        REGRESSIONS = compare_results(RESULTS, BASELINE, ARGUMENTS.threshold)
+        if REGRESSIONS != []:
+            print(f'{len(REGRESSIONS)} benchmarks are more than {ARGUMENTS.threshold:.0%} slower '
+                  f'than the baseline')
+            sys.exit(1)
+    else:
+        print_results(RESULTS)
@@ -16,9 +16,11 @@ please consult our Course Syllabus.
 
 This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
 """
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Iterable, Iterator, Tuple
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import emissions_store
+import instrumentation
 
 
 def combine_plots(gas_data: List[List[Any]], temp_data: Dict[str, List[float]],
@@ -37,9 +39,53 @@ def combine_plots(gas_data: List[List[Any]], temp_data: Dict[str, List[float]],
         - temp_data is a dictionary with years as keys and list of daily temperatures for that year,
          in the returned format from user_interface.read_temp_data()
     """
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    show_combined_plot(values_for_co2_plot(gas_data, province), values_for_temp_plot(temp_data),
+                       province, station)
+
+
+def combine_plots_from_annual_means(gas_data: List[List[Any]], annual_means: Dict[Any, float],
+                                    province: str, station: str) -> None:
+    """
+    Return the same combined plot as combine_plots, given the mean temperature of the station in
+    each year, such as the ones in annual_aggregates.AnnualAggregates, instead of its daily
+    temperatures.
+
+    Preconditions:
+        - province != ''
+        - province in [x[1] for x in gas_data]
+        - annual_means != {}
+        - gas_data != {}
+    """
+    combine_plots_from_anomalies(gas_data, {year: anomaly for year, anomaly in
+                                            annual_temp_anomaly(annual_means)},
+                                 province, station)
+
+
+def combine_plots_from_anomalies(gas_data: List[List[Any]], anomalies: Dict[Any, float],
+                                 province: str, station: str) -> None:
+    """
+    Return the same combined plot as combine_plots, given the temperature anomaly of the station in
+    each year, such as the ones from anomalies.AnomalyEngine.station_anomalies.
+
+    Preconditions:
+        - province != ''
+        - province in [x[1] for x in gas_data]
+        - anomalies != {}
+        - gas_data != {}
+    """
+    show_combined_plot(values_for_co2_plot(gas_data, province),
+                       values_for_anomaly_plot(anomalies), province, station)
+
 
-    co2_return = values_for_co2_plot(gas_data, province)
+@instrumentation.stage()
+def build_combined_plot(co2_return: List[List[Any]], temp_return: List[List[Any]],
+                        province: str, station: str) -> go.Figure:
+    """
+    Return the combined plot of the carbon dioxide values co2_return and the temperature values
+    temp_return, in the format returned by values_for_co2_plot and values_for_temp_plot, without
+    opening it.
+    """
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
 
     fig.add_trace(go.Scatter(x=co2_return[0], y=co2_return[1],
                              mode='lines+markers',
@@ -47,8 +93,6 @@ def combine_plots(gas_data: List[List[Any]], temp_data: Dict[str, List[float]],
                   secondary_y=False,
                   row=1, col=1)
 
-    temp_return = values_for_temp_plot(temp_data)
-
     fig.add_trace(go.Scatter(x=temp_return[0], y=temp_return[1],
                              mode='lines+markers',
                              name='Temperatures', line=dict(color="#800000")),
@@ -64,7 +108,7 @@ def combine_plots(gas_data: List[List[Any]], temp_data: Dict[str, List[float]],
     fig.update_xaxes(title_text="Years")
     fig.update_yaxes(title_text="Carbon dioxide levels", secondary_y=False)
     fig.update_yaxes(title_text="Temperatures in Celsius", secondary_y=True)
-    fig.show()
+    return fig
 
 
 ###############################
@@ -72,6 +116,15 @@ def combine_plots(gas_data: List[List[Any]], temp_data: Dict[str, List[float]],
 ###############################
 
 
+def show_combined_plot(co2_return: List[List[Any]], temp_return: List[List[Any]],
+                       province: str, station: str) -> None:
+    """
+    Open the combined plot of the carbon dioxide values co2_return and the temperature values
+    temp_return in a browser window.
+    """
+    build_combined_plot(co2_return, temp_return, province, station).show()
+
+
 def province_sort(given_data: List[List[Any]], province: str) -> List[List[Any]]:
     """
     Return a filtered list of all the lists that contain the province name.
@@ -85,10 +138,14 @@ def province_sort(given_data: List[List[Any]], province: str) -> List[List[Any]]
     return new_data
 
 
+@instrumentation.stage(items=lambda values: len(values[0]))
 def values_for_co2_plot(given_data: List[List[Any]], province: str) -> List[List[Any]]:
     """
     Return the values required to plot carbon dioxide data.
 
+    given_data is a list in the format returned by data_reading.read_ghg_emissions, which is
+    filtered row by row. values_for_co2_plot_from_store finds the same values with an index lookup.
+
     Preconditions:
         - given_data != {}
         - province != ''
@@ -101,6 +158,22 @@ def values_for_co2_plot(given_data: List[List[Any]], province: str) -> List[List
     return [years, values]
 
 
+@instrumentation.stage(items=lambda values: len(values[0]))
+def values_for_co2_plot_from_store(store: emissions_store.EmissionsStore,
+                                   province: str) -> List[List[Any]]:
+    """
+    Return the values required to plot carbon dioxide data, in the same format as
+    values_for_co2_plot, looking up the total emissions of province in the indexes of store.
+
+    Preconditions:
+        - province != ''
+        - province in store.region_index
+    """
+    years, values = store.series(province, 'TOTAL', 'CO2eq')
+    return [list(range(int(years[0]), int(years[-1]) + 1)), values.tolist()]
+
+
+@instrumentation.stage(items=len)
 def temp_anomaly(temp_data: Dict[str, List[float]]) -> List[List[Any]]:
     """Transform the given temp_data into a list of years and calculated temperature anomaly.
 
@@ -111,13 +184,27 @@ def temp_anomaly(temp_data: Dict[str, List[float]]) -> List[List[Any]]:
         - temp_data is a dictionary with years as keys and list of daily temperatures for that year,
          in the returned format from user_interface.read_temp_data()
     """
-    new_data = []
+    annual_means = {}
     for year in temp_data:
         total = 0
         for temp in temp_data[year]:
             total += temp
-        average = total / len(temp_data[year])
-        new_data.append([year, average])
+        annual_means[year] = total / len(temp_data[year])
+
+    return annual_temp_anomaly(annual_means)
+
+
+def annual_temp_anomaly(annual_means: Dict[Any, float]) -> List[List[Any]]:
+    """Return the list of years and temperature anomalies of temp_anomaly, given the mean
+    temperature in each year instead of the daily temperatures.
+
+    >>> annual_temp_anomaly({1990: 1.0, 1991: 3.0})
+    [[1990, -1.0], [1991, 1.0]]
+
+    Preconditions:
+        - annual_means != {}
+    """
+    new_data = [[year, annual_means[year]] for year in annual_means]
 
     av = 0
     for day in new_data:
@@ -130,6 +217,23 @@ def temp_anomaly(temp_data: Dict[str, List[float]]) -> List[List[Any]]:
     return new_data
 
 
+def iter_temp_anomalies(stations: Iterable[Tuple[Any, Dict[Any, List[float]]]]) \
+        -> Iterator[Tuple[Any, List[List[Any]]]]:
+    """Yield the key of each station in stations together with its temperature anomaly as returned
+    by temp_anomaly, one station at a time. Stations with no temperatures are skipped.
+
+    stations can be a generator such as data_reading.iter_daily_mean_temps, so the daily
+    temperatures of only one station are in memory at a time.
+
+    >>> list(iter_temp_anomalies(iter([('A', {1990: [1.0], 1991: [3.0]}), ('B', {})])))
+    [('A', [[1990, -1.0], [1991, 1.0]])]
+    """
+    for key, temp_data in stations:
+        if temp_data != {}:
+            yield (key, temp_anomaly(temp_data))
+
+
+@instrumentation.stage(items=lambda values: len(values[0]))
 def values_for_temp_plot(temp_data: Dict[str, List[float]]) -> List[List[Any]]:
     """
     Return the values required to plot temperature data.
@@ -146,13 +250,31 @@ def values_for_temp_plot(temp_data: Dict[str, List[float]]) -> List[List[Any]]:
     return [years, temps]
 
 
+@instrumentation.stage(items=lambda values: len(values[0]))
+def values_for_anomaly_plot(anomalies: Dict[Any, float]) -> List[List[Any]]:
+    """
+    Return the values required to plot temperature data, given the temperature anomaly in each
+    year. Years without an anomaly are left out of the plot.
+
+    >>> values_for_anomaly_plot({1990: -1.0, 1992: 1.0})
+    [[1990, 1992], [-1.0, 1.0]]
+
+    Preconditions:
+        - anomalies != {}
+    """
+    years = [int(year) for year in anomalies]
+    temps = [anomalies[year] for year in anomalies]
+    return [years, temps]
+
+
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
         # the names (strs) of imported modules
         'extra-imports': ['typing', 'plotly.graph_objects', 'python_ta',
-                          'python_ta.contracts', 'plotly.subplots'],
+                          'python_ta.contracts', 'plotly.subplots', 'emissions_store',
+                          'instrumentation'],
         # the names (strs) of functions that call print/open/input
         'allowed-io': [],
         'max-line-length': 100,
@@ -3,6 +3,8 @@
 Description
 ===============================
 This module reads the raw data from the csv and txt files and converts them into a usable format.
+The greenhouse gases csv is parsed once into an emissions_store.EmissionsStore, and the readers for
+it below are views over that store.
 WARNING: IT TAKES QUITE A LONG TIME TO RUN
 
 Copyright and Usage Information
@@ -17,11 +19,26 @@ please consult our Course Syllabus.
 This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
 """
 
-from typing import List, Any, Dict, Tuple
-import csv
+from typing import List, Any, Dict, Iterator, Optional, Tuple
+import functools
+import json
 import os
+import re
+import numpy as np
+import emissions_store
+import imputation
+import instrumentation
 
+# the range of years that is read from the daily mean temperature files
+FIRST_YEAR = 1990
+LAST_YEAR = 2018
 
+# the amount of numbers in each line of a daily mean temperature file: the year, the month and the
+# temperature of each of the 31 days
+NUMBERS_PER_LINE = 33
+
+
+@instrumentation.stage(items=len)
 def read_ghg_emissions_for_maps(filename: str) -> Dict[Any, List[float]]:
     """Read and return the csv of the greenhouse gases dataset as a dictionary. The file is
     specified by the filename inputted. The keys of the returned dictionary are years from 1990 to
@@ -32,32 +49,26 @@ def read_ghg_emissions_for_maps(filename: str) -> Dict[Any, List[float]]:
         - filename is in the format 'GHG_IPCC_Can_Prov_Terr.csv'
     """
 
-    with open(filename) as file:
-        reader = csv.reader(file)
-
-        # Skip header row
-        next(reader)
+    store = emissions_store.load_emissions_store(filename)
 
-        data_so_far = {}
-        for row in reader:
-            if int(row[0]) >= 1990 and row[3] == 'TOTAL':
-                if int(row[0]) not in data_so_far:
-                    data_so_far[int(row[0])] = []
-                list.append(data_so_far[int(row[0])], float(row[-2]))
-
-        for year in range(1990, 1999):
-            list.insert(data_so_far[year], 7, data_so_far[year][6])
+    data_so_far = {}
+    for year in sorted(year for year in store.year_index if year >= 1990):
+        rows = store.rows(category='TOTAL', first_year=year, last_year=year)
+        data_so_far[year] = store.gases['CO2eq'][rows].tolist()
 
-        # remove the values that contain the total emissions for Canada
-        for year in data_so_far:
-            list.pop(data_so_far[year], 2)
+    # make the Nunavut emission values the same as Northwest Territories before Nunavut was
+    # founded in 1999 since it was a part of Northwest Territories
+    for year in range(1990, 1999):
+        list.insert(data_so_far[year], 7, data_so_far[year][6])
 
-        # make the Nunavut emission values the same as Northwest Territories before Nunavut was
-        # founded in 1999 since it was a part of Northwest Territories
+    # remove the values that contain the total emissions for Canada
+    for year in data_so_far:
+        list.pop(data_so_far[year], 2)
 
     return data_so_far
 
 
+@instrumentation.stage(items=len)
 def read_ghg_emissions(filename: str) -> List[List[Any]]:
     """Read and return the csv of the greenhouse gases dataset as a nested list, with the inner list
     containing the year (an integer), province (a string), and CO2 equivalent of greenhouse gas
@@ -67,24 +78,15 @@ def read_ghg_emissions(filename: str) -> List[List[Any]]:
         - filename is in the format 'GHG_IPCC_Can_Prov_Terr.csv'
     """
 
-    with open(filename) as file:
-        reader = csv.reader(file)
+    store = emissions_store.load_emissions_store(filename)
+    rows = store.rows(category='TOTAL')
 
-        # Skip header row
-        next(reader)
-
-        data_so_far = []
-        for row in reader:
-            if row[3] == 'TOTAL':
-                new_row = []
-                list.append(new_row, int(row[0]))
-                list.append(new_row, row[1])
-                list.append(new_row, float(row[-2]))
-                list.append(data_so_far, new_row)
-
-    return data_so_far
+    return [[year, region, emissions] for year, region, emissions in
+            zip(store.years[rows].tolist(), store.regions[rows].tolist(),
+                store.gases['CO2eq'][rows].tolist())]
 
 
+@instrumentation.stage(items=len)
 def read_daily_mean_temps_all_files_for_maps(file_path: str, directory: str) -> \
         Dict[Tuple[str, str, str], Dict[int, List[float]]]:
     """Read and return the data in ALL of the text files that represent different locations in
@@ -106,24 +108,11 @@ def read_daily_mean_temps_all_files_for_maps(file_path: str, directory: str) ->
             \\CSC110\\miscellaneous\\Final Project\\daily_mean_temps'
     """
 
-    files = os.listdir(directory)
-
-    data_so_far = {}
-    for file_name in files:
-        f = open(file_path + file_name, 'r')
-
-        # get the station name and the province
-        first_line = f.readline()
-        first_line_list = str.split(first_line, ',')
-
-        location_key = (str.strip(first_line_list[0]), str.strip(first_line_list[1]),
-                        str.strip(first_line_list[2]))
-        years_and_temps = read_daily_mean_temps_one_file(file_path + file_name)
-        data_so_far[location_key] = years_and_temps
-
-    return data_so_far
+    return {make_location_key(first_line_list, True): years_and_temps
+            for first_line_list, years_and_temps in read_all_stations(file_path, directory)}
 
 
+@instrumentation.stage(items=len)
 def read_daily_mean_temps_all_files(file_path: str, directory: str) -> \
         Dict[Tuple[str, str], Dict[int, List[float]]]:
     """Read and return the data in ALL of the text files that represent different locations in
@@ -145,21 +134,97 @@ def read_daily_mean_temps_all_files(file_path: str, directory: str) -> \
             \\CSC110\\miscellaneous\\Final Project\\daily_mean_temps'
     """
 
-    files = os.listdir(directory)
+    return {make_location_key(first_line_list, False): years_and_temps
+            for first_line_list, years_and_temps in read_all_stations(file_path, directory)}
 
-    data_so_far = {}
-    for file_name in files:
-        f = open(file_path + file_name, 'r')
 
-        # get the station name and the province
-        first_line = f.readline()
-        first_line_list = str.split(first_line, ',')
+@instrumentation.stage(items=lambda dictionaries: len(dictionaries[0]))
+def read_daily_mean_temps_all_files_both(file_path: str, directory: str) -> \
+        Tuple[Dict[Tuple[str, str], Dict[int, List[float]]],
+              Dict[Tuple[str, str, str], Dict[int, List[float]]]]:
+    """Return the dictionaries of read_daily_mean_temps_all_files and
+    read_daily_mean_temps_all_files_for_maps, in that order, while only reading each of the files
+    once. Both dictionaries share the same inner dictionaries of temperatures.
 
-        location_key = (str.strip(first_line_list[1], ' '), str.strip(first_line_list[2], ' '))
-        years_and_temps = read_daily_mean_temps_one_file(file_path + file_name)
-        data_so_far[location_key] = years_and_temps
+    Preconditions:
+        - file_path and directory are in the same format as in read_daily_mean_temps_all_files
+    """
 
-    return data_so_far
+    return make_both_dictionaries(read_all_stations(file_path, directory))
+
+
+def iter_daily_mean_temps(file_path: str, directory: str) -> \
+        Iterator[Tuple[List[str], Dict[int, List[float]]]]:
+    """Yield the fields of the first line of each text file in directory together with its
+    temperatures as returned by read_daily_mean_temps_one_file, one file at a time.
+
+    Only the station that is being yielded is held in memory, so the whole directory can be
+    processed by consumers such as maps.annual_mean_temps or write_daily_mean_temps_json without
+    building the dictionary of every station first.
+
+    Preconditions:
+        - file_path and directory are in the same format as in read_daily_mean_temps_all_files
+    """
+
+    for first_line_list, arrays in iter_daily_mean_temps_arrays(file_path, directory):
+        yield (first_line_list, make_years_dictionary(arrays[0], arrays[1], arrays[2]))
+
+
+def iter_daily_mean_temps_arrays(file_path: str, directory: str, first_year: int = FIRST_YEAR,
+                                 last_year: int = LAST_YEAR) -> \
+        Iterator[Tuple[List[str], Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]]:
+    """Yield the fields of the first line of each text file in directory together with its
+    temperatures from first_year to last_year as returned by read_daily_mean_temps_array, one file
+    at a time in the order of their names.
+
+    Preconditions:
+        - file_path and directory are in the same format as in read_daily_mean_temps_all_files
+        - first_year <= last_year
+    """
+
+    for file_name in sorted(os.listdir(directory)):
+        # get the station id, the station name and the province
+        first_line_list = read_station_header(file_path + file_name)
+        yield (first_line_list,
+               read_daily_mean_temps_array(file_path + file_name, first_year, last_year))
+
+
+@instrumentation.stage()
+def write_daily_mean_temps_json(file_path: str, directory: str, data_file_name: str,
+                                maps_file_name: str,
+                                aggregates_file_name: Optional[str] = None) -> None:
+    """Write the data in ALL of the text files in directory to data_file_name, in the format of
+    'data.json', and to maps_file_name, in the format of 'data_for_maps_since_1990.json', while only
+    reading each of the files once. If aggregates_file_name is not None, the annual statistics of
+    the stations are saved under it as well, in the format of annual_aggregates.
+
+    Both files are written one station at a time as the files are read.
+
+    Preconditions:
+        - file_path and directory are in the same format as in read_daily_mean_temps_all_files
+    """
+    # annual_aggregates imports this module, so it is only imported once both are loaded
+    import annual_aggregates
+
+    builder = annual_aggregates.AnnualAggregatesBuilder(FIRST_YEAR, LAST_YEAR)
+    with open(data_file_name, 'w') as data_file, open(maps_file_name, 'w') as maps_file:
+        for file in (data_file, maps_file):
+            file.write('{')
+
+        for index, (first_line_list, arrays) in \
+                enumerate(iter_daily_mean_temps_arrays(file_path, directory)):
+            temps_json = json.dumps(make_years_dictionary(arrays[0], arrays[1], arrays[2]))
+            for file, for_maps in ((data_file, False), (maps_file, True)):
+                key_json = json.dumps(str(make_location_key(first_line_list, for_maps)))
+                file.write((', ' if index > 0 else '') + key_json + ': ' + temps_json)
+            if aggregates_file_name is not None:
+                builder.add(make_location_key(first_line_list, True), *arrays)
+
+        for file in (data_file, maps_file):
+            file.write('}')
+
+    if aggregates_file_name is not None:
+        builder.save(aggregates_file_name)
 
 
 ###############################
@@ -167,35 +232,127 @@ def read_daily_mean_temps_all_files(file_path: str, directory: str) -> \
 ###############################
 
 
-def read_daily_mean_temps_one_file(filename: str) -> Dict[int, List[float]]:
+def read_all_stations(file_path: str, directory: str) -> \
+        List[Tuple[List[str], Dict[int, List[float]]]]:
+    """Return the fields of the first line of every text file in directory together with its
+    temperatures as returned by read_daily_mean_temps_one_file. This is the single pass over the
+    files that every reader of the directory shares.
+
+    Preconditions:
+        - file_path and directory are in the same format as in read_daily_mean_temps_all_files
+    """
+
+    return list(iter_daily_mean_temps(file_path, directory))
+
+
+def make_location_key(first_line_list: List[str], for_maps: bool) -> tuple:
+    """Return the key of a station given the fields of the first line of its file. The key is
+    (station id, station name, province) as in read_daily_mean_temps_all_files_for_maps if for_maps
+    is True, and (station name, province) as in read_daily_mean_temps_all_files otherwise.
+
+    >>> make_location_key(['1012475', ' ABBOTSFORD', ' BC', ' Daily\\n'], True)
+    ('1012475', 'ABBOTSFORD', 'BC')
+    >>> make_location_key(['1012475', ' ABBOTSFORD', ' BC', ' Daily\\n'], False)
+    ('ABBOTSFORD', 'BC')
+    """
+
+    if for_maps:
+        return (str.strip(first_line_list[0]), str.strip(first_line_list[1]),
+                str.strip(first_line_list[2]))
+    else:
+        return (str.strip(first_line_list[1], ' '), str.strip(first_line_list[2], ' '))
+
+
+def make_both_dictionaries(stations: List[Tuple[List[str], Dict[int, List[float]]]]) -> \
+        Tuple[Dict[Tuple[str, str], Dict[int, List[float]]],
+              Dict[Tuple[str, str, str], Dict[int, List[float]]]]:
+    """Return the dictionaries of read_daily_mean_temps_all_files and
+    read_daily_mean_temps_all_files_for_maps given the stations returned by read_all_stations.
+    """
+
+    data_so_far = {}
+    data_for_maps_so_far = {}
+    for first_line_list, years_and_temps in stations:
+        data_so_far[make_location_key(first_line_list, False)] = years_and_temps
+        data_for_maps_so_far[make_location_key(first_line_list, True)] = years_and_temps
+
+    return (data_so_far, data_for_maps_so_far)
+
+
+def read_station_header(filename: str) -> List[str]:
+    """Return the comma separated fields of the first line of the file called filename. The first
+    three fields are the station id, the station name and the province or territory that the station
+    is in.
+
+    Preconditions:
+        - file_name is a txt file with the same format as 'dm112FN0M.txt'
+    """
+
+    with open(filename) as f:
+        first_line = f.readline()
+
+    return str.split(first_line, ',')
+
+
+def read_daily_mean_temps_one_file(filename: str, first_year: int = FIRST_YEAR,
+                                   last_year: int = LAST_YEAR) -> Dict[int, List[float]]:
     """Reads and returns the temperature data as a dictionary in the file called filename. The key
     of this dictionary is the year and the value of this dictionary is a list of all the
-    temperatures for every day of that year.
+    temperatures for every day of that year, from first_year to last_year.
 
     Preconditions:
         - file_name is a txt file with the same format as 'dm112FN0M.txt'
+        - first_year <= last_year
     """
 
-    f = open(filename)
-    lines = f.readlines()
+    years, days_in_each_year, temperatures, _ = \
+        read_daily_mean_temps_array(filename, first_year, last_year)
+
+    return make_years_dictionary(years, days_in_each_year, temperatures)
+
+
+@instrumentation.stage(items=lambda arrays: len(arrays[2]))
+def read_daily_mean_temps_array(filename: str, first_year: int = FIRST_YEAR,
+                                last_year: int = LAST_YEAR, strategy: str = 'midpoint') \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the temperature data in the file called filename from first_year to last_year as a
+    tuple of arrays: the years, the number of days in each year, the temperature of every day in
+    chronological order, and whether the temperature of each day was missing from the file. The
+    missing temperatures are filled in by imputation.impute with the given strategy.
+
+    If the file does not cover all of first_year to last_year, all four arrays are empty.
+
+    Preconditions:
+        - file_name is a txt file with the same format as 'dm112FN0M.txt'
+        - first_year <= last_year
+        - strategy in imputation.STRATEGIES
+    """
+
+    with open(filename, 'rb') as f:
+        buffer = f.read()
 
     # get rid of the first four lines of the text file, they are headers for the table
-    for _ in range(4):
-        list.pop(lines, 0)
+    table = bytes.split(buffer, b'\n', 4)[4]
 
-    row_data = convert_data_to_list(lines)
+    row_data = convert_data_to_array(table, first_year, last_year)
 
-    # check that the data contains the appropriate range i.e. from January 1990 to December 2018.
-    # If it doesnt, do a early return of an empty dictionary
+    # check that the data contains the appropriate range i.e. from January of first_year to
+    # December of last_year. If it doesnt, do a early return of empty arrays
     if not (row_data[1] and row_data[2]):
-        return {}
+        return (np.array([], dtype=np.int64), np.array([], dtype=np.int64),
+                np.array([], dtype=np.float64), np.array([], dtype=bool))
 
-    data_dictionary = make_data_dictionary(row_data[0])
-    new_data = substitute_outliers(data_dictionary)
+    years, days_in_each_year, temperatures = expand_days(row_data[0])
 
-    return new_data
+    was_missing = temperatures == imputation.MISSING_VALUE
+    day_of_year = imputation.day_of_year_keys(days_in_each_year.tolist()) \
+        if strategy == 'climatology' else None
+    temperatures = imputation.impute(temperatures, strategy, was_missing, day_of_year)
 
+    return (years, days_in_each_year, temperatures, was_missing)
 
+
+@instrumentation.stage(items=lambda row_data: len(row_data[0]))
 def convert_data_to_list(lines: List[str]) -> Tuple[List[List[float]], bool, bool]:
     """Return a tuple that contains lines as a nested list, a boolean that represents whether or not
     the start date of the range (January 1990) is in the list, and a boolean that represents whether
@@ -205,181 +362,286 @@ def convert_data_to_list(lines: List[str]) -> Tuple[List[List[float]], bool, boo
         - the lines of the list are in the format of a line in 'dm112FN0M.txt'
     """
 
-    contains_data_range_start = False
-    contains_data_range_end = False
+    row_data = convert_data_to_array(str.encode(''.join(lines)))
+    return (row_data[0].tolist(), row_data[1], row_data[2])
+
+
+def convert_data_to_array(table: bytes, first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR) \
+        -> Tuple[np.ndarray, bool, bool]:
+    """Return a tuple that contains the rows of table from first_year to last_year as a 2D array, a
+    boolean that represents whether or not January of first_year is in the array, and a boolean that
+    represents whether or not December of last_year is in the array.
 
-    data_as_list_so_far = []
-    # by the end of this loop, there is a nested list that represents the text data
-    for line in lines:
-        if 1990 <= int(line[1:5]) <= 2018:
-            # replace any character in the alphabet - the only ones that are in the files are the
-            # ones below
-            line = str.replace(line, 'M', ' ')
-            line = str.replace(line, 'E', ' ')
-            line = str.replace(line, 'a', ' ')
+    Each row of the array is the year, the month and the 31 daily temperatures of one line of table.
 
-            # a list of all the numbers in a line of the text
-            line_list = [float(num) for num in str.split(line) if num != '\n']
-            list.append(data_as_list_so_far, line_list)
+    Preconditions:
+        - table is the contents of a file in the format of 'dm112FN0M.txt' without the first four
+          lines
+    """
 
-            # check that the start and the end of the range of dates is in the list
-            if line_list[0] == 1990 and line_list[1] == 1:
-                contains_data_range_start = True
-            if line_list[0] == 2018 and line_list[1] == 12:
-                contains_data_range_end = True
+    rows = decode_table(table, first_year, last_year)
+
+    # check that the start and the end of the range of dates is in the array
+    contains_data_range_start = bool(np.any((rows[:, 0] == first_year) & (rows[:, 1] == 1)))
+    contains_data_range_end = bool(np.any((rows[:, 0] == last_year) & (rows[:, 1] == 12)))
+
+    return (rows, contains_data_range_start, contains_data_range_end)
+
+
+def decode_table(table: bytes, first_year: Optional[int] = None,
+                 last_year: Optional[int] = None) -> np.ndarray:
+    """Return the numbers in table as a 2D array with one row for each line of table whose year (its
+    first number) is between first_year and last_year inclusive. If first_year or last_year is None,
+    the years are not limited in that direction.
+
+    The lines of the files are fixed width, so the whole table is decoded at once as a grid of
+    characters: the digits are weighted by their place value according to the layout of the first
+    line and summed with a single matrix product. If the lines of table do not all have the same
+    layout, the table is split on whitespace instead. The flags M, E and a that follow some of the
+    temperatures are ignored either way.
+
+    >>> decode_table(b' 1990  1   -12.5M     3.0 \\n 1991  2    -0.4     10.0a\\n').tolist()
+    [[1990.0, 1.0, -12.5, 3.0], [1991.0, 2.0, -0.4, 10.0]]
+    >>> decode_table(b' 1990  1   -12.5M     3.0 \\n 1991  2    -0.4     10.0a\\n', 1991).tolist()
+    [[1991.0, 2.0, -0.4, 10.0]]
+
+    Preconditions:
+        - every line of table has the same amount of numbers
+    """
 
-    return (data_as_list_so_far, contains_data_range_start, contains_data_range_end)
+    if table != b'' and not bytes.endswith(table, b'\n'):
+        table = table + b'\n'
 
+    line_length = bytes.find(table, b'\n') + 1
+    fields = tuple((match.end(), bytes.find(table, b'.', match.start(), match.end()))
+                   for match in _NUMBER.finditer(table, 0, line_length))
+    if fields == () or len(table) % line_length != 0:
+        return _select_years(_split_table(table, len(fields) or NUMBERS_PER_LINE), first_year,
+                             last_year)
+
+    place_values, field_spans, scales, dot_columns = _table_layout(line_length, fields)
+    characters = np.frombuffer(table, dtype=np.uint8).reshape(-1, line_length)
+
+    # every decimal point must be where the first line has it
+    is_dot = characters == ord('.')
+    if not np.all(is_dot[:, dot_columns]) or \
+            np.count_nonzero(is_dot) != len(dot_columns) * len(characters):
+        return _select_years(_split_table(table, len(fields) or NUMBERS_PER_LINE), first_year,
+                             last_year)
+
+    digits = characters - np.uint8(ord('0'))
+    digits *= digits < 10
+
+    # only decode the lines from the range of years, which only needs the columns of the year
+    year_end = fields[0][0]
+    years = digits[:, :year_end].astype(np.float32) @ place_values[:year_end, 0]
+    in_range = _years_in_range(years, first_year, last_year)
+    characters = characters[in_range]
+    digits = digits[in_range]
+
+    magnitudes = (digits.astype(np.float32) @ place_values).astype(np.float64) / scales
+    is_negative = (characters == ord('-')).astype(np.float32) @ field_spans > 0
+
+    return np.where(is_negative, -magnitudes, magnitudes)
+
+
+# a number in a line of a file in the format of 'dm112FN0M.txt'
+_NUMBER = re.compile(rb'[-.0-9]+')
+
+# the flags that follow some of the temperatures in a file in the format of 'dm112FN0M.txt'
+_FLAGS = bytes.maketrans(b'MEa', b'   ')
+
+
+@functools.lru_cache(maxsize=64)
+def _table_layout(line_length: int, fields: Tuple[Tuple[int, int], ...]) -> \
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the place value of every character column for every field, the character columns that
+    make up every field, the power of ten that every field is divided by, and the columns of the
+    decimal points, given the line_length and the (end column, decimal point column) of every
+    number in a line. A field runs from the end of the previous number to the end of its own, so a
+    longer number than the one in the first line still falls inside it.
+    """
+
+    place_values = np.zeros((line_length, len(fields)), dtype=np.float32)
+    field_spans = np.zeros((line_length, len(fields)), dtype=np.float32)
+    scales = np.ones(len(fields), dtype=np.float64)
+
+    previous_end = 0
+    for field, (end, dot) in enumerate(fields):
+        if dot != -1:
+            scales[field] = 10.0 ** (end - dot - 1)
+        for column in range(previous_end, end):
+            if column != dot:
+                # the decimal point does not take up a place value
+                place = end - 1 - column - (1 if column < dot else 0)
+                place_values[column, field] = 10.0 ** place
+        field_spans[previous_end:end, field] = 1
+        previous_end = end
+
+    dot_columns = np.array([dot for _, dot in fields if dot != -1], dtype=np.int64)
+    return (place_values, field_spans, scales, dot_columns)
+
+
+def _years_in_range(years: np.ndarray, first_year: Optional[int],
+                    last_year: Optional[int]) -> np.ndarray:
+    """Return a boolean array of which of years are between first_year and last_year inclusive,
+    where None does not limit the years in that direction.
+    """
+
+    in_range = np.ones(len(years), dtype=bool)
+    if first_year is not None:
+        in_range &= years >= first_year
+    if last_year is not None:
+        in_range &= years <= last_year
+    return in_range
+
+
+def _select_years(rows: np.ndarray, first_year: Optional[int],
+                  last_year: Optional[int]) -> np.ndarray:
+    """Return the rows whose first number is between first_year and last_year inclusive, where None
+    does not limit the years in that direction.
+    """
 
+    return rows[_years_in_range(rows[:, 0], first_year, last_year)]
+
+
+def _split_table(table: bytes, numbers_per_line: int) -> np.ndarray:
+    """Return every number in table as a 2D array with numbers_per_line columns by splitting table
+    on whitespace.
+    """
+
+    numbers = bytes.split(bytes.translate(table, _FLAGS))
+    return np.array(numbers, dtype=np.float64).reshape(-1, numbers_per_line)
+
+
+@instrumentation.stage(items=len)
 def make_data_dictionary(data_as_list: List[List[float]]) -> Dict[int, List[float]]:
     """Return a dictionary that represents data_as_list. The key of the returned dictionary will be
     an int representing the year. The corresponding value will be a list of all the average
     temperatures in that year, in chronological order, starting from January 1.
 
     Preconditions:
-        - 1990 <= row[0] <= 2018
         - 1 <= row[1] <= 12
         - len(row) == 33
+        - the rows are in chronological order
     """
 
-    leap_years_since_1990 = [2000, 2004, 2008, 2012, 2016]
-    months_with_30_days = [4, 6, 9, 11]
-
-    data_as_dictionary_so_far = {}
-    current_year = 1990 - 1
-    for row in data_as_list:
-        if row[0] != current_year:
-            current_year = current_year + 1
-            data_as_dictionary_so_far[current_year] = []
-
-        month = row[1]
-
-        # every month has 31 entries in it, regardless of if the month has 31 days.
-        # remove the entries for non-existent days (such as April 31)
-        if month in months_with_30_days:
-            for i in range(2, len(row) - 1):
-                list.append(data_as_dictionary_so_far[current_year], row[i])
-        elif month == 2 and current_year in leap_years_since_1990:
-            for i in range(2, len(row) - 2):
-                list.append(data_as_dictionary_so_far[current_year], row[i])
-        elif month == 2 and current_year not in leap_years_since_1990:
-            for i in range(2, len(row) - 3):
-                list.append(data_as_dictionary_so_far[current_year], row[i])
-        else:
-            for i in range(2, len(row)):
-                list.append(data_as_dictionary_so_far[current_year], row[i])
-
-    return data_as_dictionary_so_far
-
-
-def substitute_outliers(data_as_dictionary: Dict[int, List[float]]) -> Dict[int, List[float]]:
-    """Return a new dictionary with the outlier values in data_as_dicionary substituted. The key of
-    the returned dictionary will be an int representing the year. The corresponding value will be a
-    list of all the average temperatures in that year, in chronological order, starting from January
-    1.
+    if data_as_list == []:
+        return {}
+
+    return make_years_dictionary(*expand_days(np.array(data_as_list, dtype=np.float64)))
+
+
+def expand_days(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the years in rows, the number of days in each of those years, and the temperature of
+    every day in rows in chronological order.
+
+    Every row has 31 entries for the days of its month, regardless of if the month has 31 days. The
+    entries for non-existent days (such as April 31) are removed all at once by selecting the
+    days of calendar_mask from the grid of rows.
+
+    >>> rows = np.array([[2000, 2] + list(range(1, 32)), [2000, 4] + list(range(1, 32))])
+    >>> years, days_in_each_year, temperatures = expand_days(rows)
+    >>> years.tolist(), days_in_each_year.tolist(), len(temperatures), temperatures[28].tolist()
+    ([2000], [59], 59, 29.0)
 
     Preconditions:
-        - all(1990 <= year <= 2018 for year in data_as_dictionary)
-        - the only outlier value is -9999.9
+        - len(rows) > 0
+        - all(1 <= row[1] <= 12 for row in rows)
+        - rows.shape[1] == 33
+        - the rows are in chronological order
     """
 
-    # make a comprehensive list that includes all the temperatures
-    all_temperatures = []
-    for year in range(1990, 2019):
-        for temperature in data_as_dictionary[year]:
-            list.append(all_temperatures, temperature)
-        list.append(all_temperatures, 'YEAR CHANGE')
-
-    # determine the indices of all_temperatures at which the outlier values are
-    outlier_indices_and_avg_temp = find_outlier_indices(all_temperatures)
+    row_years = rows[:, 0].astype(np.int64)
+    row_months = rows[:, 1].astype(np.int64)
+    first_year = int(row_years[0])
+    last_year = int(row_years[-1])
 
-    # replace all the indices in the outlier indices with average temp
-    replace_outlier_temps(all_temperatures, outlier_indices_and_avg_temp)
+    mask = calendar_mask(first_year, last_year)[(row_years - first_year) * 12 + row_months - 1]
+    temperatures = rows[:, 2:][mask].astype(np.float64)
 
-    # make the list into a dictionary format again
-    new_data = convert_list_to_dictionary(all_temperatures)
+    years, year_of_row = np.unique(row_years, return_inverse=True)
+    days_in_each_year = np.bincount(year_of_row, weights=np.count_nonzero(mask, axis=1))
 
-    return new_data
+    return (years, days_in_each_year.astype(np.int64), temperatures)
 
 
-def find_outlier_indices(all_temperatures: List[Any]) -> List[Tuple[List[int], float]]:
-    """Return a list of tuples given all_temperatures. The first element of the tuple represents the
-    list of consecutive indices at which there were outlier temperatures. The second element of the
-    tuple represents the average temperature of the nearest non-outlier temperature before and after
-    a particular outlier group.
+@functools.lru_cache(maxsize=16)
+def calendar_mask(first_year: int, last_year: int) -> np.ndarray:
+    """Return a boolean array with a row for every month from January of first_year to December of
+    last_year and a column for each of the 31 days a month can have. An entry is True if that day
+    exists in that month, following the leap year rule of the Gregorian calendar.
 
-    If the first element of the list is an outlier, take the closest true temperature recorded
-    after. If the last element of the list is an outlier, take the closest true temperature recorded
-    before.
+    >>> mask = calendar_mask(1900, 2000)
+    >>> [int(sum(mask[year * 12 + 1])) for year in [0, 100]]
+    [28, 29]
+    >>> int(mask.sum())
+    36890
 
     Preconditions:
-        - the only outlier value is -9999.9
+        - first_year <= last_year
     """
 
-    outlier_indices_and_avg_temp = []
-    for temp_index in range(len(all_temperatures)):
-        outlier_indices = []
-        if all_temperatures[temp_index] == -9999.9:
-
-            # find the first true temperature that comes after the outlier value
-            first_true_temperature = -9999.9
-            i = temp_index
-            while first_true_temperature in (-9999.9, 'YEAR CHANGE') \
-                    and i != len(all_temperatures) - 1:
-                first_true_temperature = all_temperatures[i]
-                list.append(outlier_indices, i)
-                i = i + 1
-
-            # find the last true temperature that comes before the outlier value
-            last_true_temperature = -9999.9
-            j = temp_index - 1
-            while last_true_temperature in (-9999.9, 'YEAR CHANGE') and j != 0:
-                last_true_temperature = all_temperatures[j]
-                list.append(outlier_indices, j)
-                j = j - 1
-
-            list.sort(outlier_indices)
-
-            # calculate the average temperature based on where the outlier value was
-            if i != len(all_temperatures) - 1 and j != 0:
-                average_temperature = (first_true_temperature + last_true_temperature) / 2
-            elif i == len(all_temperatures) - 1 and j != 0:
-                average_temperature = last_true_temperature
-            else:
-                average_temperature = first_true_temperature
-            list.append(outlier_indices_and_avg_temp, (outlier_indices, average_temperature))
-
-    return outlier_indices_and_avg_temp
-
-
-def replace_outlier_temps(all_temperatures: List[Any],
-                          outlier_indices_and_avg_temp: List[Tuple[List[int], float]]) -> None:
-    """Mutate the list so that all the indices in all_temperatures that are outliers are replaced by
-    the average temperature found in find_outlier_indices.
+    years = np.repeat(np.arange(first_year, last_year + 1), 12)
+    months = np.tile(np.arange(12), last_year - first_year + 1)
+    is_leap_year = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+
+    days_in_month = _DAYS_IN_MONTH[months] + ((months == 1) & is_leap_year)
+    mask = np.arange(31)[None, :] < days_in_month[:, None]
+
+    # the cached array is shared, so make sure that it is not changed by mistake
+    mask.flags.writeable = False
+    return mask
+
+
+# the number of days in each month of a year that is not a leap year
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def make_years_dictionary(years: np.ndarray, days_in_each_year: np.ndarray,
+                          temperatures: np.ndarray) -> Dict[int, List[float]]:
+    """Return a dictionary mapping each of years to a list of its temperatures, given the number of
+    days in each year and the temperatures of all the years one after the other.
+
+    >>> make_years_dictionary(np.array([1990, 1991]), np.array([2, 1]), np.array([1.0, 2.0, 3.0]))
+    {1990: [1.0, 2.0], 1991: [3.0]}
     """
 
-    for outlier in outlier_indices_and_avg_temp:
-        for index in outlier[0]:
-            if all_temperatures[index] != 'YEAR CHANGE':
-                all_temperatures[index] = outlier[1]
+    year_temperatures = np.split(temperatures, np.cumsum(days_in_each_year)[:-1]) \
+        if len(years) > 0 else []
+    return {year: temperatures_in_year.tolist()
+            for year, temperatures_in_year in zip(years.tolist(), year_temperatures)}
+
 
+@instrumentation.stage(items=len)
+def substitute_outliers(data_as_dictionary: Dict[int, List[float]],
+                        strategy: str = 'midpoint') -> Dict[int, List[float]]:
+    """Return a new dictionary with the outlier values in data_as_dicionary substituted. The key of
+    the returned dictionary will be an int representing the year. The corresponding value will be a
+    list of all the average temperatures in that year, in chronological order, starting from January
+    1.
+
+    The outlier values are filled in by imputation.impute with the given strategy. By default, each
+    group of outliers takes the average of the nearest non-outlier temperature before and after it.
 
-def convert_list_to_dictionary(all_temperatures: List[Any]) -> Dict[int, List[float]]:
-    """Return a dictionary representing the data in all_temperatures. The key of the
-    returned dictionary will be an int representing the year. The corresponding value will be a list
-    of all the average temperatures in that year, in chronological order, starting from January 1.
+    Preconditions:
+        - the years of data_as_dictionary are consecutive and in increasing order
+        - the only outlier value is -9999.9
+        - strategy in imputation.STRATEGIES
     """
 
-    data_as_dictionary_so_far = {}
-    i = 0
-    for year in range(1990, 2019):
-        data_as_dictionary_so_far[year] = []
-        while all_temperatures[i] != 'YEAR CHANGE':
-            list.append(data_as_dictionary_so_far[year], all_temperatures[i])
-            i = i + 1
-        # skip over the 'YEAR CHANGE' placeholder in all_temperatures
-        i = i + 1
-    return data_as_dictionary_so_far
+    # make a comprehensive array that includes all the temperatures
+    years = list(data_as_dictionary)
+    days_in_each_year = [len(data_as_dictionary[year]) for year in years]
+    all_temperatures = np.array([temperature for year in years
+                                 for temperature in data_as_dictionary[year]], dtype=np.float64)
+
+    day_of_year = imputation.day_of_year_keys(days_in_each_year) if strategy == 'climatology' \
+        else None
+    all_temperatures = imputation.impute(all_temperatures, strategy, day_of_year=day_of_year)
+
+    # make the array into a dictionary format again
+    return make_years_dictionary(np.array(years), np.array(days_in_each_year), all_temperatures)
 
 
 if __name__ == '__main__':
@@ -387,13 +649,14 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         # the names (strs) of imported modules
-        'extra-imports': ['os', 'csv', 'python_ta', 'python_ta.contracts'],
+        'extra-imports': ['functools', 'json', 'os', 're', 'numpy', 'annual_aggregates',
+                          'emissions_store', 'imputation', 'instrumentation', 'python_ta',
+                          'python_ta.contracts'],
         # the names (strs) of functions that call print/open/input
-        'allowed-io': ['read_ghg_emissions', 'read_daily_mean_temps_all_files',
-                       'read_daily_mean_temps_one_file', 'read_ghg_emissions_for_maps',
-                       'read_daily_mean_temps_all_files_for_maps'],
+        'allowed-io': ['read_daily_mean_temps_array', 'read_station_header',
+                       'write_daily_mean_temps_json'],
         'max-line-length': 100,
-        'disable': ['R1705', 'C0200']
+        'disable': ['R1705', 'C0200', 'C0415']
     })
 
     import python_ta.contracts
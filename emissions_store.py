@@ -0,0 +1,226 @@
+"""CSC110 Fall 2020 Final Project, Emissions Store
+
+Description
+===============================
+This module reads the greenhouse gases csv file once and keeps every one of its columns in memory
+as typed numpy arrays. Hash indexes on the region, year and category columns turn a query such as
+"Ontario, TOTAL, 1990 to 2018" into a dictionary lookup instead of a scan of every row in the file.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Dict, Optional, Tuple
+import csv
+import os
+import numpy as np
+import instrumentation
+
+# the columns of 'GHG_IPCC_Can_Prov_Terr.csv' that hold an amount of gas
+GAS_COLUMNS = ['CO2', 'CH4', 'CH4 (CO2eq)', 'N2O', 'N2O (CO2eq)', 'HFCs', 'PFCs', 'SF6', 'NF3',
+               'CO2eq']
+
+# the value used in the csv file for emissions that were not published
+SUPPRESSED_VALUE = 'x'
+
+
+class EmissionsStore:
+    """A columnar copy of the greenhouse gases dataset with hash indexes on region, year and
+    category.
+
+    Row i of the original file (not counting the header) is stored at index i of every column.
+
+    Instance Attributes:
+        - years: the Year column
+        - regions: the Region column
+        - category_ids: the CategoryID column
+        - categories: the Category column
+        - rollups: the Rollup column
+        - gases: maps each name in GAS_COLUMNS to its column, with suppressed values stored as nan
+        - units: the Unit column
+        - region_index: maps each region to the sorted row indices of that region
+        - year_index: maps each year to the sorted row indices of that year
+        - category_index: maps each category to the sorted row indices of that category
+
+    Representation Invariants:
+        - all(len(self.gases[gas]) == len(self.years) for gas in self.gases)
+        - sum(len(rows) for rows in self.region_index.values()) == len(self.years)
+    """
+    years: np.ndarray
+    regions: np.ndarray
+    category_ids: np.ndarray
+    categories: np.ndarray
+    rollups: np.ndarray
+    gases: Dict[str, np.ndarray]
+    units: np.ndarray
+    region_index: Dict[str, np.ndarray]
+    year_index: Dict[int, np.ndarray]
+    category_index: Dict[str, np.ndarray]
+
+    def __init__(self, columns: Dict[str, list]) -> None:
+        """Initialize the store from columns, a dictionary mapping each header of the csv file to
+        the list of raw strings in that column.
+
+        Preconditions:
+            - columns has every header of 'GHG_IPCC_Can_Prov_Terr.csv'
+        """
+        self.years = np.array(columns['Year'], dtype=np.int32)
+        self.regions = np.array(columns['Region'], dtype=str)
+        self.category_ids = np.array(columns['CategoryID'], dtype=np.int32)
+        self.categories = np.array(columns['Category'], dtype=str)
+        self.rollups = np.array(columns['Rollup'], dtype=str) == 'TRUE'
+        self.gases = {gas: np.array([np.nan if value == SUPPRESSED_VALUE else float(value)
+                                     for value in columns[gas]], dtype=np.float64)
+                      for gas in GAS_COLUMNS}
+        self.units = np.array(columns['Unit'], dtype=str)
+
+        self.region_index = _build_index(self.regions)
+        self.year_index = {int(year): rows for year, rows in _build_index(self.years).items()}
+        self.category_index = _build_index(self.categories)
+
+    def __len__(self) -> int:
+        """Return the number of rows in the store."""
+        return len(self.years)
+
+    def rows(self, region: Optional[str] = None, category: Optional[str] = None,
+             first_year: Optional[int] = None, last_year: Optional[int] = None) -> np.ndarray:
+        """Return the sorted row indices that are in region and category and whose year is between
+        first_year and last_year inclusive. An argument that is None does not filter the rows.
+
+        The rows are looked up in the smallest matching index and only those rows are filtered
+        further, so a query never scans the whole store.
+        """
+        candidates = []
+        if region is not None:
+            list.append(candidates, self.region_index.get(region, _NO_ROWS))
+        if category is not None:
+            list.append(candidates, self.category_index.get(category, _NO_ROWS))
+
+        if candidates == []:
+            # only the year index can narrow the search
+            years = [year for year in self.year_index
+                     if (first_year is None or year >= first_year)
+                     and (last_year is None or year <= last_year)]
+            if years == []:
+                return _NO_ROWS
+            return np.sort(np.concatenate([self.year_index[year] for year in years]))
+
+        candidates.sort(key=len)
+        selected = candidates[0]
+        for other in candidates[1:]:
+            selected = selected[np.isin(selected, other, assume_unique=True)]
+
+        if first_year is not None or last_year is not None:
+            selected_years = self.years[selected]
+            in_range = np.ones(len(selected), dtype=bool)
+            if first_year is not None:
+                in_range &= selected_years >= first_year
+            if last_year is not None:
+                in_range &= selected_years <= last_year
+            selected = selected[in_range]
+        return selected
+
+    def series(self, region: str, category: str = 'TOTAL', gas: str = 'CO2eq',
+               first_year: Optional[int] = None, last_year: Optional[int] = None) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """Return the years and the amounts of gas emitted in region for category, in the order in
+        which they appear in the file.
+
+        Preconditions:
+            - gas in GAS_COLUMNS
+        """
+        selected = self.rows(region, category, first_year, last_year)
+        return (self.years[selected], self.gases[gas][selected])
+
+
+# shared empty result for lookups of a key that is not in an index
+_NO_ROWS = np.array([], dtype=np.int64)
+
+# stores that have already been read, keyed by the absolute path of the file
+_LOADED_STORES: Dict[str, Tuple[Tuple[int, float], EmissionsStore]] = {}
+
+
+def load_emissions_store(filename: str) -> EmissionsStore:
+    """Return the EmissionsStore for the csv file called filename.
+
+    The file is only parsed the first time it is asked for, or again if it has changed on disk since
+    it was last parsed.
+
+    Preconditions:
+        - filename is in the format 'GHG_IPCC_Can_Prov_Terr.csv'
+    """
+    path = os.path.abspath(filename)
+    status = os.stat(path)
+    signature = (status.st_size, status.st_mtime)
+
+    if path not in _LOADED_STORES or _LOADED_STORES[path][0] != signature:
+        _LOADED_STORES[path] = (signature, read_emissions_store(path))
+    return _LOADED_STORES[path][1]
+
+
+def clear_cache() -> None:
+    """Forget every store that was read, so that the next call to load_emissions_store reads its
+    file again.
+    """
+    _LOADED_STORES.clear()
+
+
+@instrumentation.stage(items=len)
+def read_emissions_store(filename: str) -> EmissionsStore:
+    """Read every column of the csv file called filename into a new EmissionsStore.
+
+    Preconditions:
+        - filename is in the format 'GHG_IPCC_Can_Prov_Terr.csv'
+    """
+    with open(filename) as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        columns = {name: [] for name in header}
+        column_lists = [columns[name] for name in header]
+        for row in reader:
+            for column, value in zip(column_lists, row):
+                list.append(column, value)
+
+    return EmissionsStore(columns)
+
+
+def _build_index(column: np.ndarray) -> Dict[object, np.ndarray]:
+    """Return a dictionary mapping each distinct value in column to the sorted indices at which it
+    appears.
+    """
+    # a stable sort keeps the indices of each value in increasing order
+    order = np.argsort(column, kind='stable')
+    values, starts = np.unique(column[order], return_index=True)
+    groups = np.split(order, starts[1:])
+    return {value: group for value, group in zip(values.tolist(), groups)}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'csv', 'os', 'numpy', 'instrumentation', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['read_emissions_store'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,218 @@
+"""CSC110 Fall 2020 Final Project, Figure Cache
+
+Description
+===============================
+This module keeps the plotly figures of the maps and graphs once they are built, so that opening
+the same map or graph again does not build it from scratch.
+
+A figure is identified by its kind, such as 'emissions_raw' or 'graph', its subject, such as a
+year or a station, and its baseline. Its version is the size and modification time of the data
+files it is built from, so a figure is built again as soon as one of those files changes.
+
+The most recently used figures are kept in memory, up to a limit. Every figure is also written to
+a directory as a JSON file, which can be read back into a figure, and as an HTML page, which can be
+opened in a browser directly. The pages share one copy of plotly.js in the directory, and both
+files survive when the program is closed. A small version file is written last, so that an entry
+that was interrupted while being written is never used.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Callable, Iterable, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import webbrowser
+import plotly.io as pio
+import geometry
+
+# the number of figures kept in memory; a map with its province borders takes a few megabytes
+DEFAULT_MAX_FIGURES = 16
+
+DEFAULT_DIRECTORY = 'figure_cache'
+
+# a figure as (kind, subject, baseline), such as ('emissions_raw', 2005, 1990)
+FigureKey = Tuple[str, Any, Any]
+
+
+class FigureCache:
+    """A cache of plotly figures in memory and on disk.
+
+    Instance Attributes:
+        - directory: the directory that the figures are written to
+        - max_figures: the largest number of figures kept in memory
+        - figures: maps the key and version of each figure in memory to the figure, from the least
+          to the most recently used
+        - lock: the lock that makes figures safe to use from several threads
+
+    Representation Invariants:
+        - self.max_figures >= 0
+        - len(self.figures) <= self.max_figures
+    """
+    directory: str
+    max_figures: int
+    figures: OrderedDict
+    lock: threading.Lock
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY,
+                 max_figures: int = DEFAULT_MAX_FIGURES) -> None:
+        """Initialize a cache that writes its figures to directory and keeps at most max_figures of
+        them in memory. The directory is created if it does not exist.
+        """
+        self.directory = directory
+        self.max_figures = max_figures
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def figure(self, key: FigureKey, data_files: Iterable[str], build: Callable[[], Any]) -> Any:
+        """Return the figure identified by key that is built from data_files, calling build to
+        build it only if it is neither in memory nor on disk with the current version of
+        data_files. The figure must not be modified.
+        """
+        version = data_version(data_files)
+        memory_key = (key, version)
+        with self.lock:
+            if memory_key in self.figures:
+                self.figures.move_to_end(memory_key)
+                return self.figures[memory_key]
+
+        if self.stored_version(key) == version:
+            with open(self.entry_file_name(key, '.json')) as file:
+                fig = pio.from_json(file.read())
+        else:
+            fig = build()
+            self.store(key, version, fig)
+        self.remember(memory_key, fig)
+        return fig
+
+    def html_file(self, key: FigureKey, data_files: Iterable[str],
+                  build: Callable[[], Any]) -> str:
+        """Return the path of the HTML page of the figure identified by key that is built from
+        data_files, building and writing the figure first only if the page on disk was not made
+        with the current version of data_files.
+        """
+        if self.stored_version(key) != data_version(data_files):
+            self.figure(key, data_files, build)
+        return os.path.abspath(self.entry_file_name(key, '.html'))
+
+    def show(self, key: FigureKey, data_files: Iterable[str], build: Callable[[], Any]) -> None:
+        """Open the HTML page of the figure identified by key that is built from data_files in a
+        browser window, building it first only if it is not up to date on disk.
+        """
+        webbrowser.open(pathlib.Path(self.html_file(key, data_files, build)).as_uri())
+
+    def clear(self) -> None:
+        """Remove every figure from memory and from the directory of this cache."""
+        with self.lock:
+            self.figures.clear()
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(('.html', '.json')):
+                os.remove(os.path.join(self.directory, file_name))
+
+    def stored_version(self, key: FigureKey) -> Optional[Tuple[Any, ...]]:
+        """Return the version of the data files that the figure identified by key was built from
+        when it was written to disk, in the format of data_version, or None if it is not on disk.
+        """
+        try:
+            with open(self.entry_file_name(key, '.version.json')) as file:
+                signatures = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return tuple(None if signature is None else tuple(signature) for signature in signatures)
+
+    def store(self, key: FigureKey, version: Tuple[Any, ...], fig: Any) -> None:
+        """Write fig, identified by key and built from data files with the given version, to the
+        directory of this cache. Each file is written next to its final name and then moved there,
+        and the version file is written last.
+        """
+        temporary_json = self.entry_file_name(key, '.json') + '.tmp'
+        with open(temporary_json, 'w') as file:
+            file.write(pio.to_json(fig))
+        temporary_html = self.entry_file_name(key, '.html') + '.tmp'
+        # the pages all load the plotly.min.js that plotly writes to the directory once
+        pio.write_html(fig, temporary_html, include_plotlyjs='directory')
+        os.replace(temporary_json, self.entry_file_name(key, '.json'))
+        os.replace(temporary_html, self.entry_file_name(key, '.html'))
+
+        temporary_version = self.entry_file_name(key, '.version.json') + '.tmp'
+        with open(temporary_version, 'w') as file:
+            json.dump(version, file)
+        os.replace(temporary_version, self.entry_file_name(key, '.version.json'))
+
+    def remember(self, memory_key: Tuple[FigureKey, Tuple[Any, ...]], fig: Any) -> None:
+        """Keep fig in memory under memory_key, forgetting the least recently used figures if there
+        are more than max_figures.
+        """
+        with self.lock:
+            self.figures[memory_key] = fig
+            self.figures.move_to_end(memory_key)
+            while len(self.figures) > self.max_figures:
+                self.figures.popitem(last=False)
+
+    def entry_file_name(self, key: FigureKey, extension: str) -> str:
+        """Return the name of the file with the given extension of the figure identified by key."""
+        return os.path.join(self.directory, entry_name(key) + extension)
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def data_version(data_files: Iterable[str]) -> Tuple[Any, ...]:
+    """Return the version of data_files, which is the size and modification time of each of them,
+    or None for a file that does not exist.
+
+    >>> data_version(['no_such_file.csv'])
+    (None,)
+    """
+    return tuple(tuple(geometry.file_signature(file_name)) if os.path.exists(file_name) else None
+                 for file_name in data_files)
+
+
+def entry_name(key: FigureKey) -> str:
+    """Return the name, without an extension, of the files of the figure identified by key. The
+    name starts with the kind of the figure and ends with a hash of the whole key.
+
+    >>> entry_name(('graph', ('TORONTO', 'ONT'), None))[:6]
+    'graph_'
+    """
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return str(key[0]) + '_' + digest[:16]
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'collections', 'hashlib', 'json', 'os', 'pathlib',
+                          'threading', 'webbrowser', 'plotly.io', 'geometry', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['FigureCache.figure', 'FigureCache.stored_version', 'FigureCache.store'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
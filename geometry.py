@@ -0,0 +1,290 @@
+"""CSC110 Fall 2020 Final Project, Geometry
+
+Description
+===============================
+This module reads the geojson files of the project, such as 'canada_provinces.geojson' and
+'weather_stations.geojson', once and keeps them for as long as the program runs. It also makes
+simplified versions of the province borders, so that the maps do not have to embed every point of
+the full borders in each figure.
+
+The borders are simplified with the Douglas-Peucker algorithm in a way that keeps the topology of
+the provinces. The rings of every polygon are cut into chains at the points where more than two
+borders meet, and each chain is simplified only once. A border shared by two provinces is therefore
+simplified in exactly the same way for both of them, so no gaps or overlaps appear between them.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Dict, List, Set, Tuple
+import copy
+import json
+import os
+import numpy as np
+import instrumentation
+
+# the largest distance, in degrees, that a simplified border may be from the full border at each
+# resolution
+TOLERANCES = {'full': 0.0, 'high': 0.005, 'medium': 0.02, 'low': 0.08}
+
+DEFAULT_RESOLUTION = 'medium'
+
+# a point of a border as (longitude, latitude)
+Point = Tuple[float, float]
+
+# the parsed geojson files, keyed by their absolute path, with the (size, modification time) of
+# the file when it was parsed
+_LOADED_GEOJSON: Dict[str, Tuple[Tuple[int, float], Dict[str, Any]]] = {}
+
+# the simplified geojson files, keyed by their absolute path and resolution, with the
+# (size, modification time) of the file when it was simplified
+_SIMPLIFIED_GEOJSON: Dict[Tuple[str, str], Tuple[Tuple[int, float], Dict[str, Any]]] = {}
+
+
+def load_geojson(file_name: str) -> Dict[str, Any]:
+    """Return the parsed contents of the geojson file called file_name.
+
+    The file is only parsed the first time it is asked for, or again if it has changed on disk since
+    it was last parsed. Every caller gets the same dictionary, so it must not be modified.
+    """
+    path = os.path.abspath(file_name)
+    signature = file_signature(path)
+
+    if path not in _LOADED_GEOJSON or _LOADED_GEOJSON[path][0] != signature:
+        with open(path) as file, instrumentation.span('geometry.load_geojson'):
+            _LOADED_GEOJSON[path] = (signature, json.load(file))
+    return _LOADED_GEOJSON[path][1]
+
+
+def simplified_geojson(file_name: str, resolution: str = DEFAULT_RESOLUTION) -> Dict[str, Any]:
+    """Return the geojson file called file_name with the borders of its polygons simplified to
+    resolution. The properties and ids of the features are kept as they are.
+
+    Each resolution is only simplified once, or again if the file has changed on disk. Every caller
+    gets the same dictionary, so it must not be modified.
+
+    Preconditions:
+        - resolution in TOLERANCES
+    """
+    path = os.path.abspath(file_name)
+    signature = file_signature(path)
+
+    if resolution == 'full':
+        return load_geojson(path)
+    if (path, resolution) not in _SIMPLIFIED_GEOJSON or \
+            _SIMPLIFIED_GEOJSON[(path, resolution)][0] != signature:
+        _SIMPLIFIED_GEOJSON[(path, resolution)] = \
+            (signature, simplify_geojson(load_geojson(path), TOLERANCES[resolution]))
+    return _SIMPLIFIED_GEOJSON[(path, resolution)][1]
+
+
+def clear_cache() -> None:
+    """Forget every geojson file that was parsed or simplified, so that the next call to
+    load_geojson or simplified_geojson reads it again.
+    """
+    _LOADED_GEOJSON.clear()
+    _SIMPLIFIED_GEOJSON.clear()
+
+
+@instrumentation.stage(items=lambda simplified: vertex_count(simplified))
+def simplify_geojson(geojson: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """Return a copy of geojson with the borders of every Polygon and MultiPolygon simplified so
+    that no point of the simplified borders is further than tolerance from the full borders.
+
+    Borders that are shared by several polygons are simplified in the same way for each of them.
+    A ring that becomes too small to be a polygon is left out, unless it is the only outer ring
+    left in its feature, which is then kept as it was.
+
+    >>> square = [[0.0, 0.0], [0.5, 0.01], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]
+    >>> feature = {'type': 'Feature', 'id': 'A',
+    ...            'geometry': {'type': 'Polygon', 'coordinates': [square]}}
+    >>> simple = simplify_geojson({'type': 'FeatureCollection', 'features': [feature]}, 0.1)
+    >>> simple['features'][0]['geometry']['coordinates']
+    [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]]
+    """
+    simplified = copy.deepcopy(geojson)
+    all_polygons = [polygon for feature in simplified['features']
+                    for polygon in feature_polygons(feature)]
+    rings = [[(point[0], point[1]) for point in ring]
+             for polygon in all_polygons for ring in polygon]
+    junctions = find_junctions(rings)
+
+    simplified_chains = {}
+    for polygon in all_polygons:
+        for index in range(len(polygon)):
+            ring = [(point[0], point[1]) for point in polygon[index]]
+            new_ring = simplify_ring(ring, junctions, tolerance, simplified_chains)
+            polygon[index] = [list(point) for point in new_ring]
+
+    for feature, original in zip(simplified['features'], geojson['features']):
+        remove_small_rings(feature, original)
+    return simplified
+
+
+def vertex_count(geojson: Dict[str, Any]) -> int:
+    """Return the number of points in the borders of all the polygons of geojson."""
+    return sum(len(ring) for feature in geojson['features']
+               for polygons in feature_polygons(feature) for ring in polygons)
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def file_signature(path: str) -> Tuple[int, float]:
+    """Return the size and modification time of the file at path."""
+    status = os.stat(path)
+    return (status.st_size, status.st_mtime)
+
+
+def feature_polygons(feature: Dict[str, Any]) -> List[List[List[List[float]]]]:
+    """Return the list of polygons of feature, where each polygon is a list of rings. The lists are
+    the ones in feature, so changing them changes feature. A feature that is not a Polygon or a
+    MultiPolygon has no polygons.
+    """
+    geometry = feature.get('geometry') or {}
+    if geometry.get('type') == 'Polygon':
+        return [geometry['coordinates']]
+    elif geometry.get('type') == 'MultiPolygon':
+        return geometry['coordinates']
+    else:
+        return []
+
+
+def find_junctions(rings: List[List[Point]]) -> Set[Point]:
+    """Return the points of rings where the border does not simply continue in one direction, which
+    are the points with more or fewer than two different neighbours over all of the rings.
+
+    >>> sorted(find_junctions([[(0, 0), (1, 0), (1, 1), (0, 0)],
+    ...                        [(1, 0), (2, 0), (1, 1), (1, 0)]]))
+    [(1, 0), (1, 1)]
+    """
+    neighbours: Dict[Point, Set[Point]] = {}
+    for ring in rings:
+        for index in range(len(ring) - 1):
+            for point, neighbour in ((ring[index], ring[index + 1]),
+                                     (ring[index + 1], ring[index])):
+                if point != neighbour:
+                    if point not in neighbours:
+                        neighbours[point] = set()
+                    set.add(neighbours[point], neighbour)
+    return {point for point in neighbours if len(neighbours[point]) != 2}
+
+
+def simplify_ring(ring: List[Point], junctions: Set[Point], tolerance: float,
+                  simplified_chains: Dict[Tuple[Point, ...], List[Point]]) -> List[Point]:
+    """Return ring simplified to tolerance, cut into chains at the junctions. The simplified chains
+    are memoized in simplified_chains under their points in a direction that does not depend on the
+    ring they came from, so a chain shared by two rings is simplified once.
+    """
+    points = ring[:-1] if len(ring) > 1 and ring[0] == ring[-1] else list(ring)
+    cuts = [index for index in range(len(points)) if points[index] in junctions]
+    if cuts == []:
+        # a ring that touches no other ring is cut at its first point
+        cuts = [0]
+
+    # rotate the ring to start at a cut, so that every chain is a slice of it
+    points = points[cuts[0]:] + points[:cuts[0]] + [points[cuts[0]]]
+    cuts = [index - cuts[0] for index in cuts] + [len(points) - 1]
+
+    new_ring = [points[0]]
+    for start, end in zip(cuts, cuts[1:]):
+        chain = tuple(points[start:end + 1])
+        key = min(chain, chain[::-1])
+        if key not in simplified_chains:
+            simplified_chains[key] = douglas_peucker(list(key), tolerance)
+        new_chain = simplified_chains[key] if key == chain else simplified_chains[key][::-1]
+        list.extend(new_ring, new_chain[1:])
+    return new_ring
+
+
+def douglas_peucker(chain: List[Point], tolerance: float) -> List[Point]:
+    """Return the points of chain that the Douglas-Peucker algorithm keeps with the given
+    tolerance. The first and last points are always kept.
+
+    >>> douglas_peucker([(0.0, 0.0), (1.0, 0.1), (2.0, 0.0), (3.0, 2.0)], 0.5)
+    [(0.0, 0.0), (2.0, 0.0), (3.0, 2.0)]
+    """
+    if len(chain) <= 2 or tolerance <= 0:
+        return list(chain)
+
+    points = np.array(chain, dtype=np.float64)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+
+    stack = [(0, len(points) - 1)]
+    while stack != []:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = distances_to_segment(points[first + 1:last], points[first], points[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            keep[first + 1 + farthest] = True
+            list.append(stack, (first, first + 1 + farthest))
+            list.append(stack, (first + 1 + farthest, last))
+
+    return [chain[index] for index in np.flatnonzero(keep)]
+
+
+def distances_to_segment(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Return the distance from each row of points to the segment from start to end."""
+    direction = end - start
+    length_squared = float(direction @ direction)
+    if length_squared == 0:
+        return np.hypot(*(points - start).T)
+    along = np.clip((points - start) @ direction / length_squared, 0.0, 1.0)
+    closest = start + along[:, None] * direction
+    return np.hypot(*(points - closest).T)
+
+
+def remove_small_rings(feature: Dict[str, Any], original: Dict[str, Any]) -> None:
+    """Remove the rings of feature with fewer than four points, which are not valid polygons, and
+    the polygons that lose their outer ring. If that would leave feature with no polygons, the outer
+    ring of its first polygon is put back as it is in original, the feature it was simplified from.
+    """
+    polygons = feature_polygons(feature)
+    if polygons == []:
+        return
+
+    kept = [[ring for ring in polygon if len(ring) >= 4] for polygon in polygons
+            if len(polygon[0]) >= 4]
+    if kept == []:
+        kept = [[copy.deepcopy(feature_polygons(original)[0][0])]]
+
+    if feature['geometry']['type'] == 'Polygon':
+        feature['geometry']['coordinates'] = kept[0]
+    else:
+        feature['geometry']['coordinates'] = kept
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'copy', 'json', 'os', 'numpy', 'instrumentation', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['load_geojson'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
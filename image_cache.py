@@ -0,0 +1,77 @@
+"""CSC110 Fall 2020 Final Project, Image Cache
+
+Description
+===============================
+This module keeps the resized images of the user interface on disk. The title image is much larger
+than it is shown, and resizing it every time the program starts was one of the slowest steps
+before the window appeared. An image is now only resized the first time it is asked for at a given
+size, or again if the original image changes, and the resized copy is saved as a PNG file that Tk
+can show directly.
+
+PIL is only imported when an image has to be resized.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Tuple
+import os
+
+DEFAULT_DIRECTORY = 'image_cache'
+
+
+def resized_image(file_name: str, size: Tuple[int, int],
+                  directory: str = DEFAULT_DIRECTORY) -> str:
+    """Return the name of a PNG file in directory with the image file_name resized to size, as
+    (width, height). The image is only resized if that file does not exist yet or is older than
+    file_name.
+
+    Preconditions:
+        - size[0] > 0 and size[1] > 0
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    cached_file_name = os.path.join(directory, f'{stem}_{size[0]}x{size[1]}.png')
+    if os.path.exists(cached_file_name) and \
+            os.path.getmtime(cached_file_name) >= os.path.getmtime(file_name):
+        return cached_file_name
+
+    # PIL is only needed when the image has to be resized again
+    from PIL import Image
+
+    os.makedirs(directory, exist_ok=True)
+    with Image.open(file_name) as image:
+        resized = image.resize(size, Image.LANCZOS)
+    temporary_file_name = cached_file_name + '.tmp'
+    resized.save(temporary_file_name, format='PNG')
+    os.replace(temporary_file_name, cached_file_name)
+    return cached_file_name
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'os', 'PIL', 'python_ta', 'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200', 'C0415']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,219 @@
+"""CSC110 Fall 2020 Final Project, Imputation
+
+Description
+===============================
+This module fills in the missing daily mean temperatures of the weather stations. The files mark a
+missing temperature with the value -9999.9. The temperatures of a station are kept in one contiguous
+array and every strategy fills all of the gaps of many stations at once in a single pass over the
+data, no matter how long the gaps are.
+
+The strategies are:
+    - 'midpoint': the average of the closest recorded temperature before and after the gap
+    - 'linear': a straight line between the closest recorded temperature before and after the gap
+    - 'climatology': the average of the recorded temperatures of the station on the same day of the
+      year in every other year
+
+A gap at the start or the end of the data, where there is only a recorded temperature on one side,
+takes that temperature with the 'midpoint' and 'linear' strategies.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# the value that marks a missing temperature in the daily mean temperature files
+MISSING_VALUE = -9999.9
+
+STRATEGIES = ('midpoint', 'linear', 'climatology')
+
+# the day of the year that February 29 is grouped under by day_of_year_keys
+LEAP_DAY_KEY = 366
+
+
+def impute(temperatures: np.ndarray, strategy: str = 'midpoint',
+           missing: Optional[np.ndarray] = None,
+           day_of_year: Optional[np.ndarray] = None) -> np.ndarray:
+    """Return a copy of temperatures with its missing values filled in using strategy.
+
+    temperatures is either the temperatures of one station, or a 2D array with the temperatures of
+    one station in each row. missing marks the values to fill in; by default it is every value equal
+    to MISSING_VALUE. day_of_year gives the day of the year of each column of temperatures and is
+    only used by the 'climatology' strategy. A value that cannot be filled in, such as in a station
+    with no recorded temperatures at all, is left as it is.
+
+    >>> impute(np.array([1.0, MISSING_VALUE, MISSING_VALUE, 4.0])).tolist()
+    [1.0, 2.5, 2.5, 4.0]
+    >>> impute(np.array([1.0, MISSING_VALUE, MISSING_VALUE, 4.0]), 'linear').tolist()
+    [1.0, 2.0, 3.0, 4.0]
+    >>> impute(np.array([[MISSING_VALUE, 2.0, MISSING_VALUE]])).tolist()
+    [[2.0, 2.0, 2.0]]
+
+    Preconditions:
+        - strategy in STRATEGIES
+        - missing is None or missing.shape == temperatures.shape
+        - strategy != 'climatology' or day_of_year is not None
+        - day_of_year is None or len(day_of_year) == temperatures.shape[-1]
+    """
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    if missing is None:
+        missing = temperatures == MISSING_VALUE
+
+    rows = np.atleast_2d(temperatures)
+    missing_rows = np.atleast_2d(missing)
+
+    if strategy == 'climatology':
+        filled = fill_from_climatology(rows, missing_rows, day_of_year)
+        # days of the year that were never recorded fall back to a straight line
+        filled = fill_from_neighbours(filled, missing_rows & np.isnan(filled), linear=True)
+    elif strategy in ('midpoint', 'linear'):
+        filled = fill_from_neighbours(rows, missing_rows, linear=strategy == 'linear')
+    else:
+        raise ValueError(f'unknown imputation strategy {strategy!r}, expected one of {STRATEGIES}')
+
+    # leave the values that could not be filled in as they were
+    filled = np.where(np.isnan(filled), rows, filled)
+    return filled.reshape(temperatures.shape)
+
+
+def impute_many(all_temperatures: List[np.ndarray], strategy: str = 'midpoint',
+                all_days_of_year: Optional[List[np.ndarray]] = None) -> List[np.ndarray]:
+    """Return the temperatures of every station in all_temperatures with their missing values filled
+    in using strategy. The stations do not need to have the same amount of temperatures; the ones
+    that do are filled in together as a single 2D array.
+
+    >>> filled = impute_many([np.array([1.0, MISSING_VALUE, 3.0]), np.array([MISSING_VALUE, 5.0])])
+    >>> [temperatures.tolist() for temperatures in filled]
+    [[1.0, 2.0, 3.0], [5.0, 5.0]]
+
+    Preconditions:
+        - strategy in STRATEGIES
+        - strategy != 'climatology' or all_days_of_year is not None
+        - all_days_of_year is None or len(all_days_of_year) == len(all_temperatures)
+    """
+    groups: Dict[Tuple[int, bytes], List[int]] = {}
+    for station, temperatures in enumerate(all_temperatures):
+        days_key = b'' if all_days_of_year is None else \
+            np.asarray(all_days_of_year[station]).tobytes()
+        if (len(temperatures), days_key) not in groups:
+            groups[(len(temperatures), days_key)] = []
+        list.append(groups[(len(temperatures), days_key)], station)
+
+    filled = [np.array([])] * len(all_temperatures)
+    for stations in groups.values():
+        day_of_year = None if all_days_of_year is None else all_days_of_year[stations[0]]
+        stacked = np.array([all_temperatures[station] for station in stations], dtype=np.float64)
+        for station, temperatures in zip(stations, impute(stacked, strategy,
+                                                          day_of_year=day_of_year)):
+            filled[station] = temperatures
+    return filled
+
+
+def day_of_year_keys(days_in_each_year: List[int]) -> np.ndarray:
+    """Return the day of the year of every day in consecutive years, where each year has the number
+    of days in days_in_each_year. February 29 is given the day LEAP_DAY_KEY so that the days after
+    it line up with the same days of the years that are not leap years.
+
+    >>> keys = day_of_year_keys([365, 366])
+    >>> keys[[0, 364, 365 + 58, 365 + 59, 365 + 60, 365 + 365]].tolist()
+    [1, 365, 59, 366, 60, 365]
+    """
+    all_keys = []
+    for days in days_in_each_year:
+        keys = np.arange(1, days + 1)
+        if days == 366:
+            keys = np.concatenate((keys[:59], [LEAP_DAY_KEY], keys[59:-1]))
+        list.append(all_keys, keys)
+    return np.concatenate(all_keys) if all_keys else np.array([], dtype=np.int64)
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def fill_from_neighbours(rows: np.ndarray, missing: np.ndarray, linear: bool) -> np.ndarray:
+    """Return a copy of the 2D array rows with each missing value replaced by a value computed from
+    the closest value that is not missing before and after it in the same row. The replacement is
+    the midpoint of the two if linear is False, and the point on the straight line between them if
+    linear is True. A missing value with no value that is not missing on either side becomes nan.
+
+    Both neighbours of every day are found with one running maximum and one running minimum over
+    the row, so the cost does not depend on the length of the gaps.
+    """
+    length = rows.shape[1]
+    positions = np.broadcast_to(np.arange(length), rows.shape)
+
+    # the position of the closest value that is not missing at or before / at or after each day
+    previous = np.maximum.accumulate(np.where(missing, -1, positions), axis=1)
+    following = np.minimum.accumulate(np.where(missing, length, positions)[:, ::-1],
+                                      axis=1)[:, ::-1]
+
+    has_previous = previous >= 0
+    has_following = following < length
+    previous_values = np.take_along_axis(rows, np.maximum(previous, 0), axis=1)
+    following_values = np.take_along_axis(rows, np.minimum(following, length - 1), axis=1)
+
+    if linear:
+        gap = np.maximum(following - previous, 1)
+        weight = (positions - previous) / gap
+    else:
+        weight = 0.5
+    between = previous_values + (following_values - previous_values) * weight
+
+    fill = np.where(has_previous & has_following, between,
+                    np.where(has_previous, previous_values,
+                             np.where(has_following, following_values, np.nan)))
+    return np.where(missing, fill, rows)
+
+
+def fill_from_climatology(rows: np.ndarray, missing: np.ndarray,
+                          day_of_year: np.ndarray) -> np.ndarray:
+    """Return a copy of the 2D array rows with each missing value replaced by the average of the
+    values that are not missing in the same row and on the same day of the year, as given by
+    day_of_year. A missing value on a day of the year with no such values becomes nan.
+    """
+    day_of_year = np.asarray(day_of_year, dtype=np.int64)
+    number_of_keys = int(day_of_year.max()) + 1 if len(day_of_year) > 0 else 1
+
+    # one bucket for every (station, day of the year)
+    buckets = np.arange(rows.shape[0])[:, None] * number_of_keys + day_of_year[None, :]
+    recorded = ~missing
+    totals = np.bincount(buckets[recorded], weights=rows[recorded],
+                         minlength=rows.shape[0] * number_of_keys)
+    counts = np.bincount(buckets[recorded], minlength=rows.shape[0] * number_of_keys)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = totals / counts
+    return np.where(missing, averages[buckets], rows)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'numpy', 'python_ta', 'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
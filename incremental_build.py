@@ -0,0 +1,281 @@
+"""CSC110 Fall 2020 Final Project, Incremental Build
+
+Description
+===============================
+This module keeps the temperature cube of temperature_cube up to date with a directory of daily mean
+temperature files without reading every file again. A manifest saved next to the cube records the
+size, modification time and content hash of each file that went into it. When the directory changes,
+only the files that were added or changed are read, the stations whose files were removed are
+dropped, and the cube is patched.
+
+If only the temperatures of stations already in the cube changed, their rows are overwritten in
+place in the memory mapped file. Otherwise the cube is written again from the rows that are already
+in it and the rows that were read. The annual aggregates of annual_aggregates can be kept up to date
+in the same way, from the same reads of the files.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import numpy as np
+import annual_aggregates
+import data_reading
+import temperature_cube
+
+
+def build_incrementally(file_path: str, directory: str, file_name: str,
+                        first_year: int = data_reading.FIRST_YEAR,
+                        last_year: int = data_reading.LAST_YEAR,
+                        aggregates_file_name: Optional[str] = None) -> Dict[str, List[str]]:
+    """Bring the cube saved under file_name up to date with the daily mean temperature files in
+    directory, and return the names of the files that were 'added', 'changed' and 'removed' since
+    the last build. If aggregates_file_name is not None, the annual aggregates saved under it are
+    kept up to date with the same rows as the cube.
+
+    If there is no cube or manifest yet, or the last build used a different range of years, or the
+    aggregates do not have the same stations as the cube, every file is read and the cube and the
+    aggregates are written from scratch.
+
+    Preconditions:
+        - file_path and directory are in the same format as in
+          data_reading.read_daily_mean_temps_all_files
+        - first_year <= last_year
+    """
+    manifest = read_manifest(file_name)
+    cube = None
+    if os.path.exists(temperature_cube.metadata_file_name(file_name)) and \
+            manifest.get('first_year') == first_year and manifest.get('last_year') == last_year:
+        cube = temperature_cube.load_temperature_cube(file_name)
+    aggregates = None
+    if cube is not None and aggregates_file_name is not None:
+        if os.path.exists(annual_aggregates.metadata_file_name(aggregates_file_name)):
+            aggregates = annual_aggregates.load_annual_aggregates(aggregates_file_name)
+        if aggregates is None or aggregates.stations != cube.stations or \
+                (aggregates.first_year, aggregates.last_year) != (first_year, last_year):
+            cube = None
+    if cube is None:
+        manifest = {'first_year': first_year, 'last_year': last_year, 'files': {}}
+
+    old_files = manifest['files']
+    new_files = {}
+    changes = {'added': [], 'changed': [], 'removed': []}
+    for station_file in sorted(os.listdir(directory)):
+        entry = file_entry(file_path + station_file, old_files.get(station_file))
+        new_files[station_file] = entry
+        if station_file not in old_files:
+            list.append(changes['added'], station_file)
+        elif entry['sha1'] != old_files[station_file]['sha1']:
+            list.append(changes['changed'], station_file)
+    changes['removed'] = [station_file for station_file in old_files
+                          if station_file not in new_files]
+
+    # read the files that were added or changed
+    new_rows = {}
+    new_statistics = {}
+    for station_file in changes['added'] + changes['changed']:
+        station, row, statistics = read_station_row(file_path + station_file, first_year,
+                                                    last_year)
+        new_files[station_file]['station'] = list(station)
+        new_rows[station] = row
+        new_statistics[station] = statistics
+
+    # the stations that no longer come from any file
+    current_stations = {tuple(entry['station']) for entry in new_files.values()}
+    removed_stations = {tuple(entry['station']) for entry in old_files.values()} - \
+        current_stations
+
+    stations = [] if cube is None else cube.stations
+    if cube is not None and keeps_rows(stations, new_rows, removed_stations):
+        patch_rows(temperature_cube.cube_file_name(file_name), stations, new_rows)
+        if aggregates_file_name is not None:
+            patch_rows(annual_aggregates.table_file_name(aggregates_file_name), stations,
+                       new_statistics)
+    else:
+        days = temperature_cube.year_starts(first_year, last_year)[-1]
+        new_temperatures, new_stations = combined_rows(
+            stations, None if cube is None else cube.temperatures, new_rows, removed_stations,
+            (days,), np.float32)
+        if aggregates_file_name is not None:
+            new_table, _ = combined_rows(
+                stations, None if aggregates is None else aggregates.table, new_statistics,
+                removed_stations,
+                (last_year - first_year + 1, len(annual_aggregates.AGGREGATE_COLUMNS)),
+                np.float64)
+
+        # the rows were copied out of the memory mapped files, which are released before the files
+        # are replaced, since a file that is still mapped cannot be replaced on Windows
+        cube = None
+        aggregates = None
+        temperature_cube.save_cube_arrays(file_name, new_temperatures, new_stations, first_year,
+                                          last_year)
+        if aggregates_file_name is not None:
+            annual_aggregates.save_annual_aggregates(aggregates_file_name, new_table,
+                                                     new_stations, first_year, last_year)
+
+    manifest['files'] = new_files
+    write_manifest(file_name, manifest)
+    return changes
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def manifest_file_name(file_name: str) -> str:
+    """Return the name of the file that holds the manifest of the cube saved under file_name."""
+    return file_name + '_manifest.json'
+
+
+def read_manifest(file_name: str) -> Dict[str, Any]:
+    """Return the manifest of the cube saved under file_name, or an empty manifest if there is
+    none.
+    """
+    if not os.path.exists(manifest_file_name(file_name)):
+        return {'files': {}}
+    with open(manifest_file_name(file_name)) as file:
+        return json.load(file)
+
+
+def write_manifest(file_name: str, manifest: Dict[str, Any]) -> None:
+    """Save manifest as the manifest of the cube saved under file_name."""
+    temporary = manifest_file_name(file_name) + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(manifest, file)
+    os.replace(temporary, manifest_file_name(file_name))
+
+
+def file_entry(path: str, old_entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the manifest entry of the file at path. If the size and modification time of the file
+    are the same as in old_entry, the file is assumed not to have changed and is not hashed again.
+    """
+    status = os.stat(path)
+    if old_entry is not None and old_entry['size'] == status.st_size and \
+            old_entry['mtime'] == status.st_mtime:
+        return dict(old_entry)
+
+    entry = {'size': status.st_size, 'mtime': status.st_mtime, 'sha1': hash_file(path),
+             'station': [] if old_entry is None else old_entry['station']}
+    return entry
+
+
+def hash_file(path: str) -> str:
+    """Return the sha1 hash of the contents of the file at path."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_station_row(path: str, first_year: int, last_year: int) \
+        -> Tuple[Tuple[str, str, str], Optional[np.ndarray], Optional[np.ndarray]]:
+    """Return the (id, name, province) of the station in the file at path, its row of the cube
+    and its row of the annual aggregates from first_year to last_year, or None for both rows if
+    the file does not cover that range.
+    """
+    first_line_list = data_reading.read_station_header(path)
+    station = (str.strip(first_line_list[0]), str.strip(first_line_list[1]),
+               str.strip(first_line_list[2]))
+
+    years, days_in_each_year, temperatures, was_missing = \
+        data_reading.read_daily_mean_temps_array(path, first_year, last_year)
+    if len(years) == 0:
+        return (station, None, None)
+    return (station,
+            temperature_cube.station_row(years, days_in_each_year, temperatures, first_year,
+                                         last_year),
+            annual_aggregates.aggregate_station(years, days_in_each_year, temperatures,
+                                                was_missing, first_year, last_year))
+
+
+def keeps_rows(stations: List[Tuple[str, str, str]],
+               new_rows: Dict[Tuple[str, str, str], Optional[np.ndarray]],
+               removed_stations: set) -> bool:
+    """Return whether every one of the stations in new_rows already has a row among stations and
+    keeps it, and none of the removed_stations has one, so that the rows can be patched in place.
+    """
+    rows = {station: row for row, station in enumerate(stations)}
+    return not any(station in rows for station in removed_stations) and \
+        all((station in rows) == (new_rows[station] is not None) for station in new_rows)
+
+
+def patch_rows(array_file_name: str, stations: List[Tuple[str, str, str]],
+               new_rows: Dict[Tuple[str, str, str], Optional[np.ndarray]]) -> None:
+    """Overwrite the rows of the stations in new_rows in the .npy file array_file_name, whose rows
+    are the rows of stations, in place in the memory mapped file.
+
+    Preconditions:
+        - keeps_rows(stations, new_rows, set())
+    """
+    rows = {station: row for row, station in enumerate(stations)}
+    if any(new_row is not None for new_row in new_rows.values()):
+        array = np.load(array_file_name, mmap_mode='r+')
+        for station, new_row in new_rows.items():
+            if new_row is not None:
+                array[rows[station]] = new_row
+        array.flush()
+        del array
+
+
+def combined_rows(stations: List[Tuple[str, str, str]], array: Optional[np.ndarray],
+                  new_rows: Dict[Tuple[str, str, str], Optional[np.ndarray]],
+                  removed_stations: set, row_shape: Tuple[int, ...], dtype: type) \
+        -> Tuple[np.ndarray, List[Tuple[str, str, str]]]:
+    """Return the rows of stations in array, except for the removed_stations and the stations in
+    new_rows, followed by the rows in new_rows that are not None, and the stations of those rows.
+    The rows are copied, so the returned array does not refer to array.
+
+    >>> stations = [('1', 'A', 'ON'), ('2', 'B', 'ON')]
+    >>> rows, new_stations = combined_rows(stations, np.array([[1.0], [2.0]]),
+    ...                                    {('3', 'C', 'ON'): np.array([3.0])}, {('1', 'A', 'ON')},
+    ...                                    (1,), np.float64)
+    >>> rows.tolist(), [station[0] for station in new_stations]
+    ([[2.0], [3.0]], ['2', '3'])
+    """
+    kept = [row for row, station in enumerate(stations)
+            if station not in removed_stations and station not in new_rows]
+    added = [station for station in new_rows if new_rows[station] is not None]
+
+    new_array = np.empty((len(kept) + len(added),) + row_shape, dtype=dtype)
+    if kept != []:
+        new_array[:len(kept)] = array[kept]
+    for row, station in enumerate(added):
+        new_array[len(kept) + row] = new_rows[station]
+    return (new_array, [stations[row] for row in kept] + added)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'hashlib', 'json', 'os', 'numpy', 'annual_aggregates',
+                          'data_reading', 'temperature_cube', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['read_manifest', 'write_manifest', 'hash_file'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
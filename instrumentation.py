@@ -0,0 +1,472 @@
+"""CSC110 Fall 2020 Final Project, Instrumentation
+
+Description
+===============================
+This module measures where the time and memory of the program go, one stage at a time. A stage is
+a function such as data_reading.read_ghg_emissions or maps.build_emissions_map, marked with the
+stage decorator, or a block of code in a span. For every run of a stage it records:
+
+    - the wall time and the cpu time of the thread that ran it
+    - the peak of the memory allocated while it ran, above what was allocated when it started
+    - the number of items it produced, such as stations or rows, for the stages that count them
+
+The records can be written as a trace file in the Chrome trace event format, which trace viewers
+such as Perfetto (ui.perfetto.dev), chrome://tracing and speedscope show as a flame graph, and as
+structured logs with one JSON object per line.
+
+Nothing is recorded unless the instrumentation is enabled, either by calling enable or by setting
+the environment variables below before the program starts, for example:
+
+    INSTRUMENTATION_TRACE=trace.json INSTRUMENTATION_LOG=- python main.py
+
+    - INSTRUMENTATION_TRACE: the trace file, written when the program exits
+    - INSTRUMENTATION_LOG: the file of the structured logs, or - for the standard error
+    - INSTRUMENTATION_MEMORY: 0 to leave out the memory peaks, which are measured with tracemalloc
+      and slow the program down
+
+When it is disabled, a stage only costs one extra function call and one check of a global
+variable, and a span returns a shared object that does nothing.
+
+The memory peaks are measured for the whole process, so when stages run on several threads at
+once, the peak of each includes what the others allocated in the meantime.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, TextIO
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+TRACE_VARIABLE = 'INSTRUMENTATION_TRACE'
+LOG_VARIABLE = 'INSTRUMENTATION_LOG'
+MEMORY_VARIABLE = 'INSTRUMENTATION_MEMORY'
+
+
+class StageRecord:
+    """One run of a stage.
+
+    Instance Attributes:
+        - name: the name of the stage, such as 'maps.format_temps'
+        - thread: the name of the thread that ran it
+        - depth: the number of stages that were running on the same thread when it started
+        - start: the time it started, in seconds since the instrumentation was enabled
+        - wall: the wall time it took, in seconds
+        - cpu: the cpu time of its thread that it took, in seconds
+        - peak: the peak of the memory allocated while it ran above what was allocated when it
+          started, in bytes, or None if the memory is not measured
+        - items: the number of items it produced, or None if it does not count them
+        - memory_start: the memory allocated when it started, in bytes
+        - memory_seen: the largest amount of memory allocated so far while it runs, in bytes
+
+    Representation Invariants:
+        - self.depth >= 0
+    """
+    name: str
+    thread: str
+    depth: int
+    start: float
+    wall: float
+    cpu: float
+    peak: Optional[int]
+    items: Optional[int]
+    memory_start: int
+    memory_seen: int
+
+    def __init__(self, name: str, thread: str, depth: int) -> None:
+        """Initialize a record of a run of the stage called name on thread."""
+        self.name = name
+        self.thread = thread
+        self.depth = depth
+        self.start = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = None
+        self.items = None
+        self.memory_start = 0
+        self.memory_seen = 0
+
+    def count(self, items: int) -> None:
+        """Add items to the number of items the stage produced."""
+        self.items = items if self.items is None else self.items + items
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the record as the JSON object of a line of the structured logs.
+
+        >>> record = StageRecord('maps.format_temps', 'MainThread', 0)
+        >>> record.wall, record.cpu, record.peak = (0.25, 0.125, 2048)
+        >>> record.as_dict()['wall_ms'], record.as_dict()['peak_kb']
+        (250.0, 2.0)
+        """
+        return {'stage': self.name, 'thread': self.thread, 'depth': self.depth,
+                'start_ms': round(self.start * 1000, 3), 'wall_ms': round(self.wall * 1000, 3),
+                'cpu_ms': round(self.cpu * 1000, 3),
+                'peak_kb': None if self.peak is None else round(self.peak / 1024, 1),
+                'items': self.items}
+
+
+class Recorder:
+    """The records of the stages since the instrumentation was enabled.
+
+    Instance Attributes:
+        - trace_file_name: the file that the trace is written to, or None if there is no trace
+        - log_file: the file that the structured logs are written to, or None if there are none
+        - memory: whether the memory peaks are measured
+        - records: the records of the stages that finished, in the order they finished
+        - origin: the value of time.perf_counter() when the instrumentation was enabled
+        - lock: the lock that makes records and log_file safe to use from several threads
+        - running: the stack of the records of the stages running on each thread
+    """
+    trace_file_name: Optional[str]
+    log_file: Optional[TextIO]
+    memory: bool
+    records: List[StageRecord]
+    origin: float
+    lock: threading.Lock
+    running: threading.local
+
+    def __init__(self, trace_file_name: Optional[str], log_file: Optional[TextIO],
+                 memory: bool) -> None:
+        """Initialize a recorder that has no records yet."""
+        self.trace_file_name = trace_file_name
+        self.log_file = log_file
+        self.memory = memory
+        self.records = []
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.running = threading.local()
+
+    def begin(self, name: str) -> StageRecord:
+        """Start and return the record of a run of the stage called name on this thread."""
+        if not hasattr(self.running, 'stack'):
+            self.running.stack = []
+        stack = self.running.stack
+        record = StageRecord(name, threading.current_thread().name, len(stack))
+
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # the peak so far belongs to the stage that is running, before it is reset for this one
+            if stack != []:
+                stack[-1].memory_seen = max(stack[-1].memory_seen, peak)
+            tracemalloc.reset_peak()
+            record.memory_start = current
+            record.memory_seen = current
+
+        list.append(stack, record)
+        record.cpu = time.thread_time()
+        record.start = time.perf_counter()
+        return record
+
+    def end(self, record: StageRecord) -> None:
+        """Finish record, which must be the last record started on this thread that has not
+        finished, and write it to the structured logs.
+        """
+        record.wall = time.perf_counter() - record.start
+        record.cpu = time.thread_time() - record.cpu
+        record.start = record.start - self.origin
+
+        stack = self.running.stack
+        list.pop(stack)
+        if self.memory:
+            record.memory_seen = max(record.memory_seen, tracemalloc.get_traced_memory()[1])
+            record.peak = record.memory_seen - record.memory_start
+            if stack != []:
+                stack[-1].memory_seen = max(stack[-1].memory_seen, record.memory_seen)
+
+        with self.lock:
+            list.append(self.records, record)
+            if self.log_file is not None:
+                self.log_file.write(json.dumps(record.as_dict()) + '\n')
+                self.log_file.flush()
+
+
+class Span:
+    """A block of code that is recorded as a stage, used as a context manager.
+
+    Instance Attributes:
+        - recorder: the recorder of the stage
+        - name: the name of the stage
+        - record: the record of the stage while it runs
+    """
+    recorder: Recorder
+    name: str
+    record: Optional[StageRecord]
+
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        """Initialize a span of the stage called name, recorded by recorder."""
+        self.recorder = recorder
+        self.name = name
+        self.record = None
+
+    def __enter__(self) -> StageRecord:
+        """Start recording the stage and return its record."""
+        self.record = self.recorder.begin(self.name)
+        return self.record
+
+    def __exit__(self, *exception_info: Any) -> None:
+        """Finish recording the stage, even if it raised an error."""
+        self.recorder.end(self.record)
+
+
+class NullSpan:
+    """A span that records nothing, used when the instrumentation is disabled. It is also its own
+    record, whose count does nothing.
+    """
+
+    def __enter__(self) -> NullSpan:
+        """Return this span as the record of the stage."""
+        return self
+
+    def __exit__(self, *exception_info: Any) -> None:
+        """Do nothing."""
+
+    def count(self, items: int) -> None:
+        """Do nothing."""
+
+
+def stage(name: Optional[str] = None,
+          items: Optional[Callable[[Any], int]] = None) -> Callable[[Callable], Callable]:
+    """Return a decorator that records each call of a function as a run of the stage called name,
+    or the module and name of the function if name is None. If items is not None, the number of
+    items of each run is items applied to the value the function returns.
+
+    >>> @stage(items=len)
+    ... def squares(n: int) -> list:
+    ...     return [i * i for i in range(n)]
+    >>> _ = enable(memory=False)
+    >>> squares(4)
+    [0, 1, 4, 9]
+    >>> record = disable().records[0]
+    >>> record.name, record.items
+    ('instrumentation.squares', 4)
+    """
+    def decorator(function: Callable) -> Callable:
+        stage_name = name if name is not None else qualified_name(function)
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _RECORDER is None:
+                return function(*args, **kwargs)
+            recorder = _RECORDER
+            record = recorder.begin(stage_name)
+            try:
+                result = function(*args, **kwargs)
+                if items is not None:
+                    record.count(items(result))
+                return result
+            finally:
+                recorder.end(record)
+
+        return wrapper
+
+    return decorator
+
+
+def span(name: str) -> Any:
+    """Return a context manager that records the block of code it runs as a run of the stage called
+    name. The value of the with statement is the record of the stage, whose count method adds to
+    the number of items of the stage.
+    """
+    if _RECORDER is None:
+        return NULL_SPAN
+    return Span(_RECORDER, name)
+
+
+def enable(trace_file_name: Optional[str] = None, log_file: Optional[TextIO] = None,
+           memory: bool = True) -> Recorder:
+    """Start recording the stages and return the recorder that records them, replacing the
+    recorder that was recording them before, if any.
+
+    If trace_file_name is not None, the trace is written to it by disable or when the program
+    exits. If log_file is not None, each stage is written to it as it finishes. If memory is True,
+    tracemalloc is started to measure the memory peaks.
+    """
+    global _RECORDER
+
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _RECORDER = Recorder(trace_file_name, log_file, memory)
+    return _RECORDER
+
+
+def disable() -> Optional[Recorder]:
+    """Stop recording the stages, write the trace file of the recorder if it has one, and return
+    the recorder, or None if the instrumentation was not enabled.
+    """
+    global _RECORDER
+
+    recorder = _RECORDER
+    _RECORDER = None
+    if recorder is not None:
+        if recorder.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if recorder.trace_file_name is not None:
+            write_trace(recorder.trace_file_name, recorder.records)
+    return recorder
+
+
+def is_enabled() -> bool:
+    """Return whether the stages are being recorded."""
+    return _RECORDER is not None
+
+
+def enable_from_environment() -> Optional[Recorder]:
+    """Enable the instrumentation as the environment variables ask, as described at the top of
+    this module, and return the recorder, or None if they do not ask for it.
+    """
+    trace_file_name = os.environ.get(TRACE_VARIABLE)
+    log_file_name = os.environ.get(LOG_VARIABLE)
+    if trace_file_name is None and log_file_name is None:
+        return None
+
+    if log_file_name == '-':
+        log_file = sys.stderr
+    elif log_file_name is not None:
+        log_file = open(log_file_name, 'a')
+    else:
+        log_file = None
+    recorder = enable(trace_file_name, log_file, os.environ.get(MEMORY_VARIABLE, '1') != '0')
+    atexit.register(disable)
+    return recorder
+
+
+def trace_events(records: List[StageRecord]) -> List[Dict[str, Any]]:
+    """Return the events of the Chrome trace event format for records: a complete event for each
+    record, and a metadata event with the name of each thread.
+
+    >>> record = StageRecord('combine.temp_anomaly', 'MainThread', 0)
+    >>> record.start, record.wall, record.cpu = (0.5, 0.002, 0.001)
+    >>> events = trace_events([record])
+    >>> events[0]['ph'], events[0]['ts'], events[0]['dur'], events[0]['cat']
+    ('X', 500000.0, 2000.0, 'combine')
+    >>> events[1]['ph'], events[1]['args']
+    ('M', {'name': 'MainThread'})
+    """
+    thread_ids = {}
+    for record in records:
+        if record.thread not in thread_ids:
+            thread_ids[record.thread] = len(thread_ids)
+
+    process_id = os.getpid()
+    events = [{'name': record.name, 'cat': str.split(record.name, '.')[0], 'ph': 'X',
+               'ts': round(record.start * 1e6, 1), 'dur': round(record.wall * 1e6, 1),
+               'pid': process_id, 'tid': thread_ids[record.thread],
+               'args': {key: value for key, value in record.as_dict().items()
+                        if key in ('cpu_ms', 'peak_kb', 'items') and value is not None}}
+              for record in records]
+    for thread, thread_id in thread_ids.items():
+        list.append(events, {'name': 'thread_name', 'ph': 'M', 'pid': process_id,
+                             'tid': thread_id, 'args': {'name': thread}})
+    return events
+
+
+def write_trace(file_name: str, records: List[StageRecord]) -> None:
+    """Write records to the file called file_name in the Chrome trace event format."""
+    temporary_file_name = file_name + '.tmp'
+    with open(temporary_file_name, 'w') as file:
+        json.dump({'traceEvents': trace_events(records), 'displayTimeUnit': 'ms'}, file)
+    os.replace(temporary_file_name, file_name)
+
+
+def summary(records: List[StageRecord]) -> Dict[str, Dict[str, Any]]:
+    """Return a dictionary mapping the name of each stage of records to the number of times it
+    ran, its total wall and cpu times in seconds, its largest memory peak in bytes and its total
+    number of items.
+
+    >>> first, second = StageRecord('a', 'MainThread', 0), StageRecord('a', 'MainThread', 0)
+    >>> first.wall, second.wall, second.items = (1.0, 2.0, 5)
+    >>> summary([first, second])['a']
+    {'calls': 2, 'wall': 3.0, 'cpu': 0.0, 'peak': None, 'items': 5}
+    """
+    stages = {}
+    for record in records:
+        if record.name not in stages:
+            stages[record.name] = {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak': None,
+                                   'items': None}
+        totals = stages[record.name]
+        totals['calls'] += 1
+        totals['wall'] += record.wall
+        totals['cpu'] += record.cpu
+        if record.peak is not None:
+            totals['peak'] = max(totals['peak'] or 0, record.peak)
+        if record.items is not None:
+            totals['items'] = (totals['items'] or 0) + record.items
+    return stages
+
+
+def print_summary(records: List[StageRecord]) -> None:
+    """Print the summary of records, with the stages that took the most wall time first."""
+    stages = summary(records)
+    for name in sorted(stages, key=lambda stage_name: -stages[stage_name]['wall']):
+        totals = stages[name]
+        peak = '' if totals['peak'] is None else f'{totals["peak"] / 1048576:10.1f} MB'
+        items = '' if totals['items'] is None else f'{totals["items"]:10d} items'
+        print(f'{name:50} {totals["calls"]:6d} x {totals["wall"] * 1000:10.1f} ms wall '
+              f'{totals["cpu"] * 1000:10.1f} ms cpu {peak}{items}')
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def qualified_name(function: Callable) -> str:
+    """Return the name of function with the name of its module in front, where the module that is
+    run as a script is called by the name of its file, such as 'main'.
+
+    >>> qualified_name(qualified_name)
+    'instrumentation.qualified_name'
+    """
+    module = function.__module__
+    if module == '__main__':
+        script = getattr(sys.modules['__main__'], '__file__', None)
+        if script is not None:
+            module = os.path.splitext(os.path.basename(script))[0]
+    return module + '.' + function.__qualname__
+
+
+# the recorder of the stages, or None if the instrumentation is disabled
+_RECORDER: Optional[Recorder] = None
+
+# the span returned by span when the instrumentation is disabled
+NULL_SPAN = NullSpan()
+
+enable_from_environment()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'atexit', 'functools', 'json', 'os', 'sys', 'threading',
+                          'time', 'tracemalloc', 'python_ta', 'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['enable_from_environment', 'write_trace', 'print_summary'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200', 'W0603', 'R1732']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -7,6 +7,9 @@ our project. To display a map, the interface prompts the user to enter a valid y
 three maps. To display a graph, the user needs to select a station that could be filtered out by
 province as well as by the search bar.
 
+The window appears before any data is loaded. The stations are then loaded in the background, and
+the data and plotting modules of the maps and graphs are only loaded when they are first used.
+
 Copyright and Usage Information
 ===============================
 
@@ -19,23 +22,39 @@ please consult our Course Syllabus.
 This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
 """
 
-from tkinter import Button, Entry, Label, StringVar, mainloop, Tk, Toplevel
+from __future__ import annotations
+import time
+
+# the time at which the program started, which the startup times are measured from; it is recorded
+# before the other imports on purpose, so that the time they take counts in the startup times
+START_TIME = time.perf_counter()
+
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from tkinter import Button, Entry, Label, PhotoImage, StringVar, mainloop, Tk, Toplevel
 from tkinter import ttk
+import functools
 import json
-import ast
-from PIL import ImageTk, Image
-import data_reading
-import combine
-import maps
+import os
+import threading
+import image_cache
+import instrumentation
+import station_search
+import stations
+import tasks
+
+# The modules that use numpy and plotly are only imported when they are first needed, on a worker
+# thread, so that the window appears right away
+if TYPE_CHECKING:
+    import annual_aggregates
+    import anomalies
+    import figure_cache
+    import maps
 
 # Creates the main window
 ROOT = Tk()
 
-# Opens the image for the title
-TITLE_IMAGE = Image.open('title_image.png')
-# Resizes the image
-SMALLER = TITLE_IMAGE.resize((300, 300), Image.ANTIALIAS)  # (300, 255)
-NEW_TITLE = ImageTk.PhotoImage(SMALLER)
+# Opens the image for the title, resized once and then kept on disk
+NEW_TITLE = PhotoImage(file=image_cache.resized_image('title_image.png', (300, 300)))
 # Displays the image as a label
 TITLE_LABEL = Label(ROOT, image=NEW_TITLE, borderwidth=0)
 TITLE_LABEL.grid(row=1, column=1, columnspan=4)
@@ -49,7 +68,7 @@ def window(main) -> None:
     main.title('Effects of Greenhouse Gases in Canada')
     main.update_idletasks()
     width = 575
-    height = 550
+    height = 580
     x = (main.winfo_screenwidth() // 2) - (width // 2)
     y = (main.winfo_screenheight() // 2) - (height // 2)
     main.geometry('{}x{}+{}+{}'.format(width, height, x, y))
@@ -89,48 +108,272 @@ def read_temp_data(file: str) -> dict:
 
 # Retrieving data needed
 
-UNFILTERED_DATA = read_temp_data('data.json')
-DATA = {x: UNFILTERED_DATA[x] for x in UNFILTERED_DATA if UNFILTERED_DATA[x] != {}}
-CITIES = [ast.literal_eval(x)[0] for x in DATA.keys()]
-PROVINCE = [ast.literal_eval(x)[1] for x in DATA.keys()]
-ABB_TO_PROVINCE = {'BC': 'British Columbia', 'MAN': 'Manitoba', 'ALTA': 'Alberta',
-                   'NFLD': 'Newfoundland and Labrador', 'PEI': 'Prince Edward Island',
-                   'YT': 'Yukon', 'NB': 'New Brunswick', 'SASK': 'Saskatchewan',
-                   'NU': 'Nunavut', 'ONT': 'Ontario', 'NS': 'Nova Scotia',
-                   'NWT': 'Northwest Territories', 'QUE': 'Quebec'}
+# The data is only loaded when it is first needed, and the stations are loaded in the background as
+# soon as the window appears
+
+# The binary temperature cube made by temperature_cube.convert_json_to_cube is used instead of
+# data.json when it exists, since it does not have to be read into memory all at once
+CUBE_FILE_NAME = 'temperatures'
+
+# The table of annual statistics made along with the other data by
+# data_reading.write_daily_mean_temps_json or incremental_build.build_incrementally is used for the
+# maps and graphs when it exists, so that they do not have to average every day again
+AGGREGATES_FILE_NAME = 'aggregates'
+
+# The files that the maps are made from
+PROVINCES_GEOJSON_FILE_NAME = 'canada_provinces.geojson'
+STATIONS_GEOJSON_FILE_NAME = 'weather_stations.geojson'
+MAP_TEMPS_FILE_NAME = 'data_for_maps_since_1990.json'
+EMISSIONS_CSV_FILE_NAME = 'GHG_IPCC_Can_Prov_Terr.csv'
+
+# the year that the emissions and temperatures on the maps are compared to, and the baseline of the
+# anomalies on the graphs, where None is every year in which the station has data
+MAP_BASELINE_YEAR = 1990
+GRAPH_BASELINE = None
+
+ABB_TO_PROVINCE = stations.ABB_TO_PROVINCE
+PROVINCE_TO_ABB = {ABB_TO_PROVINCE[x]: x for x in ABB_TO_PROVINCE}
+
+# the number of seconds from START_TIME until the window appeared ('first_window') and until the
+# stations were loaded ('interactive')
+STARTUP_TIMES = {}
+
+# When this environment variable is set, the startup times are printed as json and the program
+# closes once the stations are loaded, for benchmarks.benchmark_startup. If the stations cannot be
+# loaded, the error is printed as json instead
+STARTUP_BENCHMARK_VARIABLE = 'STARTUP_BENCHMARK'
+
+# The locks that make sure each kind of data is only loaded once, when a worker thread asks for it
+# while another one is still loading it
+AGGREGATES_LOCK = threading.Lock()
+STATIONS_LOCK = threading.Lock()
+FIGURES_LOCK = threading.Lock()
+MAP_DATA_LOCK = threading.Lock()
+
+
+class StationData:
+    """The temperatures of the weather stations and the indexes used to find them.
+
+    Instance Attributes:
+        - temperatures: the daily temperatures of each station, in the format of 'data.json'
+        - temperature_files: the files that temperatures were read from
+        - registry: the stations, found by name or province with a dictionary lookup
+        - names: the display name of every station, in alphabetical order
+        - search_index: the index of the names of the stations for the search box
+    """
+    temperatures: Any
+    temperature_files: List[str]
+    registry: stations.StationRegistry
+    names: List[str]
+    search_index: station_search.StationSearchIndex
+
+    def __init__(self, temperatures: Any, temperature_files: List[str],
+                 registry: stations.StationRegistry) -> None:
+        """Initialize the station data with the given temperatures, read from temperature_files,
+        and the registry of their stations.
+        """
+        self.temperatures = temperatures
+        self.temperature_files = temperature_files
+        self.registry = registry
+        self.search_index = station_search.search_index_from_registry(registry)
+        self.names = self.search_index.search('')
+
+
+def aggregates() -> Tuple[Optional[annual_aggregates.AnnualAggregates],
+                          Optional[anomalies.AnomalyEngine]]:
+    """
+    Returns the annual aggregates and the engine that the maps and graphs share the anomalies of,
+    or (None, None) if there are no aggregates
 
+    They are loaded the first time they are asked for, and again when their files change.
+    """
+    with AGGREGATES_LOCK:
+        return load_aggregates(files_version(aggregates_files()))
 
-def map_open() -> None:
+
+@functools.lru_cache(maxsize=1)
+def load_aggregates(version: Tuple[Any, ...]) -> \
+        Tuple[Optional[annual_aggregates.AnnualAggregates], Optional[anomalies.AnomalyEngine]]:
     """
-    Opens three maps on different browsers based on the year inputted when the map button is clicked
+    Loads the annual aggregates and their anomaly engine, if the aggregates exist
 
-    Precondition:
-        - 1990 < YEAR_SELECT.get() <= 2018
+    version is the version of the files of the aggregates, as returned by files_version, so that
+    the cache only holds the aggregates of the files as they are now.
     """
-    # Retrieves data needed from files
-    province_geojson_file_name = 'canada_provinces.geojson'
-    weather_stations_geojson = 'weather_stations.geojson'
-    daily_temps_geojson = 'data_for_maps_since_1990.json'
-    emissions_csv_file_name = 'GHG_IPCC_Can_Prov_Terr.csv'
+    import annual_aggregates
+    import anomalies
 
-    province_id_map = maps.format_province_id_map(province_geojson_file_name)
+    if os.path.exists(annual_aggregates.metadata_file_name(AGGREGATES_FILE_NAME)):
+        table = annual_aggregates.load_annual_aggregates(AGGREGATES_FILE_NAME)
+        return (table, anomalies.engine_from_aggregates(table))
+    else:
+        return (None, None)
+
+
+def aggregates_files() -> List[str]:
+    """
+    Returns the files of the annual aggregates
+    """
+    import annual_aggregates
+
+    return [annual_aggregates.table_file_name(AGGREGATES_FILE_NAME),
+            annual_aggregates.metadata_file_name(AGGREGATES_FILE_NAME)]
+
+
+def files_version(file_names: List[str]) -> Tuple[Any, ...]:
+    """
+    Returns the size and modification time of each of the files called file_names, or None for a
+    file that does not exist
+
+    The data that is loaded from the files is cached with their version, so it is loaded again as
+    soon as one of them changes, before a map or graph is built again from it.
+    """
+    version_so_far = []
+    for file_name in file_names:
+        if os.path.exists(file_name):
+            status = os.stat(file_name)
+            list.append(version_so_far, (status.st_size, status.st_mtime))
+        else:
+            list.append(version_so_far, None)
+    return tuple(version_so_far)
+
+
+def station_data() -> StationData:
+    """
+    Returns the temperatures of the stations and the indexes used to find them
+
+    They are loaded the first time they are asked for, and again when their files or the
+    aggregates change.
+    """
+    data_files = station_files()
+    with STATIONS_LOCK:
+        return load_station_data(tuple(data_files),
+                                 files_version(data_files + aggregates_files()))
+
+
+@functools.lru_cache(maxsize=1)
+@instrumentation.stage(items=lambda data: len(data.registry))
+def load_station_data(data_files: Tuple[str, ...], version: Tuple[Any, ...]) -> StationData:
+    """
+    Loads the temperatures of the stations from data_files and indexes their names
+
+    version is the version of data_files and of the aggregates, as returned by files_version, so
+    that the cache only holds the stations of the files as they are now.
+    """
+    import temperature_cube
+
+    if data_files != ('data.json',):
+        data = temperature_cube.load_temperature_cube(CUBE_FILE_NAME).as_mapping()
+    else:
+        unfiltered_data = read_temp_data('data.json')
+        data = {x: unfiltered_data[x] for x in unfiltered_data if unfiltered_data[x] != {}}
 
+    # The keys of data are decoded once, and the stations are then found by name or province with a
+    # dictionary lookup
+    registry = stations.registry_from_keys(data.keys())
+    table, _ = aggregates()
+    if table is not None:
+        for station_id, name, province_abb in table.stations:
+            if registry.find(name, province_abb) != -1:
+                registry.add(name, province_abb, station_id)
+    return StationData(data, list(data_files), registry)
+
+
+def station_files() -> List[str]:
+    """
+    Returns the files that the temperatures of the stations are loaded from: the binary temperature
+    cube if it exists, and data.json otherwise
+    """
+    import temperature_cube
+
+    if os.path.exists(temperature_cube.metadata_file_name(CUBE_FILE_NAME)):
+        return [temperature_cube.cube_file_name(CUBE_FILE_NAME),
+                temperature_cube.metadata_file_name(CUBE_FILE_NAME)]
+    else:
+        return ['data.json']
+
+
+def figures() -> figure_cache.FigureCache:
+    """
+    Returns the maps and graphs that were already made, in memory and on disk, so that they open
+    right away the next time they are asked for
+    """
+    with FIGURES_LOCK:
+        return load_figure_cache()
+
+
+@functools.lru_cache(maxsize=None)
+def load_figure_cache() -> figure_cache.FigureCache:
+    """
+    Creates the cache of the maps and graphs
+    """
+    import figure_cache
+
+    return figure_cache.FigureCache()
+
+
+def map_data() -> Tuple[Dict[str, int], Dict[int, List[float]], maps.DifferenceView,
+                        Optional[maps.DifferenceView]]:
+    """
+    Returns the data of the maps, which is read the first time the map button is clicked, and
+    again when its files change
+    """
+    file_names = [PROVINCES_GEOJSON_FILE_NAME, STATIONS_GEOJSON_FILE_NAME, MAP_TEMPS_FILE_NAME,
+                  EMISSIONS_CSV_FILE_NAME]
+    with MAP_DATA_LOCK:
+        return read_map_data(*file_names, files_version(file_names + aggregates_files()))
+
+
+@functools.lru_cache(maxsize=1)
+@instrumentation.stage()
+def read_map_data(province_geojson_file_name: str, weather_stations_geojson: str,
+                  daily_temps_geojson: str, emissions_csv_file_name: str,
+                  version: Tuple[Any, ...]) -> \
+        Tuple[Dict[str, int], Dict[int, List[float]], maps.DifferenceView,
+              Optional[maps.DifferenceView]]:
+    """
+    Return the province id map, the emissions of each province in each year, and lazy views of the
+    differences in emissions and in temperatures compared to MAP_BASELINE_YEAR.
+
+    The files are only read the first time the map button is clicked, and again when version, the
+    version of the files and of the aggregates as returned by files_version, changes. The
+    temperature view is None when the temperature differences come from the anomalies of the
+    aggregates instead.
+    """
+    import data_reading
+    import maps
+
+    province_id_map = maps.format_province_id_map(province_geojson_file_name)
     emissions_data_frame = data_reading.read_ghg_emissions_for_maps(emissions_csv_file_name)
-    emissions_difference_data_frame = maps.calculate_emissions_difference(emissions_data_frame)
-    temperatures_difference_data_frame = maps.calculate_temp_difference(
-        maps.format_temps(weather_stations_geojson, daily_temps_geojson))
+    emissions_differences = maps.DifferenceView(emissions_data_frame, MAP_BASELINE_YEAR)
+    if aggregates()[1] is not None:
+        temperatures_differences = None
+    else:
+        temperatures_differences = maps.DifferenceView(
+            maps.format_temps(weather_stations_geojson, daily_temps_geojson), MAP_BASELINE_YEAR)
+    return (province_id_map, emissions_data_frame, emissions_differences,
+            temperatures_differences)
 
+
+@instrumentation.stage()
+def map_open() -> None:
+    """
+    Opens three maps on different browsers based on the year inputted when the map button is clicked
+
+    The maps are made in the background so the window keeps responding. Clicking again for the same
+    year while its maps are being made does nothing, and clicking for another year replaces them.
+
+    Precondition:
+        - 1990 < YEAR_SELECT.get() <= 2018
+    """
     # This occurs when the the correct input (a year between 1991-2018)
     try:
         year = int(YEAR_SELECT.get())
         if 1991 <= year <= 2018:
-            maps.plot_emissions_map(province_geojson_file_name, 'Raw Data', emissions_data_frame,
-                                    province_id_map, year)
-            maps.plot_emissions_map(province_geojson_file_name,
-                                    'Difference', emissions_difference_data_frame,
-                                    province_id_map, year)
-            maps.plot_temperatures_map(province_geojson_file_name, 'Difference',
-                                       temperatures_difference_data_frame, year)
+            YEAR_RANGE_LABEL.config(text='Enter year\n(1991 - 2018)', bg='#FFE4AE', fg='#800000')
+            if SCHEDULER.submit('map', year, functools.partial(open_maps, year), show_status,
+                                show_status, show_error):
+                show_status('Making the maps of ' + str(year) + '...')
             # If the year is not between 1991 and 2018
         else:
             raise ValueError
@@ -139,54 +382,254 @@ def map_open() -> None:
                                 bg='#FFE4AE', fg='#800000')
 
 
+@instrumentation.stage()
+def open_maps(year: int, task: tasks.Task) -> str:
+    """
+    Opens the three maps of year, on a worker thread of SCHEDULER, and returns the status to show
+    once they are open
+
+    Each map is only built the first time its year is asked for, or again when its data files
+    change, and is then opened from the figure cache. The maps that are left are not opened if
+    another year is asked for in the meantime.
+    """
+    emissions_files = [PROVINCES_GEOJSON_FILE_NAME, EMISSIONS_CSV_FILE_NAME]
+    if aggregates()[0] is not None:
+        temperature_files = [PROVINCES_GEOJSON_FILE_NAME, STATIONS_GEOJSON_FILE_NAME] + \
+            aggregates_files()
+    else:
+        temperature_files = [PROVINCES_GEOJSON_FILE_NAME, STATIONS_GEOJSON_FILE_NAME,
+                             MAP_TEMPS_FILE_NAME]
+
+    task.report('Opening the emissions map of ' + str(year) + '...')
+    figures().show(('emissions_raw', year, None), emissions_files,
+                   functools.partial(build_raw_emissions_map, year))
+    if task.cancelled():
+        return ''
+
+    task.report('Opening the emissions difference map of ' + str(year) + '...')
+    figures().show(('emissions_difference', year, MAP_BASELINE_YEAR), emissions_files,
+                   functools.partial(build_emissions_difference_map, year))
+    if task.cancelled():
+        return ''
+
+    task.report('Opening the temperature difference map of ' + str(year) + '...')
+    figures().show(('temperatures_difference', year, MAP_BASELINE_YEAR),
+                   temperature_files,
+                   functools.partial(build_temperatures_difference_map, year))
+    return 'Opened the maps of ' + str(year)
+
+
+@instrumentation.stage()
+def build_raw_emissions_map(year: int) -> Any:
+    """
+    Returns the map of the emissions of each province in year
+    """
+    import maps
+
+    province_id_map, emissions_data_frame, _, _ = map_data()
+    return maps.build_emissions_map(PROVINCES_GEOJSON_FILE_NAME, 'Raw Data',
+                                    {year: emissions_data_frame[year]}, province_id_map, year)
+
+
+@instrumentation.stage()
+def build_emissions_difference_map(year: int) -> Any:
+    """
+    Returns the map of the difference between the emissions of each province in year and in
+    MAP_BASELINE_YEAR
+    """
+    import maps
+
+    province_id_map, _, emissions_differences, _ = map_data()
+    return maps.build_emissions_map(PROVINCES_GEOJSON_FILE_NAME, 'Difference',
+                                    emissions_differences.frame(year), province_id_map, year)
+
+
+@instrumentation.stage()
+def build_temperatures_difference_map(year: int) -> Any:
+    """
+    Returns the map of the difference between the mean temperature of each station in year and in
+    MAP_BASELINE_YEAR
+    """
+    import maps
+
+    _, _, _, temperatures_differences = map_data()
+    # Only the differences in year are computed
+    if temperatures_differences is None:
+        temperatures_difference_data_frame = maps.format_temp_anomalies(
+            STATIONS_GEOJSON_FILE_NAME, aggregates()[1], (MAP_BASELINE_YEAR, MAP_BASELINE_YEAR),
+            [year])
+    else:
+        temperatures_difference_data_frame = temperatures_differences.frame(year)
+    return maps.build_temperatures_map(PROVINCES_GEOJSON_FILE_NAME, 'Difference',
+                                       temperatures_difference_data_frame, year)
+
+
+@instrumentation.stage()
 def province_filter(event) -> None:
     """
     Enables the search button when the province is selected
     Filters out stations, only those in the province chosen appear
     """
     SEARCH_BUTTON['state'] = 'normal'
-    cities_in_province = [ast.literal_eval(x)[0] for x in DATA.keys()
-                          if ABB_TO_PROVINCE[ast.literal_eval(x)[1]] == PROVINCE_COMBO.get()]
-    # Changes the city back to its original format
-    sorted_cities = [x.replace('_', ' ').title() for x in cities_in_province]
-    sorted_cities.sort()
-    CITY_COMBO['values'] = sorted_cities
+    # The names are already in their original format and sorted in the search index
+    if stations_loaded():
+        CITY_COMBO['values'] = station_data().search_index.search(
+            '', PROVINCE_TO_ABB[PROVINCE_COMBO.get()])
 
 
+@instrumentation.stage()
 def selected(event) -> None:
     """
     Opens a new browser with the plotly graph of the station selected
     Graph compares temperature anomaly of station and CO2 emission of the province
+
+    The graph is made in the background like the maps, and selecting another station replaces it.
     """
+    if not stations_loaded():
+        return
+    registry = station_data().registry
     province = ''
     city_chosen = CITY_COMBO.get().upper().replace(' ', '_')
     # Gets the province in which the city is located in
-    for item in CITIES:
-        if city_chosen == item:
-            province = PROVINCE[CITIES.index(item)]
-            break
-    ghg_data = data_reading.read_ghg_emissions('GHG_IPCC_Can_Prov_Terr.csv')
-    key = "('" + city_chosen + "', '" + province + "')"
-    combine.combine_plots(ghg_data, DATA[key], ABB_TO_PROVINCE[province], CITY_COMBO.get())
+    if city_chosen in registry.by_name:
+        province = registry.provinces[registry.by_name[city_chosen][0]]
+    if SCHEDULER.submit('graph', (city_chosen, province),
+                        functools.partial(open_graph, city_chosen, province, CITY_COMBO.get()),
+                        show_status, show_status, show_error):
+        show_status('Making the graph of ' + CITY_COMBO.get() + '...')
+
+
+@instrumentation.stage()
+def open_graph(city_chosen: str, province: str, city_name: str, task: tasks.Task) -> str:
+    """
+    Opens the graph of the station called city_chosen in province, on a worker thread of
+    SCHEDULER, and returns the status to show once it is open
+
+    The graph is only built the first time the station is selected, or again when its data files
+    change, and is then opened from the figure cache.
+    """
+    task.report('Opening the graph of ' + city_name + '...')
+    table, _ = aggregates()
+    if table is not None and (city_chosen, province) in table.rows_by_name:
+        temperature_files = aggregates_files()
+    else:
+        temperature_files = station_data().temperature_files
+    figures().show(('graph', (city_chosen, province), GRAPH_BASELINE),
+                   [EMISSIONS_CSV_FILE_NAME] + temperature_files,
+                   functools.partial(build_graph, city_chosen, province, city_name))
+    return 'Opened the graph of ' + city_name
+
+
+@instrumentation.stage()
+def build_graph(city_chosen: str, province: str, city_name: str) -> Any:
+    """
+    Returns the graph of the station called city_chosen in province, which compares its
+    temperature anomaly to the CO2 emissions of its province
+    """
+    import combine
+    import emissions_store
+
+    co2_values = combine.values_for_co2_plot_from_store(
+        emissions_store.load_emissions_store(EMISSIONS_CSV_FILE_NAME), ABB_TO_PROVINCE[province])
+    table, engine = aggregates()
+    if table is not None and (city_chosen, province) in table.rows_by_name:
+        station = table.stations[table.rows_by_name[(city_chosen, province)]]
+        temp_values = combine.values_for_anomaly_plot(
+            engine.station_anomalies(station, GRAPH_BASELINE))
+    else:
+        temp_values = combine.values_for_temp_plot(
+            station_data().temperatures["('" + city_chosen + "', '" + province + "')"])
+    return combine.build_combined_plot(co2_values, temp_values, ABB_TO_PROVINCE[province],
+                                       city_name)
+
+
+def show_status(status: str) -> None:
+    """
+    Shows status under the buttons, such as the progress of the maps and graphs being made
+    """
+    STATUS_LABEL.config(text=status)
+
+
+def show_error(error: BaseException) -> None:
+    """
+    Shows that making a map or a graph failed because of error
+    """
+    STATUS_LABEL.config(text='Something went wrong: ' + str(error))
+
+
+def start_loading() -> None:
+    """
+    Records the time at which the window appeared, and starts loading the stations in the
+    background
+    """
+    STARTUP_TIMES['first_window'] = time.perf_counter() - START_TIME
+    SCHEDULER.submit('startup', 'stations', load_stations_in_background, show_stations,
+                     show_status, show_startup_error)
+    show_status('Loading the stations...')
+
+
+def load_stations_in_background(task: tasks.Task) -> List[str]:
+    """
+    Loads the stations on a worker thread of SCHEDULER, and returns the names to show in the
+    station dropdown menu
+    """
+    task.report('Loading the stations...')
+    return station_data().names
+
+
+def show_stations(names: List[str]) -> None:
+    """
+    Shows the stations once they are loaded, filtered by the province and the search box if a
+    province was already selected, and records the time at which the window became interactive
+    """
+    if str(SEARCH_BUTTON['state']) == 'normal':
+        search()
+    else:
+        CITY_COMBO['values'] = names
+    show_status('')
+    STARTUP_TIMES['interactive'] = time.perf_counter() - START_TIME
 
+    if os.environ.get(STARTUP_BENCHMARK_VARIABLE):
+        print(json.dumps(STARTUP_TIMES), flush=True)
+        ROOT.destroy()
 
+
+def show_startup_error(error: BaseException) -> None:
+    """
+    Shows that loading the stations failed because of error, and closes the program if its
+    startup is being benchmarked
+    """
+    show_error(error)
+    if os.environ.get(STARTUP_BENCHMARK_VARIABLE):
+        print(json.dumps({'error': str(error)}), flush=True)
+        ROOT.destroy()
+
+
+def stations_loaded() -> bool:
+    """
+    Returns whether the stations have been loaded and shown
+    """
+    return 'interactive' in STARTUP_TIMES
+
+
+@instrumentation.stage()
 def search() -> None:
     """
     Searches for the station located in the province selected based
     on the characters written in the search entry box
     """
-    search_values = CITY_TYPE.get().lower()
-    cities_in_province = [ast.literal_eval(x)[0] for x in DATA.keys()
-                          if ABB_TO_PROVINCE[ast.literal_eval(x)[1]] == PROVINCE_COMBO.get()]
-    if search_values in ('', ' '):
-        CITY_COMBO['values'] = [x.replace('_', ' ').title() for x in cities_in_province]
-    else:
-        display_values = []
-        for value in [x.replace('_', ' ').title() for x in cities_in_province]:
-            if search_values in value.lower():
-                display_values.append(value)
-                display_values.sort()
-        CITY_COMBO['values'] = display_values
+    if stations_loaded():
+        CITY_COMBO['values'] = station_data().search_index.search(
+            CITY_TYPE.get(), PROVINCE_TO_ABB[PROVINCE_COMBO.get()])
+
+
+def search_as_you_type() -> None:
+    """
+    Searches for the station as the user types in the search entry box, once a province has been
+    selected
+    """
+    if str(SEARCH_BUTTON['state']) == 'normal':
+        search()
 
 
 def creators_page() -> None:
@@ -207,11 +650,8 @@ def creators_page() -> None:
                                font=('Helvetica', 10, 'bold'),
                                bg='#FFE4AE', fg='#800000', borderwidth=0)
     introduction_label.grid(row=1, column=1, columnspan=4, pady=(10, 20))
-    # Opens the image for the title
-    creator_image = Image.open('creator_image.png')
-    # Resizes the image
-    resized = creator_image.resize((600, 250), Image.ANTIALIAS)
-    new_creator = ImageTk.PhotoImage(resized)
+    # Opens the image of the creators, resized once and then kept on disk
+    new_creator = PhotoImage(file=image_cache.resized_image('creator_image.png', (600, 250)))
     # Displays the image as a label
     creator_label = Label(creators_window, image=new_creator, borderwidth=0)
     creator_label.photo = new_creator
@@ -326,12 +766,14 @@ SEARCH_BUTTON = Button(ROOT, text='Search', command=search, bg='#800000', fg='#F
 SEARCH_BUTTON['state'] = 'disabled'
 SEARCH_BUTTON.grid(row=7, column=3, padx=15)
 
+# Updates the stations as the user types, once they stop typing for a moment
+CITY_TYPE.trace_add('write', station_search.Debouncer(ROOT, search_as_you_type))
+
 STATION_LABEL = Label(ROOT, text='3. Station', bg='#FFE4AE', fg='#800000')
 STATION_LABEL.grid(row=6, column=4, padx=15)
 
-CITY_OPTIONS = [x.replace('_', ' ').title() for x in CITIES]
-CITY_OPTIONS.sort()
-CITY_COMBO = ttk.Combobox(ROOT, value=[x.replace('_', ' ').title() for x in CITY_OPTIONS])
+# The stations are added once they are loaded
+CITY_COMBO = ttk.Combobox(ROOT, value=[])
 CITY_COMBO.bind('<<ComboboxSelected>>', selected)
 CITY_COMBO.grid(row=7, column=4, padx=15)
 
@@ -342,20 +784,34 @@ INSTRUCTIONS_BUTTON.grid(row=8, column=1, pady=(30, 0))
 CREATORS_BUTTON = Button(ROOT, text='Creators', command=creators_page, bg='#800000', fg='#FFE4AE')
 CREATORS_BUTTON.grid(row=8, column=4, pady=(30, 0))
 
+STATUS_LABEL = Label(ROOT, text='', bg='#FFE4AE', fg='#800000')
+STATUS_LABEL.grid(row=9, column=1, columnspan=4, pady=(15, 0))
+
+# Makes the maps and graphs on worker threads, and hands their progress back to the window
+SCHEDULER = tasks.TaskScheduler(ROOT)
+
 window(ROOT)
+# Runs once the window has appeared
+ROOT.after_idle(start_loading)
 mainloop()
+SCHEDULER.shutdown()
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
         # the names (strs) of imported modules
-        'extra-imports': ['tkinter', 'json', 'python_ta', 'python_ta.contracts',
-                          'ast', 'PIL', 'data_reading', 'combine', 'maps'],
+        'extra-imports': ['time', 'typing', 'tkinter', 'functools', 'json', 'python_ta',
+                          'python_ta.contracts', 'os', 'threading', 'annual_aggregates',
+                          'anomalies', 'data_reading', 'combine', 'emissions_store',
+                          'figure_cache', 'image_cache', 'instrumentation', 'maps',
+                          'station_search', 'stations', 'tasks', 'temperature_cube'],
         # the names (strs) of functions that call print/open/input
-        'allowed-io': ['read_temp_data'],
+        'allowed-io': ['read_temp_data', 'show_stations', 'show_startup_error'],
         'max-line-length': 100,
-        'disable': ['R1705', 'C0200']
+        # C0413: START_TIME is recorded before the other imports so that they count in the startup
+        # times; C0415: the heavy modules are imported inside the functions that first need them
+        'disable': ['R1705', 'C0200', 'C0413', 'C0415']
     })
 
     import python_ta.contracts
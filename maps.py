@@ -18,11 +18,19 @@ please consult our Course Syllabus.
 This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
 """
 
-from typing import Dict, Any, List
+from __future__ import annotations
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from collections.abc import Mapping
 import json
-import ast
 import math
 import plotly.express as px
+import plotly.graph_objects as go
+import annual_aggregates
+import anomalies
+import data_reading
+import geometry
+import instrumentation
+import stations
 
 PROVINCE_LIST = ['Alberta', 'British Columbia', 'Manitoba', 'New Brunswick',
                  'Newfoundland and Labrador', 'Northwest Territories', 'Nova Scotia', 'Nunavut',
@@ -30,22 +38,42 @@ PROVINCE_LIST = ['Alberta', 'British Columbia', 'Manitoba', 'New Brunswick',
 
 
 def plot_emissions_map(geojson_map_file_name: str, type_of_map: str, dataframe: dict,
-                       province_id_map: dict, year: int) -> None:
-    """Plot a map that shows the CO2 equivalent emissions in different provinces and territories in
-    Canada.
+                       province_id_map: dict, year: int,
+                       resolution: str = geometry.DEFAULT_RESOLUTION) -> None:
+    """Plot the map made by build_emissions_map with the same arguments in a browser window.
+
+    Preconditions:
+        - geojson_map_file_name is in the form 'canada_provinces.geojson'
+        - 1990 < year <= 2018
+        - resolution in geometry.TOLERANCES
+    """
+    fig = build_emissions_map(geojson_map_file_name, type_of_map, dataframe, province_id_map, year,
+                              resolution)
+    fig.show()
+    # fig.write_image('emissions_map_' + type_of_map + '.png', width=1000)
+
+
+@instrumentation.stage()
+def build_emissions_map(geojson_map_file_name: str, type_of_map: str, dataframe: dict,
+                        province_id_map: dict, year: int,
+                        resolution: str = geometry.DEFAULT_RESOLUTION) -> go.Figure:
+    """Return a map that shows the CO2 equivalent emissions in different provinces and territories
+    in Canada.
 
     geojson_map_file_name a file containing the borders of each of the provinces. The type_of_map
     indicates whether the program is plotting the raw data or if it is plotting the differences. The
     dataframe is the dictionary that is read to plot the map. The province_id_map maps each of the
     provinces and territories in Canada to their id that is specified in the geojson file. The
-    function will take data from the year specified.
+    function will take data from the year specified. The borders are simplified to resolution, one
+    of the keys of geometry.TOLERANCES, to keep the figure small.
 
     Preconditions:
         - geojson_map_file_name is in the form 'canada_provinces.geojson'
         - 1990 < year <= 2018
+        - resolution in geometry.TOLERANCES
     """
 
-    province_borders = json.load(open(geojson_map_file_name, 'r'))
+    province_borders = geometry.simplified_geojson(geojson_map_file_name, resolution)
     # dataframe is in alphabetical order because of the way the file is structured
     colours = dataframe[year]
     # convert data into a logarithmic scale if we are looking at the raw data
@@ -70,21 +98,37 @@ def plot_emissions_map(geojson_map_file_name: str, type_of_map: str, dataframe:
         fig.update_layout(coloraxis_colorbar=dict(title="SCALE", tickvals=tickvals,
                                                   ticktext=[math.pow(10, tickval)
                                                             for tickval in tickvals]))
-    fig.show()
-    # fig.write_image('emissions_map_' + type_of_map + '.png', width=1000)
+    return fig
 
 
 def plot_temperatures_map(geojson_map_file_name: str, type_of_map: str, dataframe: dict,
-                          year: int) -> None:
-    """Plot a map that shows the daily mean temperatures in different provinces and territories in
+                          year: int, resolution: str = geometry.DEFAULT_RESOLUTION) -> None:
+    """Plot the map made by build_temperatures_map with the same arguments in a browser window.
+
+    Preconditions:
+        - resolution in geometry.TOLERANCES
+    """
+    fig = build_temperatures_map(geojson_map_file_name, type_of_map, dataframe, year, resolution)
+    fig.show()
+    # fig.write_image('daily_temperatures_map_' + type_of_map + '.png', width=1000)
+
+
+@instrumentation.stage()
+def build_temperatures_map(geojson_map_file_name: str, type_of_map: str, dataframe: dict,
+                           year: int, resolution: str = geometry.DEFAULT_RESOLUTION) -> go.Figure:
+    """Return a map that shows the daily mean temperatures in different provinces and territories in
     Canada.
 
     geojson_map_file_name a file containing the borders of each of the provinces. The type_of_map
     indicates whether the program is plotting the raw data or if it is plotting the differences. The
     dataframe is the dictionary that is read to plot the map. The function will take data from the
-    year specified.
+    year specified. The borders are simplified to resolution, one of the keys of
+    geometry.TOLERANCES, to keep the figure small.
+
+    Preconditions:
+        - resolution in geometry.TOLERANCES
     """
-    province_borders = json.load(open(geojson_map_file_name, 'r'))
+    province_borders = geometry.simplified_geojson(geojson_map_file_name, resolution)
     # convert data into a logarithmic scale
     log_values = []
     for temp in dataframe[year]:
@@ -109,14 +153,66 @@ def plot_temperatures_map(geojson_map_file_name: str, type_of_map: str, datafram
     fig.update_layout(coloraxis_colorbar=dict(title="SCALE", tickvals=tickvals,
                                               ticktext=[math.pow(10, tickval)
                                                         for tickval in tickvals]))
-    fig.show()
-    # fig.write_image('daily_temperatures_map_' + type_of_map + '.png', width=1000)
+    return fig
+
+
+@instrumentation.stage()
+def build_animated_emissions_map(geojson_map_file_name: str, type_of_map: str,
+                                 frames: Mapping[int, dict], province_id_map: dict,
+                                 resolution: str = geometry.DEFAULT_RESOLUTION) -> go.Figure:
+    """Return one map with a slider and a play button that goes through the emissions maps of every
+    year in frames, instead of a separate figure for each year.
+
+    frames maps each year to the dataframe that build_emissions_map would be given for that year.
+    The borders are only in the figure once, and each frame only changes the colours and the hover
+    values of the provinces. Every frame uses the same colour scale, so that the years can be
+    compared.
+
+    Preconditions:
+        - frames != {}
+        - all(1990 < year <= 2018 for year in frames)
+        - resolution in geometry.TOLERANCES
+    """
+    years = sorted(frames)
+    traces = {year: build_emissions_map(geojson_map_file_name, type_of_map, frames[year],
+                                        province_id_map, year, resolution).data[0]
+              for year in years}
+    fig = build_emissions_map(geojson_map_file_name, type_of_map, frames[years[0]],
+                              province_id_map, years[0], resolution)
+    fig.frames = [go.Frame(data=[go.Choropleth(z=traces[year].z,
+                                               customdata=traces[year].customdata,
+                                               hovertemplate=traces[year].hovertemplate)],
+                           name=str(year))
+                  for year in years]
+
+    lowest = min(min(traces[year].z) for year in years)
+    highest = max(max(traces[year].z) for year in years)
+    fig.update_layout(coloraxis=dict(cmin=lowest, cmax=highest))
+    if type_of_map == 'Raw Data':
+        tickvals = list(range(math.floor(lowest), math.ceil(highest)))
+        fig.update_layout(coloraxis_colorbar=dict(title="SCALE", tickvals=tickvals,
+                                                  ticktext=[math.pow(10, tickval)
+                                                            for tickval in tickvals]))
+
+    # the borders do not change between frames, but a map has to be redrawn to show new colours
+    fig.update_layout(
+        updatemenus=[dict(type='buttons', showactive=False,
+                          buttons=[dict(label='Play', method='animate',
+                                        args=[None, {'frame': {'duration': 700, 'redraw': True},
+                                                     'fromcurrent': True}])])],
+        sliders=[dict(currentvalue={'prefix': 'Year: '},
+                      steps=[dict(label=str(year), method='animate',
+                                  args=[[str(year)], {'mode': 'immediate',
+                                                      'frame': {'duration': 0, 'redraw': True}}])
+                             for year in years])])
+    return fig
 
 
 ###############################
 # Helper Functions
 ###############################
 
+@instrumentation.stage(items=len)
 def format_province_id_map(geojson_map_file_name: str) -> Dict[str, int]:
     """Return the formatted version of the emissions data given geojson_map_file_name which refers
     to the name of the raw geojson file containing the information about province and territory
@@ -127,7 +223,7 @@ def format_province_id_map(geojson_map_file_name: str) -> Dict[str, int]:
         - geojson_map_file_name refers to a file in the format 'canada_provinces_geojson'
     """
 
-    province_borders = json.load(open(geojson_map_file_name, 'r'))
+    province_borders = geometry.load_geojson(geojson_map_file_name)
     province_id_map = {}
     for feature in province_borders['features']:
         # creating a dictionary that maps the province name to the id
@@ -135,6 +231,7 @@ def format_province_id_map(geojson_map_file_name: str) -> Dict[str, int]:
     return province_id_map
 
 
+@instrumentation.stage(items=lambda dataframe: len(dataframe['id']))
 def format_temps(geojson_stations_file_name: str, json_temp_file_name: str) -> Dict[Any, List[Any]]:
     """Return the formatted version of the daily temperatures data given geojson_stations_file_name,
     containing the information on the geographical locations of each of the weather stations, and
@@ -152,25 +249,131 @@ def format_temps(geojson_stations_file_name: str, json_temp_file_name: str) -> D
     """
 
     daily_temps = json.load(open(json_temp_file_name, 'r'))
-    weather_stations = json.load(open(geojson_stations_file_name, 'r'))
-    # keys are ids, coordinates are values
-    weather_station_id_map = {}
+
+    # convert the keys back into tuples
+    station_temps = ((stations.parse_key(key), daily_temps[key]) for key in daily_temps)
+    return format_annual_temps(geojson_stations_file_name, annual_mean_temps(station_temps))
+
+
+@instrumentation.stage(items=lambda dataframe: len(dataframe['id']))
+def format_temps_from_files(geojson_stations_file_name: str, file_path: str,
+                            directory: str) -> Dict[Any, List[Any]]:
+    """Return the same formatted version of the daily temperatures data as format_temps, reading the
+    daily mean temperatures straight from the text files in directory instead of from a json file.
+
+    The files are read one at a time by data_reading.iter_daily_mean_temps and only the annual
+    averages of each station are kept, so the daily temperatures of all the stations are never in
+    memory at once.
+
+    Preconditions:
+        - geojson_stations_file_name is in the format of 'weather_stations.geojson'
+        - file_path and directory are in the same format as in
+          data_reading.read_daily_mean_temps_all_files
+    """
+
+    station_temps = ((data_reading.make_location_key(first_line_list, True), years_and_temps)
+                     for first_line_list, years_and_temps in
+                     data_reading.iter_daily_mean_temps(file_path, directory))
+    return format_annual_temps(geojson_stations_file_name, annual_mean_temps(station_temps))
+
+
+@instrumentation.stage(items=lambda dataframe: len(dataframe['id']))
+def format_temps_from_aggregates(geojson_stations_file_name: str,
+                                aggregates: annual_aggregates.AnnualAggregates) \
+        -> Dict[Any, List[Any]]:
+    """Return the same formatted version of the daily temperatures data as format_temps, using the
+    annual mean temperatures already computed in aggregates instead of averaging every day again.
+
+    Preconditions:
+        - geojson_stations_file_name is in the format of 'weather_stations.geojson'
+    """
+
+    return format_annual_temps(geojson_stations_file_name, aggregates.annual_means_by_id())
+
+
+@instrumentation.stage(items=lambda dataframe: len(dataframe['id']))
+def format_temp_anomalies(geojson_stations_file_name: str, engine: anomalies.AnomalyEngine,
+                          baseline: anomalies.Baseline = (1990, 1990),
+                          years: Optional[Iterable[int]] = None) -> Dict[Any, List[Any]]:
+    """Return the difference between the annual mean temperature of each station in each year and
+    its baseline temperature, in the same format as calculate_temp_difference. The stations of
+    engine must be keyed by their (id, name, province), as in anomalies.engine_from_aggregates.
+    If years is not None, only the differences in those years are included.
+
+    The anomalies of every station come from a single array operation that engine caches for each
+    baseline. With the default baseline of 1990 the result is the same as
+    calculate_temp_difference(format_temps(...)).
+
+    Preconditions:
+        - geojson_stations_file_name is in the format of 'weather_stations.geojson'
+    """
+
+    weather_stations = geometry.load_geojson(geojson_stations_file_name)
+    rows_by_id = {key[0]: row for key, row in engine.rows_by_key.items() if key[0] != ''}
+
+    rows = []
+    formatted_so_far = {'id': [], 'latitudes': [], 'longitudes': []}
     for feature in weather_stations['features']:
-        # creating a dictionary that maps the province name to the id
-        weather_station_id_map[feature['id']] = feature['geometry']['coordinates']
+        if feature['id'] in rows_by_id:
+            list.append(rows, rows_by_id[feature['id']])
+            list.append(formatted_so_far['id'], feature['id'])
+            list.append(formatted_so_far['latitudes'], feature['geometry']['coordinates'][1])
+            list.append(formatted_so_far['longitudes'], feature['geometry']['coordinates'][0])
+
+    differences = engine.anomalies(baseline)[rows]
+    if years is None:
+        years = range(engine.first_year, engine.first_year + differences.shape[1])
+    for year in years:
+        formatted_so_far[year] = differences[:, year - engine.first_year].tolist()
+    return formatted_so_far
+
+
+@instrumentation.stage(items=len)
+def annual_mean_temps(station_temps: Iterable[Tuple[tuple, Dict[Any, List[float]]]]) \
+        -> Dict[str, Dict[Any, float]]:
+    """Return a dictionary mapping the id of each station in station_temps to a dictionary of the
+    average temperature of the station in each year. Each element of station_temps is the key of a
+    station in the format of the keys of data_reading.read_daily_mean_temps_all_files_for_maps,
+    together with its temperatures in each year.
+
+    station_temps is only iterated over once, so it can be a generator that reads one station at a
+    time. Stations with no temperatures are left out.
+
+    >>> annual_mean_temps(iter([(('1', 'A', 'BC'), {1990: [1.0, 2.0]}), (('2', 'B', 'BC'), {})]))
+    {'1': {1990: 1.5}}
+    """
+
+    annual_temps_so_far = {}
+    for key, years_and_temps in station_temps:
+        if years_and_temps != {}:
+            annual_temps_so_far[key[0]] = {year: sum(years_and_temps[year]) /
+                                           len(years_and_temps[year]) for year in years_and_temps}
+    return annual_temps_so_far
 
-    # remove all of the stations with an empty dictionary, convert the keys back into tuples
-    daily_temps_dict = {ast.literal_eval(key): daily_temps[key] for key in daily_temps
-                        if daily_temps[key] != {}}
-    daily_temps_dict = {key[0]: {
-        inner_key: sum(daily_temps_dict[key][inner_key]) / len(daily_temps_dict[key][inner_key]) for
-        inner_key in daily_temps_dict[key]} for key in daily_temps_dict}
 
-    remove_unusable_values(weather_station_id_map, daily_temps_dict)
-    formatted_emissions = reformat_daily_temps_data(weather_station_id_map, daily_temps_dict)
+@instrumentation.stage(items=lambda dataframe: len(dataframe['id']))
+def format_annual_temps(geojson_stations_file_name: str,
+                        annual_temps: Dict[str, Dict[Any, float]]) -> Dict[Any, List[Any]]:
+    """Return the formatted version of the daily temperatures data as in format_temps, given the
+    average temperature of each station in each year as returned by annual_mean_temps.
+
+    Preconditions:
+        - geojson_stations_file_name is in the format of 'weather_stations.geojson'
+    """
+
+    weather_stations = geometry.load_geojson(geojson_stations_file_name)
+    # keys are ids, coordinates are values, for the stations that also have temperatures, found
+    # with a single hash join
+    weather_station_id_map = {}
+    for feature in weather_stations['features']:
+        if feature['id'] in annual_temps:
+            weather_station_id_map[feature['id']] = feature['geometry']['coordinates']
+
+    formatted_emissions = reformat_daily_temps_data(weather_station_id_map, annual_temps)
     return formatted_emissions
 
 
+@instrumentation.stage()
 def calculate_emissions_difference(raw_data: Dict[int, List[float]]) -> Dict[Any, List[float]]:
     """Return a dictionary containing the difference between emissions in each year from 1990 to
     2018 compared to 1990 given raw_data. The keys of the returned dictionary will be the same as
@@ -189,6 +392,7 @@ def calculate_emissions_difference(raw_data: Dict[int, List[float]]) -> Dict[Any
     return difference_dict_so_far
 
 
+@instrumentation.stage()
 def calculate_temp_difference(raw_data: Dict[Any, List[Any]]) -> Dict[Any, List[Any]]:
     """Return a dictionary containing the difference between daily mean temperatures in each year
     from 1990 to 2018 compared to 1990 given raw_data. The keys of the returned dictionary will be
@@ -209,36 +413,82 @@ def calculate_temp_difference(raw_data: Dict[Any, List[Any]]) -> Dict[Any, List[
     return difference_dict_so_far
 
 
-def remove_unusable_values(id_to_coords: Dict[str, List[float]],
-                           temp_data: Dict[str, Dict[str, float]]) -> None:
-    """Remove the key and the value associated to it in both id_to_coords and temp_data that are
-    not in both dictionaries.
+class DifferenceView(Mapping):
+    """A read only dictionary view of the difference between each year of raw_data and
+    baseline_year, in the same format as calculate_emissions_difference and
+    calculate_temp_difference, but for any baseline year.
 
-    Preconditions:
-        - all(len(id_to_coords[key]) == 2 for key in id_to_coords)
-        - the keys of both dictionaries must be the weather station ids
-    """
+    The difference of a year is only computed the first time that year is looked up, and is then
+    memoized under (baseline year, year). Views made by rebased share their memoized differences, so
+    going back to an earlier baseline year does not compute anything again.
 
-    keys_to_remove_id_to_coords = []
-    keys_to_remove_temp_data = []
+    Keys of raw_data that are not years, such as 'id', 'latitudes' and 'longitudes', are looked up
+    in raw_data unchanged.
 
-    # collects the station names that are in weather_station_id_map but not in
-    # station_ids_in_daily_temps
-    for station_id in id_to_coords:
-        if station_id not in temp_data:
-            list.append(keys_to_remove_id_to_coords, station_id)
+    Instance Attributes:
+        - raw_data: the data that the differences are computed from
+        - baseline_year: the year that every other year is compared to
+        - differences: the differences computed so far, keyed by (baseline year, year)
 
-    # collects the station names that are in daily_temperature_dict but not in
-    # weather_station_id_map
-    for station_id in temp_data:
-        if station_id not in id_to_coords:
-            list.append(keys_to_remove_temp_data, station_id)
+    Representation Invariants:
+        - self.baseline_year in self.raw_data
 
-    # remove all the values corresponding to keys that are not in both dictionaries
-    for key in keys_to_remove_id_to_coords:
-        dict.pop(id_to_coords, key)
-    for key in keys_to_remove_temp_data:
-        dict.pop(temp_data, key)
+    >>> view = DifferenceView({'id': ['A', 'B'], 1990: [1.0, 2.0], 1991: [4.0, 1.0]}, 1990)
+    >>> view['id'], view[1991]
+    (['A', 'B'], [3.0, -1.0])
+    >>> view.rebased(1991)[1990]
+    [-3.0, 1.0]
+    >>> sorted(view.differences)
+    [(1990, 1991), (1991, 1990)]
+    """
+    raw_data: Dict[Any, List[Any]]
+    baseline_year: int
+    differences: Dict[Tuple[int, int], List[float]]
+
+    def __init__(self, raw_data: Dict[Any, List[Any]], baseline_year: int = 1990,
+                 differences: Optional[Dict[Tuple[int, int], List[float]]] = None) -> None:
+        """Initialize a view of the differences between each year of raw_data and baseline_year,
+        memoized in differences.
+        """
+        self.raw_data = raw_data
+        self.baseline_year = baseline_year
+        self.differences = {} if differences is None else differences
+
+    def __getitem__(self, key: Any) -> List[Any]:
+        """Return the difference between year key and baseline_year, or raw_data[key] if key is
+        not a year.
+        """
+        if isinstance(key, str):
+            return self.raw_data[key]
+        if (self.baseline_year, key) not in self.differences:
+            baseline = self.raw_data[self.baseline_year]
+            target = self.raw_data[key]
+            self.differences[(self.baseline_year, key)] = [target[i] - baseline[i] for i in
+                                                           range(len(baseline))]
+        return self.differences[(self.baseline_year, key)]
+
+    def __iter__(self) -> Iterator[Any]:
+        """Return an iterator over the keys of raw_data."""
+        return iter(self.raw_data)
+
+    def __len__(self) -> int:
+        """Return the number of keys of raw_data."""
+        return len(self.raw_data)
+
+    def rebased(self, baseline_year: int) -> DifferenceView:
+        """Return a view of the differences between each year of raw_data and baseline_year that
+        shares the differences memoized by this view.
+        """
+        return DifferenceView(self.raw_data, baseline_year, self.differences)
+
+    @instrumentation.stage()
+    def frame(self, year: int) -> Dict[Any, List[Any]]:
+        """Return a dictionary with the difference in year and the keys of raw_data that are not
+        years, which is everything plot_emissions_map and plot_temperatures_map need to plot year.
+        """
+        frame_so_far = {key: self.raw_data[key] for key in self.raw_data if isinstance(key, str)}
+        frame_so_far[year] = self[year]
+        return frame_so_far
 
 
 def reformat_daily_temps_data(id_to_coords: Dict[str, List[float]],
@@ -270,11 +520,12 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         # the names (strs) of imported modules
-        'extra-imports': ['json', 'plotly.express', 'python_ta', 'python_ta.contracts', 'ast',
-                          'math'],
+        'extra-imports': ['collections.abc', 'json', 'plotly.express', 'plotly.graph_objects',
+                          'python_ta', 'python_ta.contracts', 'math', 'annual_aggregates',
+                          'anomalies', 'data_reading', 'geometry', 'instrumentation',
+                          'stations'],
         # the names (strs) of functions that call print/open/input
-        'allowed-io': ['plot_emissions_map', 'plot_temperatures_map', 'format_province_id_map',
-                       'format_temps'],
+        'allowed-io': ['format_temps'],
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
     })
@@ -0,0 +1,171 @@
+"""CSC110 Fall 2020 Final Project, Parallel Data Reading
+
+Description
+===============================
+This module reads the daily mean temperature files of a directory in parallel. The list of files is
+split into shards that are handed out to a pool of worker processes. Each worker runs the same
+pipeline as data_reading.read_daily_mean_temps_one_file on its shard and sends the temperatures back
+as the numpy arrays of data_reading.read_daily_mean_temps_array, which are much cheaper to pass
+between processes than dictionaries of lists of floats.
+
+The results are the same as the ones returned by data_reading.read_daily_mean_temps_all_files and
+data_reading.read_daily_mean_temps_all_files_for_maps.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+import data_reading
+
+# the number of shards handed to each worker process; more than one shard per worker evens out the
+# load when some station files are much longer than others
+SHARDS_PER_PROCESS = 4
+
+# the temperatures of one station as (years, number of days in each year, all temperatures)
+PackedTemps = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def read_daily_mean_temps_all_files_parallel(file_path: str, directory: str,
+                                             processes: Optional[int] = None,
+                                             for_maps: bool = False) \
+        -> Dict[tuple, Dict[int, List[float]]]:
+    """Read and return the data in ALL of the text files in directory using a pool of processes
+    worker processes. If processes is None, one worker is started for every cpu.
+
+    If for_maps is True, the keys of the returned dictionary are the same as in
+    data_reading.read_daily_mean_temps_all_files_for_maps (station id, station name, province).
+    Otherwise they are the same as in data_reading.read_daily_mean_temps_all_files (station name,
+    province). The values are the same as in both of those functions.
+
+    Preconditions:
+        - processes is None or processes >= 1
+        - file_path and directory are in the same format as in
+          data_reading.read_daily_mean_temps_all_files
+    """
+    stations = read_all_stations_parallel(file_path, directory, processes)
+    return {data_reading.make_location_key(first_line_list, for_maps): years_and_temps
+            for first_line_list, years_and_temps in stations}
+
+
+def read_daily_mean_temps_all_files_both_parallel(file_path: str, directory: str,
+                                                  processes: Optional[int] = None) -> \
+        Tuple[Dict[Tuple[str, str], Dict[int, List[float]]],
+              Dict[Tuple[str, str, str], Dict[int, List[float]]]]:
+    """Return the same dictionaries as data_reading.read_daily_mean_temps_all_files_both using a
+    pool of processes worker processes, reading each of the files once.
+
+    Preconditions:
+        - processes is None or processes >= 1
+        - file_path and directory are in the same format as in
+          data_reading.read_daily_mean_temps_all_files
+    """
+    return data_reading.make_both_dictionaries(
+        read_all_stations_parallel(file_path, directory, processes))
+
+
+def read_all_stations_parallel(file_path: str, directory: str, processes: Optional[int] = None) \
+        -> List[Tuple[List[str], Dict[int, List[float]]]]:
+    """Return the same list as data_reading.read_all_stations using a pool of processes worker
+    processes. If processes is None, one worker is started for every cpu.
+
+    Preconditions:
+        - processes is None or processes >= 1
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    shards = shard_file_names(os.listdir(directory), processes * SHARDS_PER_PROCESS)
+
+    stations_so_far = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for shard_results in executor.map(read_shard, [file_path] * len(shards), shards):
+            for first_line_list, packed in shard_results:
+                list.append(stations_so_far, (first_line_list, unpack_temps(packed)))
+
+    return stations_so_far
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def shard_file_names(file_names: List[str], number_of_shards: int) -> List[List[str]]:
+    """Return file_names split into at most number_of_shards lists of nearly equal length. Every
+    file name is in exactly one shard, and the order of the file names is kept.
+
+    >>> shard_file_names(['a', 'b', 'c', 'd', 'e'], 2)
+    [['a', 'b', 'c'], ['d', 'e']]
+    >>> shard_file_names([], 3)
+    []
+
+    Preconditions:
+        - number_of_shards >= 1
+    """
+    number_of_shards = min(number_of_shards, len(file_names))
+    shards = []
+    start = 0
+    for shard in range(number_of_shards):
+        end = start + len(file_names) // number_of_shards + \
+            (1 if shard < len(file_names) % number_of_shards else 0)
+        list.append(shards, file_names[start:end])
+        start = end
+    return shards
+
+
+def read_shard(file_path: str, file_names: List[str]) -> List[Tuple[List[str], PackedTemps]]:
+    """Return the header fields and the packed temperatures of every file in file_names. This is the
+    function that runs inside the worker processes.
+    """
+    shard_results = []
+    for file_name in file_names:
+        first_line_list = data_reading.read_station_header(file_path + file_name)
+        years, days_in_each_year, temps, _ = \
+            data_reading.read_daily_mean_temps_array(file_path + file_name)
+        list.append(shard_results, (first_line_list, (years, days_in_each_year, temps)))
+    return shard_results
+
+
+def unpack_temps(packed: PackedTemps) -> Dict[int, List[float]]:
+    """Return the dictionary of the temperatures in each year that were packed into packed by
+    read_shard.
+
+    >>> unpack_temps((np.array([1990, 1991]), np.array([2, 1]), np.array([1.0, 2.0, 3.0])))
+    {1990: [1.0, 2.0], 1991: [3.0]}
+    """
+    return data_reading.make_years_dictionary(*packed)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'concurrent.futures', 'os', 'numpy', 'data_reading',
+                          'python_ta', 'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
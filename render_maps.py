@@ -0,0 +1,212 @@
+"""CSC110 Fall 2020 Final Project, Map Rendering
+
+Description
+===============================
+This module renders the maps of every year to files without opening a browser or the user
+interface. For each year from 1991 to 2018 it writes the three maps that the Map button opens: the
+raw emissions, the difference in emissions and the difference in temperatures compared to 1990.
+It also writes one animated map of the emissions with a slider over all the years.
+
+The years are rendered in parallel by a pool of worker processes. Each worker reads the data files
+once when it starts, and is then only sent the years to render. The pages do not each embed their
+own copy of plotly.js: they all load the single plotly.min.js that is written next to them.
+
+The maps can also be exported as PNG images, which needs the kaleido package that plotly uses to
+export images.
+
+The maps can be rendered from the command line, for example:
+
+    python render_maps.py rendered_maps --png
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import plotly.io as pio
+import annual_aggregates
+import anomalies
+import data_reading
+import maps
+
+FIRST_YEAR = 1991
+LAST_YEAR = 2018
+
+# the year that the differences are compared to, as in main.MAP_BASELINE_YEAR
+BASELINE_YEAR = 1990
+
+# the width in pixels of the exported images, as in the commented out exports of maps
+PNG_WIDTH = 1000
+
+
+class MapData:
+    """The data that the maps of every year are made from, read once.
+
+    Instance Attributes:
+        - province_geojson_file_name: the geojson file of the province borders
+        - stations_geojson_file_name: the geojson file of the locations of the weather stations
+        - province_id_map: maps the name of each province to its id in the province geojson
+        - emissions: the emissions of each province in each year
+        - emissions_differences: the differences in emissions compared to BASELINE_YEAR
+        - temperatures_differences: the differences in temperatures compared to BASELINE_YEAR, or
+          None if they come from engine
+        - engine: the anomalies of the annual aggregates, or None if there are none
+    """
+    province_geojson_file_name: str
+    stations_geojson_file_name: str
+    province_id_map: Dict[str, int]
+    emissions: Dict[int, List[float]]
+    emissions_differences: maps.DifferenceView
+    temperatures_differences: Optional[maps.DifferenceView]
+    engine: Optional[anomalies.AnomalyEngine]
+
+    def __init__(self, province_geojson_file_name: str, stations_geojson_file_name: str,
+                 map_temps_file_name: str, emissions_csv_file_name: str,
+                 aggregates_file_name: Optional[str] = None) -> None:
+        """Read the data of the maps from the given files. The temperatures are read from the
+        annual aggregates called aggregates_file_name if it is not None, and from
+        map_temps_file_name otherwise.
+        """
+        self.province_geojson_file_name = province_geojson_file_name
+        self.stations_geojson_file_name = stations_geojson_file_name
+        self.province_id_map = maps.format_province_id_map(province_geojson_file_name)
+        self.emissions = data_reading.read_ghg_emissions_for_maps(emissions_csv_file_name)
+        self.emissions_differences = maps.DifferenceView(self.emissions, BASELINE_YEAR)
+        if aggregates_file_name is not None:
+            self.engine = anomalies.engine_from_aggregates(
+                annual_aggregates.load_annual_aggregates(aggregates_file_name))
+            self.temperatures_differences = None
+        else:
+            self.engine = None
+            self.temperatures_differences = maps.DifferenceView(
+                maps.format_temps(stations_geojson_file_name, map_temps_file_name), BASELINE_YEAR)
+
+    def raw_emissions_frame(self, year: int) -> Dict[int, List[float]]:
+        """Return the dataframe of the map of the emissions in year."""
+        return {year: self.emissions[year]}
+
+    def temperatures_difference_frame(self, year: int) -> Dict[Any, List[Any]]:
+        """Return the dataframe of the map of the differences in temperatures in year."""
+        if self.temperatures_differences is None:
+            return maps.format_temp_anomalies(self.stations_geojson_file_name, self.engine,
+                                              (BASELINE_YEAR, BASELINE_YEAR), [year])
+        else:
+            return self.temperatures_differences.frame(year)
+
+
+def render_all_maps(output_directory: str, map_data_files: List[Optional[str]],
+                    years: Iterable[int] = range(FIRST_YEAR, LAST_YEAR + 1), png: bool = False,
+                    processes: Optional[int] = None) -> List[str]:
+    """Render the three maps of each of years and the animated map of the emissions into
+    output_directory, and return the names of the files that were written.
+
+    map_data_files are the arguments of MapData. The years are rendered by a pool of processes
+    worker processes, or one for every cpu if processes is None. If png is True, every map is also
+    exported as a PNG image.
+
+    Preconditions:
+        - all(FIRST_YEAR <= year <= LAST_YEAR for year in years)
+        - processes is None or processes >= 1
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    years = list(years)
+    written_so_far = []
+    with ProcessPoolExecutor(max_workers=processes, initializer=start_worker,
+                             initargs=(map_data_files,)) as executor:
+        for file_names in executor.map(render_year, [output_directory] * len(years), years,
+                                       [png] * len(years)):
+            list.extend(written_so_far, file_names)
+
+    map_data = MapData(*map_data_files)
+    animated = maps.build_animated_emissions_map(
+        map_data.province_geojson_file_name, 'Raw Data',
+        {year: map_data.raw_emissions_frame(year) for year in years}, map_data.province_id_map)
+    list.extend(written_so_far, write_figure(animated, output_directory, 'emissions_raw_animated',
+                                             False))
+    return written_so_far
+
+
+###############################
+# Helper Functions
+###############################
+
+
+# the data of the maps in a worker process, read once by start_worker
+_WORKER_MAP_DATA: List[MapData] = []
+
+
+def start_worker(map_data_files: List[Optional[str]]) -> None:
+    """Read the data of the maps in a new worker process."""
+    _WORKER_MAP_DATA[:] = [MapData(*map_data_files)]
+
+
+def render_year(output_directory: str, year: int, png: bool) -> List[str]:
+    """Render the three maps of year into output_directory and return the names of the files that
+    were written. This is the function that runs inside the worker processes.
+    """
+    map_data = _WORKER_MAP_DATA[0]
+    province_geojson_file_name = map_data.province_geojson_file_name
+    figures = {
+        'emissions_raw': maps.build_emissions_map(province_geojson_file_name, 'Raw Data',
+                                                  map_data.raw_emissions_frame(year),
+                                                  map_data.province_id_map, year),
+        'emissions_difference': maps.build_emissions_map(
+            province_geojson_file_name, 'Difference', map_data.emissions_differences.frame(year),
+            map_data.province_id_map, year),
+        'temperatures_difference': maps.build_temperatures_map(
+            province_geojson_file_name, 'Difference',
+            map_data.temperatures_difference_frame(year), year)}
+
+    written_so_far = []
+    for kind, fig in figures.items():
+        list.extend(written_so_far, write_figure(fig, output_directory, kind + '_' + str(year),
+                                                 png))
+    return written_so_far
+
+
+def write_figure(fig: Any, output_directory: str, name: str, png: bool) -> List[str]:
+    """Write fig to output_directory as the HTML page name + '.html', and as the image
+    name + '.png' if png is True, and return the names of the files that were written.
+
+    The page loads the plotly.min.js in output_directory, which plotly writes there with the first
+    page.
+    """
+    html_file_name = os.path.join(output_directory, name + '.html')
+    pio.write_html(fig, html_file_name, include_plotlyjs='directory', auto_open=False)
+    if not png:
+        return [html_file_name]
+
+    png_file_name = os.path.join(output_directory, name + '.png')
+    pio.write_image(fig, png_file_name, width=PNG_WIDTH)
+    return [html_file_name, png_file_name]
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description='Render the maps of every year to files.')
+    PARSER.add_argument('output_directory', nargs='?', default='rendered_maps')
+    PARSER.add_argument('--first-year', type=int, default=FIRST_YEAR)
+    PARSER.add_argument('--last-year', type=int, default=LAST_YEAR)
+    PARSER.add_argument('--png', action='store_true', help='also export PNG images (needs kaleido)')
+    PARSER.add_argument('--processes', type=int, default=None)
+    PARSER.add_argument('--aggregates', default=None,
+                        help='read the temperatures from these annual aggregates')
+    ARGUMENTS = PARSER.parse_args()
+
+    WRITTEN = render_all_maps(ARGUMENTS.output_directory,
+                              ['canada_provinces.geojson', 'weather_stations.geojson',
+                               'data_for_maps_since_1990.json', 'GHG_IPCC_Can_Prov_Terr.csv',
+                               ARGUMENTS.aggregates],
+                              range(ARGUMENTS.first_year, ARGUMENTS.last_year + 1),
+                              ARGUMENTS.png, ARGUMENTS.processes)
+    print(f'Wrote {len(WRITTEN)} files to {ARGUMENTS.output_directory}')
@@ -0,0 +1,286 @@
+"""CSC110 Fall 2020 Final Project, Station Reports
+
+Description
+===============================
+This module writes the graph that the user interface opens for a station, which compares the
+temperature anomaly of the station to the CO2 emissions of its province, for every station at
+once. Each graph is written as an HTML page, and an index page links to all of them by province.
+
+The emissions series of each province is computed once and shared by all of its stations, instead
+of reading the emissions file again for every station. The graphs are built and written by a pool
+of worker processes, which are sent the emissions series once when they start and then only the
+temperature anomalies of the stations. The pages all load a single plotly.min.js written next to
+them instead of each embedding their own copy.
+
+Every page is written next to its final name and then moved there, so a page that exists is always
+complete. A manifest in the directory records a hash of the data that each page was made from, and
+is saved after every chunk of pages. A run that was interrupted can therefore be started again, and
+it only writes the pages that are missing or whose data has changed since they were written.
+
+The reports can be written from the command line, for example:
+
+    python render_reports.py station_reports --aggregates aggregates
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import time
+import plotly.io as pio
+import annual_aggregates
+import anomalies
+import combine
+import emissions_store
+import stations
+
+# the number of stations sent to a worker process at a time
+CHUNK_SIZE = 64
+
+INDEX_FILE_NAME = 'index.html'
+
+# the file in the output directory that maps the file name of each report to the hash of its data
+MANIFEST_FILE_NAME = 'reports_manifest.json'
+
+# a station to write the report of, as (name, province abbreviation, temperature values), where the
+# temperature values are in the format returned by combine.values_for_temp_plot
+StationSeries = Tuple[str, str, List[List[Any]]]
+
+
+def render_all_reports(output_directory: str, store: emissions_store.EmissionsStore,
+                       station_series: Iterable[StationSeries], processes: Optional[int] = None,
+                       on_progress: Optional[Callable[[int, int], None]] = None) -> List[str]:
+    """Write the report of each station of station_series to output_directory, together with an
+    index page, and return the names of the report files of the stations.
+
+    The emissions of each province are looked up in store. The reports that are already in
+    output_directory and were made from the same data are not written again. The others are
+    written by a pool of processes worker processes, or one for every cpu if processes is None.
+    After each chunk of reports is written, on_progress is called with the number of reports done
+    and the number of stations, if it is not None.
+
+    Stations in a province that is not in store are left out.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    reports = [(name, province, values) for name, province, values in station_series
+               if len(store.rows(stations.ABB_TO_PROVINCE.get(province, ''), 'TOTAL')) > 0]
+    emissions_by_province = {stations.ABB_TO_PROVINCE[province]:
+                             combine.values_for_co2_plot_from_store(
+                                 store, stations.ABB_TO_PROVINCE[province])
+                             for province in {report[1] for report in reports}}
+    all_reports = [(name, province, values, report_file_name(name, province))
+                   for name, province, values in reports]
+    digests = {report[3]: report_digest(report[0], report[1], report[2],
+                                        emissions_by_province[stations.ABB_TO_PROVINCE[report[1]]])
+               for report in all_reports}
+
+    manifest = read_manifest(output_directory)
+    missing = [report for report in all_reports
+               if manifest.get(report[3]) != digests[report[3]] or
+               not os.path.exists(os.path.join(output_directory, report[3]))]
+
+    done = len(all_reports) - len(missing)
+    if on_progress is not None:
+        on_progress(done, len(all_reports))
+
+    if missing != []:
+        chunks = [missing[start:start + CHUNK_SIZE]
+                  for start in range(0, len(missing), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=processes, initializer=start_worker,
+                                 initargs=(emissions_by_province,)) as executor:
+            futures = {executor.submit(write_reports, output_directory, chunk): chunk
+                       for chunk in chunks}
+            for future in as_completed(futures):
+                done += future.result()
+                # the pages of the chunk are recorded as soon as they are written, so that a run
+                # that is interrupted does not write them again
+                for report in futures[future]:
+                    manifest[report[3]] = digests[report[3]]
+                write_manifest(output_directory, manifest)
+                if on_progress is not None:
+                    on_progress(done, len(all_reports))
+
+    write_index(output_directory, [(name, province, file_name)
+                                   for name, province, _, file_name in all_reports])
+    return [os.path.join(output_directory, report[3]) for report in all_reports]
+
+
+def series_from_aggregates(aggregates: annual_aggregates.AnnualAggregates,
+                           baseline: anomalies.Baseline = None) -> Iterator[StationSeries]:
+    """Yield the name, province and temperature values of each station of aggregates that has a
+    temperature in at least one year, with the anomalies compared to baseline as in main.selected.
+    """
+    engine = anomalies.engine_from_aggregates(aggregates)
+    for station in aggregates.stations:
+        station_anomalies = engine.station_anomalies(station, baseline)
+        if station_anomalies != {}:
+            yield (station[1], station[2], combine.values_for_anomaly_plot(station_anomalies))
+
+
+def series_from_daily_temps(data: Mapping[str, Dict[Any, List[float]]]) -> Iterator[StationSeries]:
+    """Yield the name, province and temperature values of each station of data, which is in the
+    format of 'data.json', that has temperatures.
+    """
+    for key, temp_data in data.items():
+        if temp_data != {}:
+            name, province = stations.parse_key(key)
+            yield (name, province, combine.values_for_temp_plot(temp_data))
+
+
+def print_progress(done: int, total: int) -> None:
+    """Print the number of reports written out of total."""
+    print(f'{time.strftime("%H:%M:%S")} {done}/{total} reports written')
+
+
+###############################
+# Helper Functions
+###############################
+
+
+# the emissions series of each province in a worker process, set by start_worker
+_WORKER_EMISSIONS: Dict[str, List[List[Any]]] = {}
+
+
+def start_worker(emissions_by_province: Dict[str, List[List[Any]]]) -> None:
+    """Keep the emissions series of each province in a new worker process."""
+    _WORKER_EMISSIONS.clear()
+    _WORKER_EMISSIONS.update(emissions_by_province)
+
+
+def write_reports(output_directory: str,
+                  reports: List[Tuple[str, str, List[List[Any]], str]]) -> int:
+    """Write the report of each (name, province, temperature values, file name) of reports to
+    output_directory, and return the number of reports written. This is the function that runs
+    inside the worker processes.
+    """
+    for name, province, values, file_name in reports:
+        province_name = stations.ABB_TO_PROVINCE[province]
+        fig = combine.build_combined_plot(_WORKER_EMISSIONS[province_name], values,
+                                          province_name, display_name(name))
+        temporary_file_name = os.path.join(output_directory, file_name + '.tmp')
+        # the pages all load the plotly.min.js that plotly writes to the directory once
+        pio.write_html(fig, temporary_file_name, include_plotlyjs='directory', auto_open=False)
+        os.replace(temporary_file_name, os.path.join(output_directory, file_name))
+    return len(reports)
+
+
+def write_index(output_directory: str, reports: List[Tuple[str, str, str]]) -> None:
+    """Write the index page of the (name, province, file name) of reports to output_directory,
+    with the stations of each province listed under its name in alphabetical order.
+    """
+    by_province = {}
+    for name, province, file_name in reports:
+        province_name = stations.ABB_TO_PROVINCE[province]
+        if province_name not in by_province:
+            by_province[province_name] = []
+        list.append(by_province[province_name], (display_name(name), file_name))
+
+    lines = ['<!DOCTYPE html>', '<html>', '<head><meta charset="utf-8">',
+             '<title>Carbon dioxide levels and anomaly temperatures</title></head>',
+             '<body style="background-color: #FFE4AE; color: #800000">',
+             '<h1>Carbon dioxide levels and anomaly temperatures</h1>']
+    for province_name in sorted(by_province):
+        list.append(lines, f'<h2>{html.escape(province_name)}</h2>')
+        list.append(lines, '<ul>')
+        for station_name, file_name in sorted(by_province[province_name]):
+            list.append(lines, f'<li><a href="{html.escape(file_name)}">'
+                               f'{html.escape(station_name)}</a></li>')
+        list.append(lines, '</ul>')
+    list.extend(lines, ['</body>', '</html>'])
+
+    temporary_file_name = os.path.join(output_directory, INDEX_FILE_NAME + '.tmp')
+    with open(temporary_file_name, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(temporary_file_name, os.path.join(output_directory, INDEX_FILE_NAME))
+
+
+def read_manifest(output_directory: str) -> Dict[str, str]:
+    """Return the manifest of the reports in output_directory, or an empty manifest if there is
+    none.
+    """
+    path = os.path.join(output_directory, MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_manifest(output_directory: str, manifest: Dict[str, str]) -> None:
+    """Save manifest as the manifest of the reports in output_directory."""
+    path = os.path.join(output_directory, MANIFEST_FILE_NAME)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file)
+    os.replace(path + '.tmp', path)
+
+
+def report_digest(name: str, province: str, values: List[List[Any]],
+                  emissions: List[List[Any]]) -> str:
+    """Return a hash of the data that the report of the station called name in province is made
+    from, given its temperature values and the emissions series of its province.
+    """
+    data = repr((name, province, [[float(value) for value in column] for column in values],
+                 [[float(value) for value in column] for column in emissions]))
+    return hashlib.sha1(str.encode(data, 'utf-8')).hexdigest()
+
+
+def report_file_name(name: str, province: str) -> str:
+    """Return the name of the report file of the station called name in province. The name ends
+    with a hash of name and province, since stations whose names only differ in their punctuation
+    would otherwise have the same file.
+
+    >>> report_file_name("ST. JOHN'S", 'NFLD')[:16]
+    'NFLD_ST__JOHN_S_'
+    >>> report_file_name("ST. JOHN'S", 'NFLD') != report_file_name('ST__JOHN_S', 'NFLD')
+    True
+    """
+    digest = hashlib.sha1(str.encode(repr((name, province)), 'utf-8')).hexdigest()
+    return re.sub(r'[^A-Za-z0-9_-]', '_', province + '_' + name) + '_' + digest[:8] + '.html'
+
+
+def display_name(name: str) -> str:
+    """Return name as it is shown in the station dropdown menu.
+
+    >>> display_name('FORT_SMITH')
+    'Fort Smith'
+    """
+    return str.title(str.replace(name, '_', ' '))
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description='Write the graph of every station to files.')
+    PARSER.add_argument('output_directory', nargs='?', default='station_reports')
+    PARSER.add_argument('--aggregates', default=None,
+                        help='read the temperatures from these annual aggregates instead of '
+                             'data.json')
+    PARSER.add_argument('--processes', type=int, default=None)
+    ARGUMENTS = PARSER.parse_args()
+
+    if ARGUMENTS.aggregates is not None:
+        SERIES = series_from_aggregates(
+            annual_aggregates.load_annual_aggregates(ARGUMENTS.aggregates))
+    else:
+        with open('data.json') as DATA_FILE:
+            SERIES = list(series_from_daily_temps(json.load(DATA_FILE)))
+
+    START = time.perf_counter()
+    REPORTS = render_all_reports(ARGUMENTS.output_directory,
+                                 emissions_store.load_emissions_store(
+                                     'GHG_IPCC_Can_Prov_Terr.csv'),
+                                 SERIES, ARGUMENTS.processes, print_progress)
+    print(f'{len(REPORTS)} reports in {ARGUMENTS.output_directory} '
+          f'({time.perf_counter() - START:.1f} s)')
@@ -0,0 +1,534 @@
+"""CSC110 Fall 2020 Final Project, Query Service
+
+Description
+===============================
+This module serves the numbers behind the graphs and maps as JSON over HTTP, for dashboards that do
+not go through the user interface. The data files are read once when the service starts, and the
+service then answers these requests:
+
+    GET /emissions/<province>                      the emissions series of a province, as in
+                                                   combine.values_for_co2_plot
+    GET /stations                                  every station with its province and station id,
+                                                   and the province that its location is in
+    GET /stations/nearest?latitude=&longitude=     the stations closest to a point with their
+                                                   distance in kilometres; &count=10 returns 10
+                                                   of them instead of 5
+    GET /stations/<province>/<name>/anomalies      the temperature anomaly series of a station, as
+                                                   in the graphs; ?baseline=1961-1990 compares it to
+                                                   those years instead of every year
+    GET /maps/<year>/<kind>                        the data frame of a map of year, where kind is
+                                                   emissions, emissions_difference or
+                                                   temperatures_difference
+
+The service runs on asyncio and only uses the standard library. Each response is computed once,
+on a worker thread so that the other connections are not held up, and is then kept in a bounded
+cache. Every response has an ETag, so a client that sends it back in If-None-Match gets an empty
+304 response instead of the same body again.
+
+The module also has a load test that sends many requests over several connections to a service
+and reports the requests per second and the latencies, for example:
+
+    python service.py --load-test
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from collections import OrderedDict
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import threading
+import time
+import urllib.parse
+import annual_aggregates
+import anomalies
+import combine
+import data_reading
+import emissions_store
+import maps
+import spatial
+import stations
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8110
+
+# the number of responses kept in the cache
+DEFAULT_MAX_RESPONSES = 1024
+
+# the year that the differences on the maps are compared to, as in main.MAP_BASELINE_YEAR
+MAP_BASELINE_YEAR = 1990
+
+MAP_KINDS = ('emissions', 'emissions_difference', 'temperatures_difference')
+
+# the number of stations returned by /stations/nearest when no count is given
+NEAREST_STATIONS = 5
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class QueryService:
+    """The data behind the graphs and maps, and the cached responses to the requests for it.
+
+    Instance Attributes:
+        - stations_geojson_file_name: the geojson file of the locations of the weather stations
+        - emissions_by_province: maps each province name to its emissions series
+        - emissions: the emissions of each province in each year, as in the maps
+        - emissions_differences: the differences in emissions compared to MAP_BASELINE_YEAR
+        - temperatures_differences: the differences in temperatures compared to MAP_BASELINE_YEAR,
+          or None if they come from engine
+        - aggregates: the annual aggregates of the stations, or None if there are none
+        - engine: the anomalies of aggregates, or None if there are no aggregates
+        - daily_temps: the daily temperatures of each station that has any, in the format of
+          'data.json', used for the stations that are not in aggregates
+        - registry: the stations of aggregates and daily_temps
+        - station_index: the locations of the stations in stations_geojson_file_name
+        - located_provinces: maps the station id of each station in stations_geojson_file_name to
+          the name of the province that its location is in, or None if it is in none of them
+        - responses: maps each request target to its (status, body, etag), from the least to the
+          most recently used
+        - max_responses: the largest number of responses kept in responses
+        - lock: the lock that makes responses safe to use from the worker threads that compute the
+          responses
+    """
+    stations_geojson_file_name: str
+    emissions_by_province: Dict[str, List[List[Any]]]
+    emissions: Dict[int, List[float]]
+    emissions_differences: maps.DifferenceView
+    temperatures_differences: Optional[maps.DifferenceView]
+    aggregates: Optional[annual_aggregates.AnnualAggregates]
+    engine: Optional[anomalies.AnomalyEngine]
+    daily_temps: Mapping[str, Dict[Any, List[float]]]
+    registry: stations.StationRegistry
+    station_index: spatial.StationIndex
+    located_provinces: Dict[str, Optional[str]]
+    responses: OrderedDict
+    max_responses: int
+    lock: threading.Lock
+
+    def __init__(self, emissions_csv_file_name: str, stations_geojson_file_name: str,
+                 map_temps_file_name: Optional[str] = None,
+                 aggregates_file_name: Optional[str] = None,
+                 daily_temps: Optional[Mapping[str, Dict[Any, List[float]]]] = None,
+                 provinces_geojson_file_name: Optional[str] = None,
+                 max_responses: int = DEFAULT_MAX_RESPONSES) -> None:
+        """Read the data of the service from the given files.
+
+        The temperatures of the maps and the anomalies of the stations come from the annual
+        aggregates called aggregates_file_name if it is not None. Otherwise the maps are read from
+        map_temps_file_name, and the anomalies are computed from daily_temps. The stations with no
+        temperatures in daily_temps are left out, as in the user interface. The province that the
+        location of each station is in is found from the borders in provinces_geojson_file_name,
+        if it is not None.
+
+        Preconditions:
+            - aggregates_file_name is not None or map_temps_file_name is not None
+        """
+        self.stations_geojson_file_name = stations_geojson_file_name
+        store = emissions_store.load_emissions_store(emissions_csv_file_name)
+        self.emissions_by_province = {province: combine.values_for_co2_plot_from_store(store,
+                                                                                       province)
+                                      for province in store.region_index
+                                      if len(store.rows(province, 'TOTAL')) > 0}
+        self.emissions = data_reading.read_ghg_emissions_for_maps(emissions_csv_file_name)
+        self.emissions_differences = maps.DifferenceView(self.emissions, MAP_BASELINE_YEAR)
+
+        daily_temps = daily_temps if daily_temps is not None else {}
+        self.daily_temps = {key: daily_temps[key] for key in daily_temps if daily_temps[key] != {}}
+        self.registry = stations.registry_from_keys(self.daily_temps.keys())
+        if aggregates_file_name is not None:
+            self.aggregates = annual_aggregates.load_annual_aggregates(aggregates_file_name)
+            self.engine = anomalies.engine_from_aggregates(self.aggregates)
+            self.temperatures_differences = None
+            for station_id, name, province in self.aggregates.stations:
+                self.registry.add(name, province, station_id)
+        else:
+            self.aggregates = None
+            self.engine = None
+            self.temperatures_differences = maps.DifferenceView(
+                maps.format_temps(stations_geojson_file_name, map_temps_file_name),
+                MAP_BASELINE_YEAR)
+
+        self.station_index = spatial.station_index_from_geojson(stations_geojson_file_name)
+        if provinces_geojson_file_name is not None:
+            self.located_provinces = spatial.assign_provinces(stations_geojson_file_name,
+                                                              provinces_geojson_file_name)
+        else:
+            self.located_provinces = {}
+
+        self.responses = OrderedDict()
+        self.max_responses = max_responses
+        self.lock = threading.Lock()
+
+    def cached_response(self, target: str) -> Optional[Tuple[int, bytes, str]]:
+        """Return the (status, body, etag) of the response to target if it is in the cache, or
+        None otherwise.
+        """
+        with self.lock:
+            if target in self.responses:
+                self.responses.move_to_end(target)
+                return self.responses[target]
+            return None
+
+    def response(self, target: str) -> Tuple[int, bytes, str]:
+        """Return the (status, body, etag) of the response to the request for target, which is a
+        path with an optional query string, computing it if it is not in the cache.
+
+        >>> service = QueryService.__new__(QueryService)
+        >>> service.responses, service.max_responses = OrderedDict(), 1
+        >>> service.lock = threading.Lock()
+        >>> service.response('/no/such/path')[0]
+        404
+        """
+        cached = self.cached_response(target)
+        if cached is not None:
+            return cached
+
+        status, value = self.query(target)
+        body = str.encode(json.dumps(json_safe(value), separators=(',', ':')), 'utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        with self.lock:
+            self.responses[target] = (status, body, etag)
+            while len(self.responses) > self.max_responses:
+                self.responses.popitem(last=False)
+        return (status, body, etag)
+
+    def query(self, target: str) -> Tuple[int, Any]:
+        """Return the status and the value of the response to the request for target."""
+        parsed = urllib.parse.urlsplit(target)
+        parts = [urllib.parse.unquote(part) for part in str.split(parsed.path, '/') if part != '']
+        parameters = dict(urllib.parse.parse_qsl(parsed.query))
+
+        if len(parts) == 2 and parts[0] == 'emissions':
+            return self.province_emissions(parts[1])
+        elif parts == ['stations']:
+            return (200, [{'name': self.registry.names[station],
+                           'province': self.registry.provinces[station],
+                           'station_id': self.registry.station_ids[station],
+                           'located_province':
+                               self.located_provinces.get(self.registry.station_ids[station])}
+                          for station in range(len(self.registry))])
+        elif parts == ['stations', 'nearest']:
+            return self.nearest_stations(parameters)
+        elif len(parts) == 4 and parts[0] == 'stations' and parts[3] == 'anomalies':
+            return self.station_anomalies(parts[2], parts[1], parameters.get('baseline'))
+        elif len(parts) == 3 and parts[0] == 'maps':
+            return self.map_frame(parts[1], parts[2])
+        else:
+            return (404, {'error': 'unknown path ' + parsed.path})
+
+    def province_emissions(self, province: str) -> Tuple[int, Any]:
+        """Return the status and the emissions series of province, which is a province name or
+        abbreviation.
+        """
+        province = stations.ABB_TO_PROVINCE.get(province, province)
+        if province not in self.emissions_by_province:
+            return (404, {'error': 'unknown province ' + province})
+        years, values = self.emissions_by_province[province]
+        return (200, {'province': province, 'years': years, 'values': values})
+
+    def nearest_stations(self, parameters: Dict[str, str]) -> Tuple[int, Any]:
+        """Return the status and the stations closest to the latitude and longitude in parameters,
+        from closest to furthest, with their distance in kilometres. The number of stations is the
+        count in parameters, or NEAREST_STATIONS if there is none.
+        """
+        try:
+            latitude = float(parameters['latitude'])
+            longitude = float(parameters['longitude'])
+            count = int(parameters.get('count', NEAREST_STATIONS))
+        except (KeyError, ValueError):
+            return (400, {'error': 'the latitude, longitude and count must be numbers'})
+        if count < 0 or not (math.isfinite(latitude) and math.isfinite(longitude)):
+            return (400, {'error': 'the count must not be negative and the point must be finite'})
+
+        nearest_so_far = []
+        for station_id, distance in self.station_index.nearest(latitude, longitude, count):
+            station = self.registry.by_station_id.get(station_id, -1)
+            list.append(nearest_so_far,
+                        {'station_id': station_id,
+                         'name': self.registry.names[station] if station != -1 else None,
+                         'province': self.registry.provinces[station] if station != -1 else None,
+                         'located_province': self.located_provinces.get(station_id),
+                         'distance': distance})
+        return (200, nearest_so_far)
+
+    def station_anomalies(self, name: str, province: str,
+                          baseline: Optional[str]) -> Tuple[int, Any]:
+        """Return the status and the temperature anomaly series of the station called name in
+        province, compared to baseline, which is None or a range of years such as '1961-1990'.
+        """
+        name = str.replace(str.upper(name), ' ', '_')
+        if self.registry.find(name, province) == -1:
+            return (404, {'error': 'unknown station ' + name + ' in ' + province})
+
+        if baseline is None:
+            baseline_years = None
+        else:
+            try:
+                first_year, last_year = (int(year) for year in str.split(baseline, '-'))
+            except ValueError:
+                return (400, {'error': 'the baseline must be two years such as 1961-1990'})
+            baseline_years = (first_year, last_year)
+
+        if self.aggregates is not None and (name, province) in self.aggregates.rows_by_name:
+            station = self.aggregates.stations[self.aggregates.rows_by_name[(name, province)]]
+            years, values = combine.values_for_anomaly_plot(
+                self.engine.station_anomalies(station, baseline_years))
+        elif baseline_years is not None:
+            return (400, {'error': 'a baseline needs the annual aggregates of the station'})
+        else:
+            years, values = combine.values_for_temp_plot(self.daily_temps[str((name, province))])
+        return (200, {'name': name, 'province': province, 'baseline': baseline_years,
+                      'years': years, 'anomalies': values})
+
+    def map_frame(self, year: str, kind: str) -> Tuple[int, Any]:
+        """Return the status and the data frame of the map of kind in year."""
+        if kind not in MAP_KINDS:
+            return (404, {'error': 'the kind of map must be one of ' + ', '.join(MAP_KINDS)})
+        if not str.isdigit(year) or int(year) not in self.emissions or \
+                int(year) == MAP_BASELINE_YEAR:
+            return (404, {'error': 'no map of ' + year})
+
+        year = int(year)
+        if kind == 'emissions':
+            return (200, {'province': maps.PROVINCE_LIST, year: self.emissions[year]})
+        elif kind == 'emissions_difference':
+            return (200, dict(self.emissions_differences.frame(year),
+                              province=maps.PROVINCE_LIST))
+        elif self.temperatures_differences is None:
+            return (200, maps.format_temp_anomalies(self.stations_geojson_file_name, self.engine,
+                                                    (MAP_BASELINE_YEAR, MAP_BASELINE_YEAR),
+                                                    [year]))
+        else:
+            return (200, self.temperatures_differences.frame(year))
+
+
+async def serve(service: QueryService, host: str = DEFAULT_HOST,
+                port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+    """Start serving the requests to service on host and port, and return the server."""
+    return await asyncio.start_server(lambda reader, writer:
+                                      handle_connection(service, reader, writer), host, port)
+
+
+async def load_test(host: str, port: int, targets: List[str], requests: int = 2000,
+                    concurrency: int = 16) -> Dict[str, float]:
+    """Send requests requests for targets, in turn, over concurrency connections to the service on
+    host and port, and return the number of requests per second and the latencies in milliseconds.
+
+    Preconditions:
+        - targets != []
+        - requests >= concurrency >= 1
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[send_requests(host, port,
+                                         [targets[index % len(targets)]
+                                          for index in range(connection, requests, concurrency)],
+                                         latencies)
+                           for connection in range(concurrency)])
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {'requests': len(latencies), 'seconds': seconds,
+            'requests_per_second': len(latencies) / seconds,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': latencies[-1] * 1000}
+
+
+###############################
+# Helper Functions
+###############################
+
+
+async def handle_connection(service: QueryService, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+    """Answer the requests sent over one connection until the client closes it or asks for it to
+    be closed. The body of a request is ignored.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if request_line == b'':
+                break
+            method, target, version = str.split(bytes.decode(request_line, 'latin-1'))
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = str.partition(bytes.decode(line, 'latin-1'), ':')
+                headers[str.lower(name)] = str.strip(value)
+
+            if method not in ('GET', 'HEAD'):
+                status, body, etag = (405, b'{"error":"only GET is supported"}', '')
+            else:
+                status, body, etag = await answer(service, target)
+                if etag != '' and headers.get('if-none-match') == etag:
+                    status, body = (304, b'')
+
+            keep_alive = version == 'HTTP/1.1' and \
+                str.lower(headers.get('connection', '')) != 'close'
+            write_response(writer, status, b'' if method == 'HEAD' else body, etag, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, ValueError):
+        # a client that disconnects or sends a malformed request is dropped
+        pass
+    finally:
+        writer.close()
+
+
+async def answer(service: QueryService, target: str) -> Tuple[int, bytes, str]:
+    """Return the (status, body, etag) of the response of service to the request for target, or
+    an error response with status 500 if computing it failed.
+    """
+    cached = service.cached_response(target)
+    if cached is not None:
+        return cached
+    try:
+        # the first response to a target is computed on a worker thread so that the other
+        # connections are answered in the meantime
+        return await asyncio.to_thread(service.response, target)
+    except Exception as error:
+        body = json.dumps({'error': type(error).__name__ + ': ' + str(error)},
+                          separators=(',', ':'))
+        return (500, str.encode(body, 'utf-8'), '')
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, body: bytes, etag: str,
+                   keep_alive: bool) -> None:
+    """Write a response with status, body and etag to writer."""
+    headers = [f'HTTP/1.1 {status} {STATUS_TEXT[status]}',
+               'Content-Type: application/json',
+               f'Content-Length: {len(body)}',
+               'Cache-Control: no-cache',
+               'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+    if etag != '':
+        list.append(headers, 'ETag: ' + etag)
+    writer.write(str.encode('\r\n'.join(headers) + '\r\n\r\n', 'latin-1') + body)
+
+
+async def send_requests(host: str, port: int, targets: List[str], latencies: List[float]) -> None:
+    """Send a request for each of targets, one after the other over one connection to host and
+    port, and add the latency of each one to latencies.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for target in targets:
+            start = time.perf_counter()
+            writer.write(str.encode(f'GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n', 'latin-1'))
+            await writer.drain()
+            await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = str.partition(bytes.decode(line, 'latin-1'), ':')
+                if str.lower(name) == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            list.append(latencies, time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Return the value below which percent percent of sorted_values fall, using the nearest rank.
+
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 50)
+    2.0
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 99)
+    4.0
+    """
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def json_safe(value: Any) -> Any:
+    """Return value with every float that is not a number replaced by None, since JSON has no NaN.
+
+    >>> json_safe({'a': [1.0, float('nan')]})
+    {'a': [1.0, None]}
+    """
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    elif isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    else:
+        return value
+
+
+async def run_load_test(service: QueryService, host: str, port: int, requests: int,
+                        concurrency: int) -> Dict[str, float]:
+    """Start serving service on host and port, run load_test against it with a mix of the kinds of
+    requests, and return the results.
+    """
+    server = await serve(service, host, port)
+    years = sorted(year for year in service.emissions if year != MAP_BASELINE_YEAR)
+    station = service.registry.names[0], service.registry.provinces[0]
+    targets = ['/stations', '/emissions/Ontario',
+               '/stations/' + station[1] + '/' + urllib.parse.quote(station[0]) + '/anomalies',
+               '/stations/nearest?latitude=45.4&longitude=-75.7'] + \
+        ['/maps/' + str(year) + '/' + kind for year in years for kind in MAP_KINDS]
+    try:
+        return await load_test(host, port, targets, requests, concurrency)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def serve_forever(service: QueryService, host: str, port: int) -> None:
+    """Serve service on host and port until the program is stopped."""
+    server = await serve(service, host, port)
+    print(f'Serving on http://{host}:{port}')
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description='Serve the data of the graphs and maps as JSON.')
+    PARSER.add_argument('--host', default=DEFAULT_HOST)
+    PARSER.add_argument('--port', type=int, default=DEFAULT_PORT)
+    PARSER.add_argument('--aggregates', default=None,
+                        help='read the temperatures from these annual aggregates')
+    PARSER.add_argument('--load-test', action='store_true',
+                        help='run the load test against a local instance and stop')
+    PARSER.add_argument('--requests', type=int, default=5000)
+    PARSER.add_argument('--concurrency', type=int, default=32)
+    ARGUMENTS = PARSER.parse_args()
+
+    if ARGUMENTS.aggregates is not None:
+        SERVICE = QueryService('GHG_IPCC_Can_Prov_Terr.csv', 'weather_stations.geojson',
+                               aggregates_file_name=ARGUMENTS.aggregates,
+                               provinces_geojson_file_name='canada_provinces.geojson')
+    else:
+        with open('data.json') as DATA_FILE:
+            DAILY_TEMPS = json.load(DATA_FILE)
+        SERVICE = QueryService('GHG_IPCC_Can_Prov_Terr.csv', 'weather_stations.geojson',
+                               'data_for_maps_since_1990.json', daily_temps=DAILY_TEMPS,
+                               provinces_geojson_file_name='canada_provinces.geojson')
+
+    if ARGUMENTS.load_test:
+        for NAME, VALUE in asyncio.run(run_load_test(SERVICE, ARGUMENTS.host, ARGUMENTS.port,
+                                                     ARGUMENTS.requests,
+                                                     ARGUMENTS.concurrency)).items():
+            print(f'{NAME}: {VALUE:.2f}')
+    else:
+        asyncio.run(serve_forever(SERVICE, ARGUMENTS.host, ARGUMENTS.port))
@@ -0,0 +1,362 @@
+"""CSC110 Fall 2020 Final Project, Spatial Index
+
+Description
+===============================
+This module answers geographic questions about the weather stations: which stations are closest to
+a point, which stations are within some distance of a point, and which province or territory each
+station is in according to the province borders rather than the abbreviation in its data file.
+
+The stations are kept in a uniform grid. Each station is placed on the unit sphere as a 3D point,
+where the straight line distance between two points only grows with the distance along the surface
+of the Earth, and the grid cell of each point is found by dividing its coordinates by the size of a
+cell. A query only looks at the cells around the point that is asked about, so its cost depends on
+the number of stations nearby instead of the number of stations in total.
+
+The provinces are tested with a ray casting point in polygon test, but only for the stations inside
+the bounding box of each polygon, and for all of those stations at once.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import math
+import numpy as np
+import geometry
+
+# the mean radius of the Earth in kilometres
+EARTH_RADIUS = 6371.0088
+
+# the number of stations that the grid aims to put in each cell
+STATIONS_PER_CELL = 4
+
+# the number of stations tested against the edges of a polygon at once, which bounds the memory
+# used by the point in polygon test
+POINTS_PER_BATCH = 2048
+
+# a cell of the grid as its (x, y, z) position
+Cell = Tuple[int, int, int]
+
+
+class StationIndex:
+    """A uniform grid over the locations of weather stations.
+
+    Instance Attributes:
+        - ids: the id of each station
+        - longitudes: the longitude of each station, in degrees
+        - latitudes: the latitude of each station, in degrees
+        - points: the position of each station on the unit sphere, one row per station
+        - cell_size: the length of the side of each cell of the grid, on the unit sphere
+        - cells: maps each cell of the grid with a station in it to the stations in that cell
+        - lowest_cell: the smallest x, y and z of the cells with a station in them
+        - highest_cell: the largest x, y and z of the cells with a station in them
+
+    Representation Invariants:
+        - len(self.ids) == len(self.longitudes) == len(self.latitudes) == len(self.points)
+        - self.cell_size > 0
+    """
+    ids: List[Any]
+    longitudes: np.ndarray
+    latitudes: np.ndarray
+    points: np.ndarray
+    cell_size: float
+    cells: Dict[Cell, np.ndarray]
+    lowest_cell: Cell
+    highest_cell: Cell
+
+    def __init__(self, ids: List[Any], longitudes: List[float], latitudes: List[float]) -> None:
+        """Initialize an index of the stations with the given ids at the given longitudes and
+        latitudes.
+
+        Preconditions:
+            - len(ids) == len(longitudes) == len(latitudes)
+        """
+        self.ids = list(ids)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.points = unit_vectors(self.longitudes, self.latitudes)
+
+        # the stations lie on a surface, so the number of cells grows with the square of the
+        # extent of the stations divided by the size of a cell
+        if len(self.ids) > 0:
+            extent = float((self.points.max(axis=0) - self.points.min(axis=0)).max())
+        else:
+            extent = 0.0
+        self.cell_size = max(extent / math.sqrt(max(len(self.ids) / STATIONS_PER_CELL, 1.0)),
+                             1e-6)
+
+        keys = np.floor(self.points / self.cell_size).astype(np.int64)
+        order = np.lexsort(keys.T[::-1])
+        unique_keys, starts = np.unique(keys[order], axis=0, return_index=True)
+        ends = list(starts[1:]) + [len(order)]
+        self.cells = {(int(key[0]), int(key[1]), int(key[2])): order[start:end]
+                      for key, start, end in zip(unique_keys, starts, ends)}
+        if len(self.ids) > 0:
+            self.lowest_cell = tuple(int(key) for key in keys.min(axis=0))
+            self.highest_cell = tuple(int(key) for key in keys.max(axis=0))
+        else:
+            self.lowest_cell, self.highest_cell = (0, 0, 0), (-1, -1, -1)
+
+    def nearest(self, latitude: float, longitude: float, n: int = 1) -> List[Tuple[Any, float]]:
+        """Return the ids of the n stations closest to (latitude, longitude) together with their
+        distance from it in kilometres, from closest to furthest.
+
+        >>> index = StationIndex(['A', 'B', 'C'], [-79.4, -75.7, -123.1], [43.7, 45.4, 49.3])
+        >>> [station for station, _ in index.nearest(44.0, -79.0, 2)]
+        ['A', 'B']
+
+        Preconditions:
+            - n >= 0
+        """
+        n = min(n, len(self.ids))
+        if n == 0:
+            return []
+
+        point = unit_vectors(np.array([longitude]), np.array([latitude]))[0]
+        centre = cell_of(point, self.cell_size)
+        candidates = []
+        ring = 0
+        while True:
+            for cell in shell(centre, ring, self.lowest_cell, self.highest_cell):
+                if cell in self.cells:
+                    list.append(candidates, self.cells[cell])
+            found = np.concatenate(candidates) if candidates != [] else np.array([], dtype=int)
+            # every station in a cell more than ring cells away is at least ring cells away
+            if len(found) >= n:
+                chords = np.linalg.norm(self.points[found] - point, axis=1)
+                closest = np.argpartition(chords, n - 1)[:n]
+                if chords[closest].max() <= ring * self.cell_size or len(found) == len(self.ids):
+                    closest = closest[np.argsort(chords[closest], kind='stable')]
+                    return [(self.ids[found[index]], chord_to_kilometres(chords[index]))
+                            for index in closest]
+            ring += 1
+
+    def within_radius(self, latitude: float, longitude: float,
+                      radius: float) -> List[Tuple[Any, float]]:
+        """Return the ids of the stations at most radius kilometres from (latitude, longitude)
+        together with their distance from it in kilometres, from closest to furthest.
+
+        >>> index = StationIndex(['A', 'B', 'C'], [-79.4, -75.7, -123.1], [43.7, 45.4, 49.3])
+        >>> [station for station, _ in index.within_radius(44.0, -79.0, 500.0)]
+        ['A', 'B']
+
+        Preconditions:
+            - radius >= 0
+        """
+        point = unit_vectors(np.array([longitude]), np.array([latitude]))[0]
+        chord_radius = kilometres_to_chord(radius)
+        low = tuple(max(key, lowest) for key, lowest in
+                    zip(cell_of(point - chord_radius, self.cell_size), self.lowest_cell))
+        high = tuple(min(key, highest) for key, highest in
+                     zip(cell_of(point + chord_radius, self.cell_size), self.highest_cell))
+
+        candidates = [self.cells[(x, y, z)]
+                      for x in range(low[0], high[0] + 1)
+                      for y in range(low[1], high[1] + 1)
+                      for z in range(low[2], high[2] + 1) if (x, y, z) in self.cells]
+        if candidates == []:
+            return []
+
+        found = np.concatenate(candidates)
+        chords = np.linalg.norm(self.points[found] - point, axis=1)
+        inside = np.flatnonzero(chords <= chord_radius)
+        inside = inside[np.argsort(chords[inside], kind='stable')]
+        return [(self.ids[found[index]], chord_to_kilometres(chords[index])) for index in inside]
+
+
+class ProvinceLocator:
+    """The borders of the provinces and territories, for finding the province of a point.
+
+    Instance Attributes:
+        - names: the name of the province of each polygon
+        - boxes: the (min longitude, min latitude, max longitude, max latitude) of each polygon
+        - edges: the (x1, y1, x2, y2) of every edge of every ring of each polygon, one row per edge
+
+    Representation Invariants:
+        - len(self.names) == len(self.boxes) == len(self.edges)
+    """
+    names: List[Any]
+    boxes: np.ndarray
+    edges: List[np.ndarray]
+
+    def __init__(self, provinces_geojson: Dict[str, Any], name_property: str = 'PRENAME') -> None:
+        """Initialize a locator for the polygons of provinces_geojson, where each feature is named
+        by its name_property property.
+        """
+        self.names = []
+        self.edges = []
+        boxes = []
+        for feature in provinces_geojson['features']:
+            for polygon in geometry.feature_polygons(feature):
+                rings = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon]
+                list.append(self.names, feature['properties'][name_property])
+                list.append(self.edges, np.concatenate([np.hstack((ring[:-1], ring[1:]))
+                                                        for ring in rings]))
+                list.append(boxes, np.concatenate((rings[0].min(axis=0), rings[0].max(axis=0))))
+        self.boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+
+    def locate(self, longitudes: np.ndarray, latitudes: np.ndarray) -> List[Optional[Any]]:
+        """Return the name of the province that each point (longitudes[i], latitudes[i]) is in, or
+        None if it is not in any of them.
+
+        >>> square = [[0.0, 0.0], [2.0, 0.0], [2.0, 2.0], [0.0, 2.0], [0.0, 0.0]]
+        >>> provinces = {'features': [{'properties': {'PRENAME': 'Square'},
+        ...                            'geometry': {'type': 'Polygon', 'coordinates': [square]}}]}
+        >>> ProvinceLocator(provinces).locate(np.array([1.0, 3.0]), np.array([1.0, 1.0]))
+        ['Square', None]
+
+        Preconditions:
+            - len(longitudes) == len(latitudes)
+        """
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        found = np.full(len(longitudes), -1, dtype=np.int64)
+
+        for polygon in range(len(self.names)):
+            box = self.boxes[polygon]
+            candidates = np.flatnonzero((found == -1) &
+                                        (longitudes >= box[0]) & (latitudes >= box[1]) &
+                                        (longitudes <= box[2]) & (latitudes <= box[3]))
+            # batches of points close in latitude only need the edges in their band of latitudes
+            candidates = candidates[np.argsort(latitudes[candidates], kind='stable')]
+            edges = self.edges[polygon]
+            low_ends = np.minimum(edges[:, 1], edges[:, 3])
+            high_ends = np.maximum(edges[:, 1], edges[:, 3])
+            for start in range(0, len(candidates), POINTS_PER_BATCH):
+                batch = candidates[start:start + POINTS_PER_BATCH]
+                band = (high_ends > latitudes[batch[0]]) & (low_ends <= latitudes[batch[-1]])
+                inside = points_in_polygon(longitudes[batch], latitudes[batch], edges[band])
+                found[batch[inside]] = polygon
+
+        return [self.names[polygon] if polygon >= 0 else None for polygon in found.tolist()]
+
+
+def station_index_from_geojson(stations_file_name: str) -> StationIndex:
+    """Return a StationIndex of the stations in stations_file_name, keyed by their geojson id.
+
+    Preconditions:
+        - stations_file_name is in the format of 'weather_stations.geojson'
+    """
+    features = geometry.load_geojson(stations_file_name)['features']
+    return StationIndex([feature['id'] for feature in features],
+                        [feature['geometry']['coordinates'][0] for feature in features],
+                        [feature['geometry']['coordinates'][1] for feature in features])
+
+
+def assign_provinces(stations_file_name: str, provinces_file_name: str,
+                     name_property: str = 'PRENAME') -> Dict[Any, Optional[Any]]:
+    """Return a dictionary mapping the id of each station in stations_file_name to the name of the
+    province in provinces_file_name that its coordinates are in, or None if they are in none.
+
+    Preconditions:
+        - stations_file_name is in the format of 'weather_stations.geojson'
+        - provinces_file_name is in the format of 'canada_provinces.geojson'
+    """
+    index = station_index_from_geojson(stations_file_name)
+    locator = ProvinceLocator(geometry.load_geojson(provinces_file_name), name_property)
+    return dict(zip(index.ids, locator.locate(index.longitudes, index.latitudes)))
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def unit_vectors(longitudes: np.ndarray, latitudes: np.ndarray) -> np.ndarray:
+    """Return the position on the unit sphere of each point (longitudes[i], latitudes[i]), one row
+    per point.
+    """
+    longitudes = np.radians(longitudes)
+    latitudes = np.radians(latitudes)
+    return np.column_stack((np.cos(latitudes) * np.cos(longitudes),
+                            np.cos(latitudes) * np.sin(longitudes), np.sin(latitudes)))
+
+
+def cell_of(point: np.ndarray, cell_size: float) -> Cell:
+    """Return the cell of the grid with cells of side cell_size that point is in."""
+    key = np.floor(point / cell_size).astype(np.int64)
+    return (int(key[0]), int(key[1]), int(key[2]))
+
+
+def shell(centre: Cell, ring: int, low: Cell, high: Cell) -> List[Cell]:
+    """Return the cells between low and high, inclusive, that are exactly ring cells away from
+    centre along at least one axis.
+
+    >>> far = (9, 9, 9)
+    >>> [len(shell((0, 0, 0), ring, (-far[0],) * 3, far)) for ring in range(3)]
+    [1, 26, 98]
+    >>> shell((0, 0, 0), 1, (1, 0, 0), (5, 0, 0))
+    [(1, 0, 0)]
+    """
+    cells = []
+    for dx in range(max(-ring, low[0] - centre[0]), min(ring, high[0] - centre[0]) + 1):
+        for dy in range(max(-ring, low[1] - centre[1]), min(ring, high[1] - centre[1]) + 1):
+            if abs(dx) == ring or abs(dy) == ring:
+                dzs = range(max(-ring, low[2] - centre[2]), min(ring, high[2] - centre[2]) + 1)
+            else:
+                dzs = [dz for dz in (-ring, ring) if low[2] <= centre[2] + dz <= high[2]]
+            for dz in dzs:
+                list.append(cells, (centre[0] + dx, centre[1] + dy, centre[2] + dz))
+    return cells
+
+
+def chord_to_kilometres(chord: float) -> float:
+    """Return the distance along the surface of the Earth between two points whose positions on the
+    unit sphere are chord apart.
+    """
+    return float(2 * EARTH_RADIUS * math.asin(min(float(chord) / 2, 1.0)))
+
+
+def kilometres_to_chord(distance: float) -> float:
+    """Return the distance between the positions on the unit sphere of two points that are
+    distance kilometres apart along the surface of the Earth.
+    """
+    return 2 * math.sin(min(distance / EARTH_RADIUS, math.pi) / 2)
+
+
+def points_in_polygon(longitudes: np.ndarray, latitudes: np.ndarray,
+                      edges: np.ndarray) -> np.ndarray:
+    """Return whether each point (longitudes[i], latitudes[i]) is inside the polygon with the given
+    edges, by counting how many edges a ray going east from the point crosses. Holes are handled by
+    including the edges of their rings.
+    """
+    x1, y1, x2, y2 = (edges[:, column][None, :] for column in range(4))
+    x = longitudes[:, None]
+    y = latitudes[:, None]
+
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < crossing_x)
+    return np.count_nonzero(crossings, axis=1) % 2 == 1
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'math', 'numpy', 'geometry', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,244 @@
+"""CSC110 Fall 2020 Final Project, Station Search
+
+Description
+===============================
+This module finds the weather stations whose name contains what the user typed in the station search
+box. The names are normalized and indexed once when the program starts, separately for each
+province, so a search only looks at the stations of the province that is selected.
+
+A query with at least three characters is answered from an index of the trigrams (the groups of
+three consecutive characters) of the names: only the stations that have every trigram of the query
+are checked. Shorter queries, which are the ones sent on the first keys the user types, are looked
+up directly in a table of every group of one or two consecutive characters of the names, which
+holds the stations that contain it already in order. The matches are always returned in
+alphabetical order, as the search box showed them before.
+
+The module also has a Debouncer, which runs a search only once the user has stopped typing for a
+moment instead of after every key.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Set
+import stations
+
+# the partition of the index that holds the stations of every province
+ALL_PROVINCES = ''
+
+# the number of milliseconds a Debouncer waits after the last call before running its function
+DEFAULT_DELAY = 150
+
+
+class StationSearchIndex:
+    """An index of the names of weather stations, for finding the names that contain a query.
+
+    Instance Attributes:
+        - display_names: the name of each station as it is shown to the user, such as 'Fort Smith'
+        - normalized_names: the name of each station as it is compared to queries, such as
+          'fort smith'
+        - ranks: the position of each station when every station is sorted by its display name
+        - sorted_stations: maps each province, and ALL_PROVINCES, to its stations sorted by their
+          display name
+        - short_grams: maps each province, and ALL_PROVINCES, to a dictionary mapping each group of
+          one or two consecutive characters to the stations of the province whose normalized name
+          contains it, sorted by their display name
+        - trigrams: maps each province, and ALL_PROVINCES, to a dictionary mapping each trigram to
+          the stations of the province whose normalized name contains it
+
+    Representation Invariants:
+        - len(self.display_names) == len(self.normalized_names) == len(self.ranks)
+    """
+    display_names: List[str]
+    normalized_names: List[str]
+    ranks: List[int]
+    sorted_stations: Dict[str, List[int]]
+    short_grams: Dict[str, Dict[str, List[int]]]
+    trigrams: Dict[str, Dict[str, Set[int]]]
+
+    def __init__(self, names: List[str], provinces: List[str]) -> None:
+        """Initialize an index of the stations with the given names, in the format of the keys of
+        'data.json' such as 'FORT_SMITH', in the given provinces.
+
+        Preconditions:
+            - len(names) == len(provinces)
+        """
+        self.display_names = [display_name(name) for name in names]
+        self.normalized_names = [str.lower(name) for name in self.display_names]
+        by_display_name = sorted(range(len(names)), key=lambda station: self.display_names[station])
+        self.ranks = [0] * len(names)
+        for rank, station in enumerate(by_display_name):
+            self.ranks[station] = rank
+
+        partitions = {ALL_PROVINCES: list(range(len(names)))}
+        for station, province in enumerate(provinces):
+            if province not in partitions:
+                partitions[province] = []
+            list.append(partitions[province], station)
+
+        self.sorted_stations = {}
+        self.short_grams = {}
+        self.trigrams = {}
+        for province, partition in partitions.items():
+            partition = sorted(partition, key=lambda station: self.ranks[station])
+            self.sorted_stations[province] = partition
+            self.short_grams[province] = {}
+            self.trigrams[province] = {}
+            for station in partition:
+                # the stations are added in alphabetical order, so each list stays sorted
+                for gram in name_short_grams(self.normalized_names[station]):
+                    if gram not in self.short_grams[province]:
+                        self.short_grams[province][gram] = []
+                    list.append(self.short_grams[province][gram], station)
+                for trigram in name_trigrams(self.normalized_names[station]):
+                    if trigram not in self.trigrams[province]:
+                        self.trigrams[province][trigram] = set()
+                    set.add(self.trigrams[province][trigram], station)
+
+    def search(self, query: str, province: str = ALL_PROVINCES) -> List[str]:
+        """Return the display names of the stations in province whose name contains query, ignoring
+        case, in alphabetical order. A query that is empty or a single space matches every station.
+
+        >>> index = StationSearchIndex(['TORONTO', 'TORONTO_ISLAND', 'OTTAWA', 'VICTORIA'],
+        ...                            ['ONT', 'ONT', 'ONT', 'BC'])
+        >>> index.search('Toron', 'ONT')
+        ['Toronto', 'Toronto Island']
+        >>> index.search('to', 'ONT')
+        ['Toronto', 'Toronto Island']
+        >>> index.search('a')
+        ['Ottawa', 'Toronto Island', 'Victoria']
+        >>> index.search('', 'BC')
+        ['Victoria']
+        """
+        return [self.display_names[station] for station in self.find(query, province)]
+
+    def find(self, query: str, province: str = ALL_PROVINCES) -> List[int]:
+        """Return the indexes of the stations that search would return the display names of, in the
+        same order.
+        """
+        if province not in self.sorted_stations:
+            return []
+        partition = self.sorted_stations[province]
+        query = str.lower(query)
+        if query in ('', ' '):
+            return list(partition)
+        elif len(query) < 3:
+            return list(self.short_grams[province].get(query, []))
+
+        candidates = None
+        for trigram in name_trigrams(query):
+            stations_with_trigram = self.trigrams[province].get(trigram, set())
+            candidates = stations_with_trigram if candidates is None else \
+                candidates & stations_with_trigram
+            if candidates == set():
+                return []
+        matches = [station for station in candidates if query in self.normalized_names[station]]
+        return sorted(matches, key=lambda station: self.ranks[station])
+
+
+class Debouncer:
+    """Runs a function once calls to it have stopped for a while, using the after method of a Tk
+    widget.
+
+    Instance Attributes:
+        - widget: the widget whose after and after_cancel methods schedule the function
+        - delay: the number of milliseconds to wait after the last call
+        - function: the function to run
+        - pending: the id of the scheduled run of function, or None if none is scheduled
+    """
+    widget: Any
+    delay: int
+    function: Callable[[], Any]
+    pending: Optional[str]
+
+    def __init__(self, widget: Any, function: Callable[[], Any],
+                 delay: int = DEFAULT_DELAY) -> None:
+        """Initialize a debouncer that runs function delay milliseconds after the last call."""
+        self.widget = widget
+        self.function = function
+        self.delay = delay
+        self.pending = None
+
+    def __call__(self, *_: Any) -> None:
+        """Schedule function to run delay milliseconds from now, replacing the run that was already
+        scheduled. Any arguments, such as the ones Tk passes to its callbacks, are ignored.
+        """
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+        self.pending = self.widget.after(self.delay, self.run)
+
+    def run(self) -> None:
+        """Run function now."""
+        self.pending = None
+        self.function()
+
+
+def search_index_from_registry(registry: stations.StationRegistry) -> StationSearchIndex:
+    """Return a StationSearchIndex of the stations in registry, partitioned by their province
+    abbreviation.
+    """
+    return StationSearchIndex(registry.names, registry.provinces)
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def display_name(name: str) -> str:
+    """Return the name of a station in the format of the keys of 'data.json' as it is shown to the
+    user.
+
+    >>> display_name('FORT_SMITH')
+    'Fort Smith'
+    """
+    return str.title(str.replace(name, '_', ' '))
+
+
+def name_short_grams(name: str) -> Set[str]:
+    """Return the groups of one or two consecutive characters in name.
+
+    >>> sorted(name_short_grams('ottawa'))
+    ['a', 'aw', 'o', 'ot', 't', 'ta', 'tt', 'w', 'wa']
+    """
+    return {name[index:index + length] for length in (1, 2)
+            for index in range(len(name) - length + 1)}
+
+
+def name_trigrams(name: str) -> Set[str]:
+    """Return the groups of three consecutive characters in name.
+
+    >>> sorted(name_trigrams('ottawa'))
+    ['awa', 'ott', 'taw', 'tta']
+    """
+    return {name[index:index + 3] for index in range(len(name) - 2)}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'stations', 'python_ta', 'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,175 @@
+"""CSC110 Fall 2020 Final Project, Station Registry
+
+Description
+===============================
+This module gives every weather station a small integer id and keeps the name, province and station
+id of each station in one place. The rest of the project refers to stations by keys such as
+"('TORONTO', 'ONT')" in 'data.json' and "('6158350', 'TORONTO', 'ONT')" in
+'data_for_maps_since_1990.json'. The registry decodes each of those keys only once, and then finds
+stations by name, by province or by station id with a dictionary lookup.
+
+The names and provinces are interned, so stations in the same province share one string.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+import ast
+import functools
+import sys
+
+# the name of each province and territory, keyed by the abbreviation used in the station files
+ABB_TO_PROVINCE = {'BC': 'British Columbia', 'MAN': 'Manitoba', 'ALTA': 'Alberta',
+                   'NFLD': 'Newfoundland and Labrador', 'PEI': 'Prince Edward Island',
+                   'YT': 'Yukon', 'NB': 'New Brunswick', 'SASK': 'Saskatchewan',
+                   'NU': 'Nunavut', 'ONT': 'Ontario', 'NS': 'Nova Scotia',
+                   'NWT': 'Northwest Territories', 'QUE': 'Quebec'}
+
+
+class StationRegistry:
+    """The weather stations of the project, each with an integer id.
+
+    The integer id of a station is its index in station_ids, names, provinces and keys.
+
+    Instance Attributes:
+        - station_ids: the station id of each station, or '' if it is not known
+        - names: the name of each station
+        - provinces: the province abbreviation of each station
+        - keys: the key of each station in 'data.json'
+        - by_name: maps each name to the stations with that name
+        - by_province: maps each province abbreviation to the stations in that province
+        - by_station_id: maps each known station id to its station
+        - by_key: maps the (name, province) of each station to the station
+
+    Representation Invariants:
+        - len(self.station_ids) == len(self.names) == len(self.provinces) == len(self.keys)
+        - all(self.by_key[(self.names[i], self.provinces[i])] == i for i in range(len(self.names)))
+    """
+    station_ids: List[str]
+    names: List[str]
+    provinces: List[str]
+    keys: List[str]
+    by_name: Dict[str, List[int]]
+    by_province: Dict[str, List[int]]
+    by_station_id: Dict[str, int]
+    by_key: Dict[Tuple[str, str], int]
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self.station_ids = []
+        self.names = []
+        self.provinces = []
+        self.keys = []
+        self.by_name = {}
+        self.by_province = {}
+        self.by_station_id = {}
+        self.by_key = {}
+
+    def __len__(self) -> int:
+        """Return the number of stations in the registry."""
+        return len(self.names)
+
+    def add(self, name: str, province: str, station_id: str = '') -> int:
+        """Return the integer id of the station called name in province, adding it to the registry
+        if it is not there yet. If station_id is not '' and the station has no station id yet, it
+        is given station_id.
+
+        >>> registry = StationRegistry()
+        >>> registry.add('TORONTO', 'ONT'), registry.add('OTTAWA', 'ONT', '6105976')
+        (0, 1)
+        >>> registry.add('TORONTO', 'ONT', '6158350'), registry.station_ids
+        (0, ['6158350', '6105976'])
+        """
+        if (name, province) in self.by_key:
+            station = self.by_key[(name, province)]
+        else:
+            name = sys.intern(name)
+            province = sys.intern(province)
+            station = len(self.names)
+            list.append(self.station_ids, '')
+            list.append(self.names, name)
+            list.append(self.provinces, province)
+            list.append(self.keys, str((name, province)))
+            self.by_key[(name, province)] = station
+            if name not in self.by_name:
+                self.by_name[name] = []
+            list.append(self.by_name[name], station)
+            if province not in self.by_province:
+                self.by_province[province] = []
+            list.append(self.by_province[province], station)
+
+        if station_id != '' and self.station_ids[station] == '':
+            self.station_ids[station] = station_id
+            self.by_station_id[station_id] = station
+        return station
+
+    def find(self, name: str, province: str) -> int:
+        """Return the integer id of the station called name in province, or -1 if there is none."""
+        return self.by_key.get((name, province), -1)
+
+    def in_province(self, province: str) -> List[int]:
+        """Return the integer ids of the stations in province, which is an abbreviation such as
+        'ONT'.
+        """
+        return self.by_province.get(province, [])
+
+
+def registry_from_keys(keys: Iterable[str]) -> StationRegistry:
+    """Return a registry of the stations with the given keys, which are either in the format of
+    the keys of 'data.json' or in the format of the keys of 'data_for_maps_since_1990.json'.
+
+    >>> registry = registry_from_keys(["('TORONTO', 'ONT')", "('6105976', 'OTTAWA', 'ONT')"])
+    >>> registry.names, registry.station_ids, registry.in_province('ONT')
+    (['TORONTO', 'OTTAWA'], ['', '6105976'], [0, 1])
+    """
+    registry = StationRegistry()
+    for key in keys:
+        fields = parse_key(key)
+        if len(fields) == 3:
+            registry.add(fields[1], fields[2], fields[0])
+        else:
+            registry.add(fields[0], fields[1])
+    return registry
+
+
+@functools.lru_cache(maxsize=None)
+def parse_key(key: str) -> Tuple[str, ...]:
+    """Return the tuple of strings written in key, such as a key of 'data.json'. Each key is only
+    decoded once.
+
+    >>> parse_key("('TORONTO', 'ONT')")
+    ('TORONTO', 'ONT')
+    """
+    return tuple(ast.literal_eval(key))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'ast', 'functools', 'sys', 'python_ta',
+                          'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,434 @@
+"""CSC110 Fall 2020 Final Project, Synthetic Data
+
+Description
+===============================
+This module writes synthetic data files in the same formats as the real ones, so that the readers
+in data_reading can be tried on far more data than the project ships with.
+
+The daily mean temperature files are written in the layout of 'dm112FN0M.txt': four header lines,
+the first of which has the station id, name and province, followed by one line for every month
+with the year, the month and 31 fixed width temperatures, each followed by a one character flag.
+The days that do not exist in a month are -9999.9 with the flag M, as are the days that are made
+missing on purpose. Some of the other temperatures are flagged E or a, like the estimated and
+adjusted values of the real files.
+
+The greenhouse gases files have the columns of 'GHG_IPCC_Can_Prov_Terr.csv', with the TOTAL
+category of every region being the sum of its other categories and the Canada region being the sum
+of the provinces and territories. By default the regions are the same as in the real file, including
+Northwest Territories and Nunavut being one region before 1999, so every reader of data_reading
+works on it. More regions, categories and years can be added to make the file larger.
+
+The locations of the synthetic stations and the borders of the provinces can also be written as
+geojson files, in the formats of 'weather_stations.geojson' and 'canada_provinces.geojson', so that
+the maps can be made from the synthetic data.
+
+Everything written only depends on the arguments, including the seed: the same arguments always
+give the same files. Each station is generated from its own random generator, so the stations can be
+written by several processes and in any order without changing the files.
+
+The files can be written from the command line, for example:
+
+    python synthetic_data.py synthetic --stations 20000 --first-year 1900 --last-year 2020
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import csv
+import functools
+import json
+import os
+import time
+import numpy as np
+import data_reading
+import emissions_store
+import imputation
+import stations
+
+# the station ids of the synthetic stations are this number plus the index of the station, which
+# keeps them at seven digits like the real ones for up to 1000000 stations
+FIRST_STATION_ID = 9000000
+
+# the number of stations written by a worker process at a time
+CHUNK_SIZE = 256
+
+# the width of each temperature in a daily mean temperature file, not counting its flag
+TEMPERATURE_WIDTH = 8
+
+# the regions of 'GHG_IPCC_Can_Prov_Terr.csv' apart from Canada, with the years they have rows for
+# as (first year, last year), where None means that the region has rows for every year
+REAL_REGIONS = {'Alberta': None, 'British Columbia': None, 'Manitoba': None, 'New Brunswick': None,
+                'Newfoundland and Labrador': None, 'Northwest Territories': (1999, None),
+                'Northwest Territories and Nunavut': (None, 1998), 'Nova Scotia': None,
+                'Nunavut': (1999, None), 'Ontario': None, 'Prince Edward Island': None,
+                'Quebec': None, 'Saskatchewan': None, 'Yukon': None}
+
+# the global warming potentials that turn amounts of CH4 and N2O into amounts of CO2, as used by the
+# 'CH4 (CO2eq)' and 'N2O (CO2eq)' columns of 'GHG_IPCC_Can_Prov_Terr.csv'
+CH4_POTENTIAL = 25
+N2O_POTENTIAL = 298
+
+
+def write_station_files(directory: str, number_of_stations: int, first_year: int = 1900,
+                        last_year: int = 2020, seed: int = 110, missing_rate: float = 0.02,
+                        missing_month_rate: float = 0.01, flag_rate: float = 0.05,
+                        partial_rate: float = 0.0, processes: Optional[int] = 1) -> List[str]:
+    """Write number_of_stations daily mean temperature files from first_year to last_year into
+    directory, and return their names.
+
+    missing_rate is the fraction of the days that are missing, and missing_month_rate is the
+    fraction of the months that are missing entirely. flag_rate is the fraction of the other days
+    that are flagged E or a. partial_rate is the fraction of the stations whose files start in a
+    later year than first_year, chosen at random, so that they do not cover the whole range.
+
+    The files are written by a pool of processes worker processes, or one for every cpu if processes
+    is None, or by this process if processes is 1.
+
+    Preconditions:
+        - 0 <= number_of_stations <= 1000000
+        - first_year <= last_year
+        - all(0.0 <= rate <= 1.0 for rate in [missing_rate, missing_month_rate, flag_rate,
+                                               partial_rate])
+        - processes is None or processes >= 1
+    """
+    os.makedirs(directory, exist_ok=True)
+    options = (directory, first_year, last_year, seed, missing_rate, missing_month_rate,
+               flag_rate, partial_rate)
+    starts = range(0, number_of_stations, CHUNK_SIZE)
+    ends = [min(start + CHUNK_SIZE, number_of_stations) for start in starts]
+
+    file_names_so_far = []
+    if processes == 1:
+        for start, end in zip(starts, ends):
+            list.extend(file_names_so_far, write_station_range(options, start, end))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for file_names in executor.map(write_station_range, [options] * len(ends), starts,
+                                           ends):
+                list.extend(file_names_so_far, file_names)
+    return file_names_so_far
+
+
+def write_station_file(file_name: str, index: int, first_year: int, last_year: int,
+                       seed: int = 110, missing_rate: float = 0.02,
+                       missing_month_rate: float = 0.01, flag_rate: float = 0.05,
+                       partial_rate: float = 0.0) -> None:
+    """Write the daily mean temperature file of the synthetic station with the given index to
+    file_name. The arguments are the same as in write_station_files.
+    """
+    generator = np.random.default_rng([seed, index])
+    province = PROVINCES[generator.integers(len(PROVINCES))]
+    if generator.random() < partial_rate:
+        first_year = int(generator.integers(first_year, last_year + 1))
+    years = np.repeat(np.arange(first_year, last_year + 1), 12)
+    months = np.tile(np.arange(1, 13), last_year - first_year + 1)
+
+    # a seasonal cycle around a mean that depends on the station, warming slowly over the years
+    mean = generator.uniform(-20.0, 10.0)
+    amplitude = generator.uniform(8.0, 20.0)
+    trend = generator.normal(0.015, 0.01)
+    day_of_year = (months[:, None] - 1) * 30.44 + np.arange(31)[None, :]
+    temperatures = mean - amplitude * np.cos(2 * np.pi * (day_of_year - 15) / 365.25) \
+        + trend * (years[:, None] - first_year) \
+        + generator.normal(0.0, 3.5, size=day_of_year.shape)
+    tenths = np.rint(temperatures * 10).astype(np.int64)
+
+    missing = ~data_reading.calendar_mask(first_year, last_year) \
+        | (generator.random(tenths.shape) < missing_rate) \
+        | (generator.random((len(years), 1)) < missing_month_rate)
+    flags = np.where(generator.random(tenths.shape) < flag_rate / 2, ord('E'), ord(' '))
+    flags = np.where(generator.random(tenths.shape) < flag_rate / 2, ord('a'), flags)
+    flags = np.where(missing, ord('M'), flags).astype(np.uint8)
+    tenths = np.where(missing, round(imputation.MISSING_VALUE * 10), tenths)
+
+    station_id = str(FIRST_STATION_ID + index)
+    header = [f'{station_id}, SYNTHETIC_{index:06d}, {province}, Homogenized daily mean '
+              f'temperatures (deg C), synthetic station from seed {seed}',
+              ' Year Mo' + ''.join(f'  Day {day:02d}' for day in range(1, 32)),
+              ' Annee Mo' + ''.join(f' Jour {day:02d}' for day in range(1, 32)),
+              ' M: missing, E: estimated, a: adjusted']
+
+    temporary_file_name = file_name + '.tmp'
+    with open(temporary_file_name, 'wb') as file:
+        file.write(str.encode('\n'.join(header) + '\n'))
+        file.write(format_table(first_year, tenths, flags))
+    os.replace(temporary_file_name, file_name)
+
+
+def format_table(first_year: int, tenths: np.ndarray, flags: np.ndarray) -> bytes:
+    """Return the table of a daily mean temperature file with a line for every month from January
+    of first_year, where tenths are the temperatures of the 31 days of each line in tenths of a
+    degree and flags are the codes of their flag characters.
+
+    Every line is formatted at once as a grid of characters, which is the inverse of how
+    data_reading.decode_table reads it.
+
+    >>> format_table(1990, np.array([[-125, 30]]), np.array([[ord('M'), ord(' ')]]))
+    b' 1990  1   -12.5M     3.0 \\n'
+
+    Preconditions:
+        - tenths.shape == flags.shape
+        - all(abs(value) < 100000 for value in tenths.flat)
+    """
+    dates = date_columns(first_year, len(tenths))
+    lines = np.empty((len(tenths), dates.shape[1] + tenths.shape[1] * (TEMPERATURE_WIDTH + 1) + 1),
+                     dtype=np.uint8)
+    lines[:, :dates.shape[1]] = dates
+    lines[:, -1] = ord('\n')
+
+    # the characters of each temperature, right aligned: a sign, up to four digits, a point and the
+    # digit of the tenths, followed by its flag
+    days = lines[:, dates.shape[1]:-1].reshape(tenths.shape + (TEMPERATURE_WIDTH + 1,))
+    magnitudes = np.abs(tenths).astype(np.int32)
+    whole = magnitudes // 10
+    digit_count = 1 + (whole >= 10).astype(np.int32) + (whole >= 100) + (whole >= 1000)
+    days[..., :2] = ord(' ')
+    days[..., 7] = ord('0') + magnitudes % 10
+    days[..., 6] = ord('.')
+    for place in range(4):
+        days[..., 5 - place] = np.where(digit_count > place, ord('0') + whole // 10 ** place % 10,
+                                        ord(' '))
+    for count in range(1, 5):
+        days[..., 5 - count][(tenths < 0) & (digit_count == count)] = ord('-')
+    days[..., 8] = flags
+    return lines.tobytes()
+
+
+def write_ghg_csv(file_name: str, first_year: int = 1990, last_year: int = 2018,
+                  number_of_categories: int = 84, extra_regions: int = 0, seed: int = 110,
+                  suppressed_rate: float = 0.01) -> int:
+    """Write a greenhouse gases csv file in the format of 'GHG_IPCC_Can_Prov_Terr.csv' to file_name
+    and return the number of rows that were written.
+
+    The regions are those of the real file, followed by extra_regions more. Every region has the
+    TOTAL category and number_of_categories other categories, whose emissions are suppressed in
+    suppressed_rate of the rows, as 'x' in the real file. The rows are ordered by category, then by
+    region, then by year, like the real file.
+
+    data_reading.read_ghg_emissions_for_maps only works on the files that have no extra regions and
+    whose years include 1990 to 1999.
+
+    Preconditions:
+        - first_year <= last_year
+        - number_of_categories >= 1
+        - extra_regions >= 0
+        - 0.0 <= suppressed_rate <= 1.0
+    """
+    generator = np.random.default_rng([seed, len(REAL_REGIONS) + extra_regions])
+    regions = dict(REAL_REGIONS)
+    for index in range(extra_regions):
+        regions[f'Synthetic Region {index + 1:03d}'] = None
+    years = np.arange(first_year, last_year + 1)
+
+    # the amount of each gas in each category of each region in each year
+    gas_names = ['CO2', 'CH4', 'N2O', 'HFCs', 'PFCs', 'SF6', 'NF3']
+    scales = np.array([1000.0, 20.0, 1.0, 5.0, 1.0, 0.05, 0.001])
+    shape = (len(regions), number_of_categories, len(years), len(gas_names))
+    sizes = generator.lognormal(0.0, 1.5, size=shape[:2] + (1, 1)) * scales
+    growth = np.cumsum(generator.normal(0.005, 0.03, size=shape), axis=2)
+    amounts = sizes * np.exp(growth)
+    for region_index, years_of_region in enumerate(regions.values()):
+        if years_of_region is not None:
+            amounts[region_index, :, ~in_years(years, years_of_region)] = np.nan
+    suppressed = generator.random(shape[:3]) < suppressed_rate
+
+    rows_so_far = 0
+    temporary_file_name = file_name + '.tmp'
+    with open(temporary_file_name, 'w', newline='') as file:
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(['Year', 'Region', 'CategoryID', 'Category', 'Rollup'] +
+                        emissions_store.GAS_COLUMNS + ['Unit'])
+
+        categories = [(0, 'TOTAL', 'TRUE', np.nansum(amounts, axis=1), np.full(shape[::2], False))]
+        for category in range(number_of_categories):
+            list.append(categories, (100 + category, f'Synthetic Category {category + 1}', 'FALSE',
+                                     amounts[:, category], suppressed[:, category]))
+
+        for category_id, category_name, rollup, category_amounts, category_suppressed in \
+                categories:
+            # Canada is the sum of all the other regions, as in the real file
+            canada_amounts = np.nansum(category_amounts, axis=0)[None]
+            rows = [('Canada', canada_amounts[0], np.full(len(years), False), None)] + \
+                [(region, category_amounts[index], category_suppressed[index], regions[region])
+                 for index, region in enumerate(regions)]
+            for region, region_amounts, region_suppressed, years_of_region in \
+                    sorted(rows, key=lambda row: row[0]):
+                for year_index, year in enumerate(years.tolist()):
+                    if years_of_region is None or in_years(np.array([year]), years_of_region)[0]:
+                        writer.writerow([year, region, category_id, category_name, rollup] +
+                                        gas_fields(region_amounts[year_index],
+                                                   region_suppressed[year_index]) + ['kt'])
+                        rows_so_far += 1
+
+    os.replace(temporary_file_name, file_name)
+    return rows_so_far
+
+
+def write_stations_geojson(file_name: str, number_of_stations: int, seed: int = 110) -> None:
+    """Write the locations of the first number_of_stations synthetic stations of
+    write_station_files to file_name, in the format of 'weather_stations.geojson'. The stations are
+    spread at random over a box around Canada.
+    """
+    generator = np.random.default_rng([seed, number_of_stations])
+    longitudes = np.round(generator.uniform(-140.0, -53.0, number_of_stations), 4).tolist()
+    latitudes = np.round(generator.uniform(42.0, 75.0, number_of_stations), 4).tolist()
+    features = [{'type': 'Feature', 'id': str(FIRST_STATION_ID + index),
+                 'properties': {'STATION_NAME': f'SYNTHETIC_{index:06d}'},
+                 'geometry': {'type': 'Point',
+                              'coordinates': [longitudes[index], latitudes[index]]}}
+                for index in range(number_of_stations)]
+    write_json(file_name, {'type': 'FeatureCollection', 'features': features})
+
+
+def write_provinces_geojson(file_name: str, points_per_side: int = 50, seed: int = 110) -> None:
+    """Write the borders of the provinces and territories to file_name, in the format of
+    'canada_provinces.geojson'. Each province is a rectangle in a grid over Canada, and each side of
+    it has points_per_side points that wiggle a little, so that the borders have points to simplify
+    like real ones.
+
+    Preconditions:
+        - points_per_side >= 1
+    """
+    generator = np.random.default_rng([seed, points_per_side])
+    features = []
+    names = sorted(region for region in REAL_REGIONS
+                   if region != 'Northwest Territories and Nunavut')
+    for index, name in enumerate(names):
+        west = -140.0 + (index % 5) * 17.0
+        south = 42.0 + (index // 5) * 11.0
+        steps = np.arange(points_per_side) / points_per_side
+        wiggles = generator.normal(0.0, 0.05, size=(4, points_per_side))
+        sides = [(west + 17.0 * steps, south + wiggles[0]),
+                 (west + 17.0 + wiggles[1], south + 11.0 * steps),
+                 (west + 17.0 - 17.0 * steps, south + 11.0 + wiggles[2]),
+                 (west + wiggles[3], south + 11.0 - 11.0 * steps)]
+        ring = [[round(longitude, 4), round(latitude, 4)] for longitudes, latitudes in sides
+                for longitude, latitude in zip(longitudes.tolist(), latitudes.tolist())]
+        list.append(features, {'type': 'Feature', 'id': index, 'properties': {'PRENAME': name},
+                               'geometry': {'type': 'Polygon', 'coordinates': [ring + ring[:1]]}})
+    write_json(file_name, {'type': 'FeatureCollection', 'features': features})
+
+
+###############################
+# Helper Functions
+###############################
+
+
+# the province abbreviations that the synthetic stations are in
+PROVINCES = sorted(stations.ABB_TO_PROVINCE)
+
+
+def write_station_range(options: tuple, start: int, end: int) -> List[str]:
+    """Write the files of the stations from index start to index end, not including end, and return
+    their names. options are the arguments of write_station_files other than number_of_stations and
+    processes. This is the function that runs inside the worker processes.
+    """
+    directory, first_year, last_year = options[:3]
+    file_names_so_far = []
+    for index in range(start, end):
+        file_name = os.path.join(directory, f'dm{FIRST_STATION_ID + index}.txt')
+        write_station_file(file_name, index, first_year, last_year, *options[3:])
+        list.append(file_names_so_far, file_name)
+    return file_names_so_far
+
+
+@functools.lru_cache(maxsize=16)
+def date_columns(first_year: int, number_of_months: int) -> np.ndarray:
+    """Return the characters of the year and the month at the start of the lines of a daily mean
+    temperature file with number_of_months lines from January of first_year, one row for each line.
+    Most stations cover the same years, so their dates are only formatted once.
+
+    >>> bytes(date_columns(1990, 13)[12])
+    b' 1991  1'
+    """
+    dates = ''.join(f' {first_year + month // 12:4d}{month % 12 + 1:3d}'
+                    for month in range(number_of_months))
+    return np.frombuffer(str.encode(dates), dtype=np.uint8).reshape(number_of_months, -1)
+
+
+def write_json(file_name: str, value: dict) -> None:
+    """Write value to the json file called file_name."""
+    temporary_file_name = file_name + '.tmp'
+    with open(temporary_file_name, 'w') as file:
+        json.dump(value, file)
+    os.replace(temporary_file_name, file_name)
+
+
+def in_years(years: np.ndarray, years_of_region: tuple) -> np.ndarray:
+    """Return whether each of years is in years_of_region, as in the values of REAL_REGIONS.
+
+    >>> in_years(np.array([1998, 1999]), (1999, None)).tolist()
+    [False, True]
+    """
+    first_year, last_year = years_of_region
+    return ((first_year is None) | (years >= (first_year or 0))) & \
+        ((last_year is None) | (years <= (last_year or 0)))
+
+
+def gas_fields(amounts: np.ndarray, suppressed: bool) -> List[str]:
+    """Return the values of the gas columns of a row of the greenhouse gases csv file given the
+    amounts of CO2, CH4, N2O, HFCs, PFCs, SF6 and NF3, in the order of
+    emissions_store.GAS_COLUMNS.
+
+    >>> gas_fields(np.array([1.0, 2.0, 0.5, 0.0, 0.0, 0.0, 0.0]), False)
+    ['1', '2', '50', '0.5', '149', '0', '0', '0', '0', '200']
+    >>> gas_fields(np.zeros(7), True)[0]
+    'x'
+    """
+    if suppressed:
+        return [emissions_store.SUPPRESSED_VALUE] * len(emissions_store.GAS_COLUMNS)
+    co2, ch4, n2o, hfcs, pfcs, sf6, nf3 = amounts.tolist()
+    ch4_co2eq = ch4 * CH4_POTENTIAL
+    n2o_co2eq = n2o * N2O_POTENTIAL
+    values = [co2, ch4, ch4_co2eq, n2o, n2o_co2eq, hfcs, pfcs, sf6, nf3,
+              co2 + ch4_co2eq + n2o_co2eq + hfcs + pfcs + sf6 + nf3]
+    return [f'{value:.10g}' for value in values]
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description='Write synthetic daily mean temperature files '
+                                                 'and a synthetic greenhouse gases csv file.')
+    PARSER.add_argument('output_directory', nargs='?', default='synthetic')
+    PARSER.add_argument('--stations', type=int, default=1000)
+    PARSER.add_argument('--first-year', type=int, default=1900)
+    PARSER.add_argument('--last-year', type=int, default=2020)
+    PARSER.add_argument('--seed', type=int, default=110)
+    PARSER.add_argument('--missing-rate', type=float, default=0.02)
+    PARSER.add_argument('--missing-month-rate', type=float, default=0.01)
+    PARSER.add_argument('--flag-rate', type=float, default=0.05)
+    PARSER.add_argument('--partial-rate', type=float, default=0.0)
+    PARSER.add_argument('--categories', type=int, default=84)
+    PARSER.add_argument('--extra-regions', type=int, default=0)
+    PARSER.add_argument('--ghg-first-year', type=int, default=1990)
+    PARSER.add_argument('--ghg-last-year', type=int, default=2018)
+    PARSER.add_argument('--processes', type=int, default=None)
+    ARGUMENTS = PARSER.parse_args()
+
+    START = time.perf_counter()
+    STATION_FILES = write_station_files(os.path.join(ARGUMENTS.output_directory,
+                                                     'daily_mean_temps'),
+                                        ARGUMENTS.stations, ARGUMENTS.first_year,
+                                        ARGUMENTS.last_year, ARGUMENTS.seed,
+                                        ARGUMENTS.missing_rate, ARGUMENTS.missing_month_rate,
+                                        ARGUMENTS.flag_rate, ARGUMENTS.partial_rate,
+                                        ARGUMENTS.processes)
+    ROWS = write_ghg_csv(os.path.join(ARGUMENTS.output_directory, 'GHG_IPCC_Can_Prov_Terr.csv'),
+                         ARGUMENTS.ghg_first_year, ARGUMENTS.ghg_last_year, ARGUMENTS.categories,
+                         ARGUMENTS.extra_regions, ARGUMENTS.seed)
+    write_stations_geojson(os.path.join(ARGUMENTS.output_directory, 'weather_stations.geojson'),
+                           ARGUMENTS.stations, ARGUMENTS.seed)
+    write_provinces_geojson(os.path.join(ARGUMENTS.output_directory, 'canada_provinces.geojson'),
+                            seed=ARGUMENTS.seed)
+    print(f'Wrote {len(STATION_FILES)} station files and {ROWS} emissions rows to '
+          f'{ARGUMENTS.output_directory} ({time.perf_counter() - START:.1f} s)')
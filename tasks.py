@@ -0,0 +1,251 @@
+"""CSC110 Fall 2020 Final Project, Background Tasks
+
+Description
+===============================
+This module runs the slow work of the user interface, such as reading the data files and building
+the plotly figures, on a pool of worker threads so that the Tk window keeps responding.
+
+Each task belongs to a channel, such as 'map' or 'graph'. A new task on a channel makes the task
+that was already on that channel stale: if it has not started yet it is cancelled, and otherwise
+its result is ignored when it finishes. A task can also check whether it has become stale and stop
+early. Asking again for the task that is already running on a channel does nothing, so clicking the
+same button several times does not queue the same work several times.
+
+Tk widgets may only be used from the thread that runs the Tk event loop, so the worker threads never
+call the callbacks of a task themselves. They put messages on a queue instead, and the scheduler
+reads that queue from the event loop with the after method of a widget and calls the callbacks
+there.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+from concurrent.futures import Future, ThreadPoolExecutor
+import queue
+import traceback
+
+# the number of milliseconds between two reads of the queue of messages from the worker threads
+POLL_INTERVAL = 50
+
+# the number of worker threads, enough for a map and a graph to be built at the same time
+MAX_WORKERS = 2
+
+
+class Task:
+    """A piece of work submitted to a TaskScheduler.
+
+    Instance Attributes:
+        - channel: the channel of the task; a newer task on the same channel makes this one stale
+        - key: what the task computes, such as the year of a map; a task with the same key as the
+          task running on its channel is not submitted
+        - job: the function that does the work on a worker thread, given the task itself
+        - on_done: called on the event loop with the value returned by job
+        - on_progress: called on the event loop with each message that job reports, or None
+        - on_error: called on the event loop with the exception raised by job, or None
+        - scheduler: the scheduler that runs the task
+        - future: the future of the task in the pool of worker threads, once it is submitted
+        - finished: whether the result or the error of the task has been handed to the event loop
+    """
+    channel: str
+    key: Hashable
+    job: Callable[[Task], Any]
+    on_done: Callable[[Any], None]
+    on_progress: Optional[Callable[[str], None]]
+    on_error: Optional[Callable[[BaseException], None]]
+    scheduler: TaskScheduler
+    future: Optional[Future]
+    finished: bool
+
+    def __init__(self, scheduler: TaskScheduler, channel: str, key: Hashable,
+                 job: Callable[[Task], Any], on_done: Callable[[Any], None],
+                 on_progress: Optional[Callable[[str], None]] = None,
+                 on_error: Optional[Callable[[BaseException], None]] = None) -> None:
+        """Initialize a task of scheduler with the given channel, key, job and callbacks."""
+        self.scheduler = scheduler
+        self.channel = channel
+        self.key = key
+        self.job = job
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.future = None
+        self.finished = False
+
+    def cancelled(self) -> bool:
+        """Return whether a newer task has been submitted on the channel of this task. The job of a
+        task can call this between its steps to stop early, since its result will be ignored.
+        """
+        return self.scheduler.current.get(self.channel) is not self
+
+    def report(self, message: str) -> None:
+        """Hand message to the on_progress callback of this task on the event loop. This can be
+        called from the worker thread that runs the job.
+        """
+        self.scheduler.messages.put(('progress', self, message))
+
+
+class TaskScheduler:
+    """Runs tasks on a pool of worker threads and hands their results back to the Tk event loop.
+
+    Instance Attributes:
+        - widget: the widget whose after method reads the queue of messages on the event loop
+        - executor: the pool of worker threads
+        - messages: the queue of (kind, task, value) messages from the worker threads, where kind is
+          'progress', 'done' or 'error'
+        - current: maps each channel to the newest task submitted on it
+        - outstanding: the tasks that were submitted and have not sent their result yet
+        - polling: whether a read of the queue is scheduled with widget.after
+    """
+    widget: Any
+    executor: ThreadPoolExecutor
+    messages: queue.Queue
+    current: Dict[str, Task]
+    outstanding: Set[Task]
+    polling: bool
+
+    def __init__(self, widget: Any, max_workers: int = MAX_WORKERS) -> None:
+        """Initialize a scheduler that runs tasks on max_workers threads and reads their messages
+        with the after method of widget.
+        """
+        self.widget = widget
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='background-task')
+        self.messages = queue.Queue()
+        self.current = {}
+        self.outstanding = set()
+        self.polling = False
+
+    def submit(self, channel: str, key: Hashable, job: Callable[[Task], Any],
+               on_done: Callable[[Any], None],
+               on_progress: Optional[Callable[[str], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None) -> bool:
+        """Run job on a worker thread as the newest task of channel, and return True. The task that
+        was on channel before becomes stale.
+
+        If the newest task of channel has the same key and has not finished, nothing is submitted
+        and False is returned.
+
+        This must be called from the event loop.
+        """
+        previous = self.current.get(channel)
+        if previous is not None and previous.key == key and not previous.finished:
+            return False
+
+        task = Task(self, channel, key, job, on_done, on_progress, on_error)
+        self.current[channel] = task
+        if previous is not None and previous.future is not None and previous.future.cancel():
+            # the stale task had not started, so it will never send a message
+            set.discard(self.outstanding, previous)
+
+        set.add(self.outstanding, task)
+        task.future = self.executor.submit(run_task, task)
+        if not self.polling:
+            self.polling = True
+            self.widget.after(POLL_INTERVAL, self.poll)
+        return True
+
+    def poll(self) -> None:
+        """Hand every message from the worker threads to the callbacks of its task, unless the task
+        is stale, and read the queue again later if some tasks have not finished.
+
+        This is called on the event loop by widget.after.
+        """
+        try:
+            while True:
+                try:
+                    kind, task, value = self.messages.get_nowait()
+                except queue.Empty:
+                    break
+
+                if kind != 'progress':
+                    set.discard(self.outstanding, task)
+                    task.finished = True
+                if not task.cancelled():
+                    self.dispatch(kind, task, value)
+        finally:
+            # the next read is scheduled even if a callback failed, so that the later results are
+            # not lost
+            if self.outstanding == set():
+                self.polling = False
+            else:
+                self.widget.after(POLL_INTERVAL, self.poll)
+
+    def dispatch(self, kind: str, task: Task, value: Any) -> None:
+        """Call the callback of task for a message of kind with value.
+
+        An exception raised by on_progress or on_done is handed to on_error, and one raised by
+        on_error, or by a task with no on_error, is printed, so that one callback that fails does
+        not stop the other tasks.
+        """
+        try:
+            if kind == 'progress' and task.on_progress is not None:
+                task.on_progress(value)
+            elif kind == 'done':
+                task.on_done(value)
+            elif kind == 'error' and task.on_error is not None:
+                task.on_error(value)
+        except Exception as error:
+            if kind != 'error' and task.on_error is not None:
+                self.dispatch('error', task, error)
+            else:
+                traceback.print_exc()
+
+    def shutdown(self) -> None:
+        """Cancel the tasks that have not started and stop the worker threads once the running
+        tasks finish.
+        """
+        self.current = {}
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def run_task(task: Task) -> None:
+    """Run the job of task on the current worker thread and put its result, or the exception it
+    raised, on the queue of messages of its scheduler.
+    """
+    if task.cancelled():
+        task.scheduler.messages.put(('done', task, None))
+        return
+    try:
+        result = task.job(task)
+    except Exception as error:  # the error is handed to the event loop instead
+        task.scheduler.messages.put(('error', task, error))
+    else:
+        task.scheduler.messages.put(('done', task, result))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'concurrent.futures', 'queue', 'traceback',
+                          'python_ta', 'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200', 'W0703']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,305 @@
+"""CSC110 Fall 2020 Final Project, Temperature Cube
+
+Description
+===============================
+This module stores the daily mean temperatures of every weather station in a binary file instead of
+in 'data.json'. The temperatures are a float32 array with one row for each station and one column
+for each day, saved as a .npy file that is opened with memory mapping. A small json file next to it
+holds the id, name and province of the station in each row and the range of years of the columns.
+
+Looking up the temperatures of one station is a slice of the memory mapped array, so the data is
+only read from disk when it is used and is never turned into Python floats all at once.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TA's and professors
+teaching CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2020 Dana Alshekerchi, Nehchal Kalsi, Rachel Kim, Kathy Lee.
+"""
+
+from typing import Dict, Iterator, List, Tuple
+from collections.abc import Mapping
+import ast
+import json
+import os
+import numpy as np
+import data_reading
+
+# the station id, the station name and the province or territory of a station
+Station = Tuple[str, str, str]
+
+
+class TemperatureCube:
+    """The daily mean temperatures of many weather stations, one station per row.
+
+    Instance Attributes:
+        - temperatures: the stations by days array of temperatures, nan where a station has no data
+        - stations: the (id, name, province) of the station in each row of temperatures
+        - first_year: the year of the first column of temperatures
+        - last_year: the year of the last column of temperatures
+        - year_starts: the column of January 1 of each year from first_year to last_year, followed
+          by the number of columns
+        - rows_by_name: maps the (name, province) of each station to its row
+
+    Representation Invariants:
+        - self.temperatures.shape == (len(self.stations), self.year_starts[-1])
+        - len(self.year_starts) == self.last_year - self.first_year + 2
+    """
+    temperatures: np.ndarray
+    stations: List[Station]
+    first_year: int
+    last_year: int
+    year_starts: np.ndarray
+    rows_by_name: Dict[Tuple[str, str], int]
+
+    def __init__(self, temperatures: np.ndarray, stations: List[Station], first_year: int,
+                 last_year: int) -> None:
+        """Initialize a cube of the given temperatures of stations from first_year to last_year."""
+        self.temperatures = temperatures
+        self.stations = stations
+        self.first_year = first_year
+        self.last_year = last_year
+        self.year_starts = year_starts(first_year, last_year)
+        self.rows_by_name = {(name, province): row
+                             for row, (_, name, province) in enumerate(stations)}
+
+    def station(self, row: int) -> np.ndarray:
+        """Return the temperatures of the station in row for every day, without copying them."""
+        return self.temperatures[row]
+
+    def station_years(self, row: int) -> Dict[int, np.ndarray]:
+        """Return a dictionary mapping each year in which the station in row has data to the
+        temperatures of that year, in the same format as the values of 'data.json'.
+
+        The temperatures of each year are a slice of the cube that is not copied, cut after the last
+        day with data, since a year in 'data.json' can have fewer values than days, such as the leap
+        years with 365 values. A year is left out only if none of its days have data.
+
+        >>> cube = TemperatureCube(np.full((1, 731), np.nan, dtype=np.float32), [('1', 'A', 'ON')],
+        ...                        2000, 2001)
+        >>> cube.temperatures[0, :365] = 1.0
+        >>> cube.temperatures[0, 367] = 2.0
+        >>> {year: len(temps) for year, temps in cube.station_years(0).items()}
+        {2000: 365, 2001: 2}
+        """
+        temperatures = self.temperatures[row]
+        starts = self.year_starts[:-1]
+        # one past the column of the last day with data, up to and including each column
+        ends = np.where(np.isnan(temperatures), 0, np.arange(1, len(temperatures) + 1))
+        last_ends = np.maximum.reduceat(ends, starts).tolist()
+
+        years_so_far = {}
+        for index in range(self.last_year - self.first_year + 1):
+            if last_ends[index] > starts[index]:
+                years_so_far[self.first_year + index] = temperatures[starts[index]:
+                                                                     last_ends[index]]
+        return years_so_far
+
+    def as_mapping(self) -> Mapping:
+        """Return a read only dictionary view of the cube with the same keys as 'data.json', such as
+        "('TORONTO', 'ONT')", whose values come from station_years when they are looked up.
+        """
+        return _StationYearsMapping(self)
+
+
+class _StationYearsMapping(Mapping):
+    """A read only dictionary view of a TemperatureCube with the keys of 'data.json'.
+
+    Instance Attributes:
+        - cube: the cube that is viewed
+        - rows_by_key: maps each key to the row of its station in cube
+    """
+    cube: TemperatureCube
+    rows_by_key: Dict[str, int]
+
+    def __init__(self, cube: TemperatureCube) -> None:
+        """Initialize a view of cube."""
+        self.cube = cube
+        self.rows_by_key = {str((name, province)): row
+                            for (name, province), row in cube.rows_by_name.items()}
+
+    def __getitem__(self, key: str) -> Dict[int, np.ndarray]:
+        """Return the temperatures in each year of the station with the given key."""
+        return self.cube.station_years(self.rows_by_key[key])
+
+    def __iter__(self) -> Iterator[str]:
+        """Return an iterator over the keys of the stations."""
+        return iter(self.rows_by_key)
+
+    def __len__(self) -> int:
+        """Return the number of stations."""
+        return len(self.rows_by_key)
+
+
+def load_temperature_cube(file_name: str) -> TemperatureCube:
+    """Return the TemperatureCube saved under file_name by write_temperature_cube. The temperatures
+    are memory mapped and read only.
+
+    Preconditions:
+        - os.path.exists(cube_file_name(file_name))
+        - os.path.exists(metadata_file_name(file_name))
+    """
+    with open(metadata_file_name(file_name)) as file:
+        metadata = json.load(file)
+
+    temperatures = np.load(cube_file_name(file_name), mmap_mode='r')
+    stations = [(station[0], station[1], station[2]) for station in metadata['stations']]
+    return TemperatureCube(temperatures, stations, metadata['first_year'], metadata['last_year'])
+
+
+def write_temperature_cube(file_name: str, stations: List[Station],
+                           years_and_temps: List[Dict[int, List[float]]]) -> None:
+    """Save the temperatures of stations under file_name, given the dictionary of temperatures of
+    each station in the format of the values of 'data.json'. Stations with no temperatures are left
+    out.
+
+    Preconditions:
+        - len(stations) == len(years_and_temps)
+    """
+    kept = [index for index in range(len(stations)) if years_and_temps[index] != {}]
+    all_years = [int(year) for index in kept for year in years_and_temps[index]]
+    first_year = min(all_years, default=data_reading.FIRST_YEAR)
+    last_year = max(all_years, default=data_reading.LAST_YEAR)
+    starts = year_starts(first_year, last_year)
+
+    temperatures = np.full((len(kept), starts[-1]), np.nan, dtype=np.float32)
+    for row, index in enumerate(kept):
+        for year, temps in years_and_temps[index].items():
+            start = starts[int(year) - first_year]
+            temperatures[row, start:start + len(temps)] = temps
+
+    save_cube_arrays(file_name, temperatures, [stations[index] for index in kept], first_year,
+                     last_year)
+
+
+def save_cube_arrays(file_name: str, temperatures: np.ndarray, stations: List[Station],
+                     first_year: int, last_year: int) -> None:
+    """Save the stations by days array temperatures and the metadata of its rows under file_name.
+    Both files are written to a temporary name first, so a cube that is open elsewhere is never
+    seen half written. On Windows, a file cannot be replaced while it is memory mapped, so
+    temperatures must not be the memory mapped cube saved under file_name.
+
+    Preconditions:
+        - temperatures.shape == (len(stations), year_starts(first_year, last_year)[-1])
+    """
+    temporary_cube = cube_file_name(file_name) + '.tmp'
+    with open(temporary_cube, 'wb') as file:
+        np.save(file, np.asarray(temperatures, dtype=np.float32))
+
+    temporary_metadata = metadata_file_name(file_name) + '.tmp'
+    with open(temporary_metadata, 'w') as file:
+        json.dump({'first_year': first_year, 'last_year': last_year,
+                   'stations': [list(station) for station in stations]}, file)
+
+    os.replace(temporary_cube, cube_file_name(file_name))
+    os.replace(temporary_metadata, metadata_file_name(file_name))
+
+
+def station_row(years: np.ndarray, days_in_each_year: np.ndarray, temperatures: np.ndarray,
+                first_year: int, last_year: int) -> np.ndarray:
+    """Return the row of a cube from first_year to last_year for a station with the given years,
+    number of days in each year and temperatures, as returned by
+    data_reading.read_daily_mean_temps_array. The days of years that are not in years are nan.
+
+    >>> row = station_row(np.array([2001]), np.array([365]), np.ones(365), 2000, 2001)
+    >>> len(row), bool(np.isnan(row[365])), float(row[366])
+    (731, True, 1.0)
+    """
+    starts = year_starts(first_year, last_year)
+    row = np.full(starts[-1], np.nan, dtype=np.float32)
+    offsets = np.concatenate(([0], np.cumsum(days_in_each_year)))
+    for index, year in enumerate(years.tolist()):
+        if first_year <= year <= last_year:
+            start = starts[year - first_year]
+            row[start:start + days_in_each_year[index]] = temperatures[offsets[index]:
+                                                                       offsets[index + 1]]
+    return row
+
+
+def convert_json_to_cube(data_file_name: str, maps_file_name: str, file_name: str) -> None:
+    """Save the temperatures in the json files data_file_name and maps_file_name as a cube under
+    file_name.
+
+    The stations are identified by the keys of maps_file_name, which include the station id.
+    Stations that are only in data_file_name are kept with an empty id.
+
+    Preconditions:
+        - data_file_name is in the format of 'data.json'
+        - maps_file_name is in the format of 'data_for_maps_since_1990.json'
+    """
+    with open(maps_file_name) as file:
+        maps_data = json.load(file)
+    with open(data_file_name) as file:
+        graph_data = json.load(file)
+
+    stations = []
+    years_and_temps = []
+    names_so_far = set()
+    for key in maps_data:
+        station_id, name, province = ast.literal_eval(key)
+        list.append(stations, (station_id, name, province))
+        list.append(years_and_temps, maps_data[key])
+        set.add(names_so_far, (name, province))
+
+    for key in graph_data:
+        name, province = ast.literal_eval(key)
+        if (name, province) not in names_so_far:
+            list.append(stations, ('', name, province))
+            list.append(years_and_temps, graph_data[key])
+
+    write_temperature_cube(file_name, stations, years_and_temps)
+
+
+###############################
+# Helper Functions
+###############################
+
+
+def cube_file_name(file_name: str) -> str:
+    """Return the name of the file that holds the temperatures of the cube saved under file_name."""
+    return file_name + '.npy'
+
+
+def metadata_file_name(file_name: str) -> str:
+    """Return the name of the file that holds the metadata of the cube saved under file_name."""
+    return file_name + '_stations.json'
+
+
+def year_starts(first_year: int, last_year: int) -> np.ndarray:
+    """Return the number of days from January 1 of first_year to January 1 of each year from
+    first_year to last_year + 1.
+
+    >>> year_starts(1999, 2001).tolist()
+    [0, 365, 731, 1096]
+    """
+    mask = data_reading.calendar_mask(first_year, last_year)
+    days_in_each_year = mask.reshape(-1, 12 * 31).sum(axis=1)
+    return np.concatenate(([0], np.cumsum(days_in_each_year)))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['typing', 'collections.abc', 'ast', 'json', 'os', 'numpy',
+                          'data_reading', 'python_ta', 'python_ta.contracts'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['load_temperature_cube', 'save_cube_arrays', 'convert_json_to_cube'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()